@@ -0,0 +1,148 @@
+""" Asyncio jobs,
+    Probes and renders driven from an event loop, for pipeline services that orchestrate many takes
+    without Qt threads. The blocking reader, OpenCV and disk work runs on executor threads.
+    """
+import asyncio
+import weakref
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from PicoSlicer import CyBatch
+from PicoSlicer import CyPico
+from PicoSlicer import CyReader
+
+# - Globals - #
+gMAX_JOBS = 4  # Jobs a JobRunner runs at once, the others wait for a free slot
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+_DONE = object()
+
+JobProgress = collections.namedtuple('JobProgress', ('frames', 'total', 'fps', 'eta'))
+
+
+class JobRunner(object):
+    def __init__(self, max_jobs=gMAX_JOBS):
+        """
+        Runs probes and renders from an event loop, max_jobs at a time, the rest wait their turn in order.
+        Every job gets an executor thread of its own, its blocking calls run in order there and a slow job
+        never holds up another one. Cancelling a job, or running past its timeout, stops it between two
+        frames, the blocking call already running is always let finish.
+        :param max_jobs: int
+        """
+        self.max_jobs = max_jobs
+        self.semaphores = weakref.WeakKeyDictionary()  # Event loop -> asyncio.Semaphore, jobs are counted per loop
+
+    def _slot(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.semaphores[loop] = asyncio.Semaphore(self.max_jobs)
+        return semaphore
+
+    @staticmethod
+    async def _call(executor, deadline, function, *args):
+        future = asyncio.wrap_future(executor.submit(function, *args))
+        if deadline is None:
+            return await future
+        return await asyncio.wait_for(future, max(0.0, deadline - asyncio.get_running_loop().time()))
+
+    @staticmethod
+    def _deadline(timeout):
+        if timeout is None:
+            return None
+        return asyncio.get_running_loop().time() + timeout
+
+    async def probe(self, file_path, reader_backend='pycara', index=None, timeout=None):
+        """
+        Reads a take's metadata without decoding any frame, see CyReader.probe
+        :param file_path: str
+        :param reader_backend: str, see CyReader.READER_BACKENDS
+        :param index: CyIndex.PicoIndex, takes it already knows about are not opened
+        :param timeout: float, seconds, raises asyncio.TimeoutError past it
+        :return: CyReader.PicoProbe
+        """
+        source = index if index is not None else CyReader
+        async with self._slot():
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='PicoProbe')
+            try:
+                _, probe = await self._call(executor, self._deadline(timeout), source.probe, file_path,
+                                            reader_backend)
+                return probe
+            finally:
+                executor.shutdown(wait=False)
+
+    @staticmethod
+    def _prepare(pico, index):
+        # Everything before the first frame, on the job's thread
+        pico.read(index=index)
+        if not pico.validate_timecode_input():
+            raise ValueError('Timecode range of {0} is not valid'.format(pico.file_path))
+        return len(pico.render_plan())
+
+    async def render_job(self, job, index=None, timeout=None, **render_options):
+        """
+        Reads, checks and renders a job, yielding a JobProgress after every frame.
+        When it stops early the render is closed the same as a finished one, its writers are flushed
+        and a resumable render keeps its checkpoint. A caller leaving the loop early should aclose() it,
+        or use contextlib.aclosing, to have that happen straight away rather than whenever it gets collected.
+        The stats are left in the PicoFile's render_stats.
+        :param job: dict, see CyBatch.make_job, or a CyPico.PicoFile set up by the caller
+        :param index: CyIndex.PicoIndex, metadata cache used to read the take
+        :param timeout: float, seconds the job may run once it has a slot, raises asyncio.TimeoutError past it
+        :param render_options: passed on to CyPico.PicoFile.render
+        :return: async generator
+        """
+        pico = job if isinstance(job, CyPico.PicoFile) else CyBatch.make_pico(job)
+        async with self._slot():
+            deadline = self._deadline(timeout)
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='PicoJob')
+            render_frames = None
+            try:
+                total = await self._call(executor, deadline, self._prepare, pico, index)
+                render_frames = pico.render(**render_options)
+
+                frames = 0
+                while await self._call(executor, deadline, next, render_frames, _DONE) is not _DONE:
+                    frames += 1
+                    stats = pico.render_stats
+                    yield JobProgress(frames, total, stats.fps(), stats.eta())
+            finally:
+                if render_frames is not None:
+                    # Queued behind the frame still rendering, if any
+                    await asyncio.shield(asyncio.wrap_future(executor.submit(render_frames.close)))
+                executor.shutdown(wait=False)
+
+    async def run_job(self, job, index=None, timeout=None, **render_options):
+        """
+        Same as render_job, without the progress
+        :return: CyStats.RenderStats
+        """
+        pico = job if isinstance(job, CyPico.PicoFile) else CyBatch.make_pico(job)
+        async for _ in self.render_job(pico, index=index, timeout=timeout, **render_options):
+            pass
+        return pico.render_stats
+
+
+def default_runner():
+    """
+    :return: JobRunner, the one shared by the module level probe, render_job and run_job
+    """
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner(gMAX_JOBS)
+        return _default_runner
+
+
+async def probe(file_path, reader_backend='pycara', index=None, timeout=None):
+    return await default_runner().probe(file_path, reader_backend, index, timeout)
+
+
+def render_job(job, index=None, timeout=None, **render_options):
+    return default_runner().render_job(job, index, timeout, **render_options)
+
+
+async def run_job(job, index=None, timeout=None, **render_options):
+    return await default_runner().run_job(job, index, timeout, **render_options)
@@ -0,0 +1,419 @@
+""" Headless batch renderer,
+    Scans directories and job manifests for .pico files and renders them through CyPico.
+    Nothing in here imports Qt, so it starts fast on farm nodes.
+    """
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from PicoSlicer import CyPico
+from PicoSlicer import CyReader
+from PicoSlicer import CyIndex
+from PicoSlicer import CyLookup
+from PicoSlicer import CyEdl
+from PicoSlicer import CyCheckpoint
+
+# - Globals - #
+gSTART_FRAME = 1001  # Same default as the GUI
+gSCAN_THREADS = 8
+
+
+def _walk(directory):
+    found = []
+    for path, _subdirs, files in os.walk(directory):
+        for name in files:
+            if name.endswith('.pico'):
+                found.append(os.path.join(path, name))
+    return found
+
+
+def scan_for_pico_files(root, threads=gSCAN_THREADS):
+    """
+    Finds every .pico file under root, every top level directory is walked on its own thread
+    :param root: str
+    :param threads: int
+    :return: list of str, sorted
+    """
+    found = []
+    directories = []
+    for entry in os.scandir(root):
+        if entry.is_dir():
+            directories.append(entry.path)
+        elif entry.name.endswith('.pico'):
+            found.append(entry.path)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for files in executor.map(_walk, directories):
+            found.extend(files)
+
+    return sorted(found)
+
+
+def load_manifest(manifest_path):
+    """
+    Reads a job manifest, either a .json list of objects or a .csv with a header row.
+    Recognised fields are path, tc_in, tc_out, start_frame and override, only path is required.
+    Jobs with both tc_in and tc_out render a slice, the rest render the full file.
+    :param manifest_path: str
+    :return: list of dict
+    """
+    if manifest_path.endswith('.json'):
+        with open(manifest_path) as f:
+            rows = json.load(f)
+    else:
+        with open(manifest_path, newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for row in rows:
+        job = {'path': row['path'],
+               'tc_in': row.get('tc_in') or None,
+               'tc_out': row.get('tc_out') or None,
+               'start_frame': int(row.get('start_frame') or gSTART_FRAME),
+               'override': row.get('override') or None}
+        jobs.append(job)
+
+    return jobs
+
+
+def make_job(path, start_frame=gSTART_FRAME):
+    return {'path': path, 'tc_in': None, 'tc_out': None, 'start_frame': start_frame, 'override': None}
+
+
+def make_pico(job):
+    """
+    Maps a job onto a PicoFile instance, the same way the GUI maps its fields
+    :param job: dict
+    :return: CyPico.PicoFile
+    """
+    pico = CyPico.PicoFile()
+    pico.file_path = job['path']
+    pico.override = job['override']
+    pico.start_frame = job['start_frame']
+
+    if job['tc_in'] and job['tc_out']:
+        pico.render_length = 'Slice'
+        pico.timecode_in = job['tc_in']
+        pico.timecode_out = job['tc_out']
+    else:
+        pico.render_length = 'Full'
+
+    return pico
+
+
+def is_rendered(pico):
+    """
+    Checks if a PicoFile already has output on disk, without opening the .pico.
+    For image sequences that means its first frame, several jobs can render into one sequence.
+    Sequences with a checkpoint are left to PicoFile.render, it knows which of their frames the job can reuse.
+    :param pico: CyPico.PicoFile
+    :return: bool
+    """
+    output_name = pico.override if pico.override is not None else pico.file_path
+    render_output_name = output_name.replace('.pico', '')
+
+    if pico.output_format == 'jpg':
+        manifest = CyCheckpoint.RenderCheckpoint.read_manifest(render_output_name + '.render.json')
+        if manifest is not None:
+            return False
+        for image_name in glob.iglob(glob.escape(render_output_name) + '.[0-9]*.jpg'):
+            frame_number = image_name[len(render_output_name) + 1:-len('.jpg')]
+            if pico.start_frame is None or (frame_number.isdigit() and int(frame_number) == pico.start_frame):
+                return True
+        return False
+    return os.path.isfile(render_output_name + pico.video_extension)
+
+
+def unpack_take(pico):
+    """
+    Unpacks the frames of a read pico file, see CyPico.PicoFile.unpack, with progress on stdout
+    :param pico: CyPico.PicoFile
+    :return:
+    """
+    total = max(1, pico.total_frames // 2 + 1)
+    unpacked = 0
+    for unpacked, _ in enumerate(pico.unpack(), 1):
+        sys.stdout.write('\rUnpacking {0} %'.format(unpacked * 100 // total))
+        sys.stdout.flush()
+    if unpacked:
+        sys.stdout.write('\n')
+
+
+def run_jobs(jobs, workers=None, output_format='jpg', force=False, reader_backend='pycara', stats=False,
+             index=None, channels=None, profile='full', unpack=False, transport='reader'):
+    """
+    Renders every job in turn, each one split across the worker processes
+    :param jobs: list of dict
+    :param workers: int, render processes per job
+    :param output_format: str, see PicoFile.output_format
+    :param force: bool, render even if the output is already on disk, otherwise unfinished renders resume
+    :param reader_backend: str, see CyReader.READER_BACKENDS
+    :param stats: bool, time every render stage and dump the stats as json next to the output
+    :param index: CyIndex.PicoIndex, metadata cache used to check the jobs
+    :param channels: str, 'separate' or 'sheet' renders every enabled camera channel, None only the first
+    :param profile: str, see CyPico.PROFILES
+    :param unpack: bool, unpack every job's frames before rendering them, later renders of the take map them
+    :param transport: str, how the worker processes get their frames, see CyPico.PicoFile.render
+    :return: int, number of failed jobs
+    """
+    failed = 0
+    for job_index, job in enumerate(jobs):
+        pico = make_pico(job)
+        pico.output_format = output_format
+        pico.reader_backend = reader_backend
+        pico.profile = profile
+
+        print('\nFile {0} of {1}: {2}'.format(job_index + 1, len(jobs), job['path']))
+        if not force and is_rendered(pico):
+            print('Already rendered, skipping')
+            continue
+
+        time_stamp = time.time()
+        try:
+            pico.read(index=index)
+            if not pico.validate_timecode_input():
+                print('Timecode range is not valid, skipping')
+                failed += 1
+                continue
+
+            if unpack:
+                unpack_take(pico)
+
+            stats_path = None
+            if stats:
+                stats_path = pico.output_name.replace('.pico', '') + '.stats.json'
+
+            total = max(1, pico.total_frames // 2 + 1)
+            if channels is not None:
+                render_frames = pico.render_channels(channels, instrument=stats, stats_path=stats_path)
+            else:
+                render_frames = pico.render(workers=workers, instrument=stats, stats_path=stats_path,
+                                            resume=not force, transport=transport)
+            for frame_index, _ in enumerate(render_frames):
+                sys.stdout.write('\r{0} % - {1:.1f} fps'.format((frame_index + 1) * 100 // total,
+                                                                 pico.render_stats.fps()))
+                sys.stdout.flush()
+        except Exception as e:
+            print('\nRender failed: {0}'.format(e))
+            failed += 1
+        else:
+            print('\nRendered in {0} seconds'.format(round(time.time() - time_stamp)))
+
+    return failed
+
+
+def run_selects(jobs, output_format='jpg', force=False, reader_backend='pycara', stats=False, index=None,
+                profile='full', unpack=False):
+    """
+    Renders timecode range jobs grouped by file, every file in a single sweep through
+    PicoFile.render_ranges however many ranges it has
+    :param jobs: list of dict, jobs with tc_in and tc_out, see CyLookup.TakeLookup.jobs
+    :param output_format: str, see PicoFile.output_format
+    :param force: bool, render ranges even if their output is already on disk
+    :param reader_backend: str, see CyReader.READER_BACKENDS
+    :param stats: bool, time every render stage and dump the stats as json next to the file's output
+    :param index: CyIndex.PicoIndex, metadata cache used to read the files
+    :param profile: str, see CyPico.PROFILES
+    :param unpack: bool, unpack every file whole before rendering its ranges, later selects map the frames
+    :return: tuple(int number of files, int number of failed files)
+    """
+    by_path = {}
+    for job in jobs:
+        by_path.setdefault(job['path'], []).append(job)
+
+    failed = 0
+    for file_index, (path, ranges) in enumerate(by_path.items()):
+        pico = make_pico(make_job(path))
+        pico.output_format = output_format
+        pico.reader_backend = reader_backend
+        pico.profile = profile
+
+        print('\nFile {0} of {1}: {2}, {3} range(s)'.format(file_index + 1, len(by_path), path, len(ranges)))
+        time_stamp = time.time()
+        try:
+            pico.read(index=index)
+
+            if not force:
+                pending = []
+                for timecode_range in ranges:
+                    existing = make_pico(timecode_range)
+                    existing.override = pico.range_output_name(timecode_range)
+                    existing.output_format = output_format
+                    if not is_rendered(existing):
+                        pending.append(timecode_range)
+                if len(pending) < len(ranges):
+                    print('{0} range(s) already rendered, skipping them'.format(len(ranges) - len(pending)))
+                ranges = pending
+                if not ranges:
+                    continue
+
+            if unpack:
+                unpack_take(pico)
+
+            stats_path = None
+            if stats:
+                stats_path = pico.output_name.replace('.pico', '') + '.ranges.stats.json'
+
+            render_frames = pico.render_ranges(ranges, instrument=stats, stats_path=stats_path)
+            for frame_index, _ in enumerate(render_frames):
+                total = pico.render_stats.total_frames
+                sys.stdout.write('\r{0} % - {1:.1f} fps'.format((frame_index + 1) * 100 // total,
+                                                                 pico.render_stats.fps()))
+                sys.stdout.flush()
+        except Exception as e:
+            print('\nRender failed: {0}'.format(e))
+            failed += 1
+        else:
+            print('\nRendered in {0} seconds'.format(round(time.time() - time_stamp)))
+
+    return len(by_path), failed
+
+
+def submit_jobs(jobs, port=None, ranges=False, output_format='jpg', reader_backend='pycara',
+                profile='full'):
+    """
+    Queues jobs on a running render daemon, see CyDaemon
+    :param jobs: list of dict
+    :param port: int, defaults to CyDaemon.gPORT
+    :param ranges: bool, the jobs are timecode ranges, they get the output run_selects would give them
+    :param output_format: str, see PicoFile.output_format
+    :param reader_backend: str, see CyReader.READER_BACKENDS
+    :param profile: str, see CyPico.PROFILES
+    :return: int, exit code
+    """
+    from PicoSlicer import CyDaemon  # Builds on CyAsync, which builds on this module
+
+    port = port if port is not None else CyDaemon.gPORT
+    client = CyDaemon.DaemonClient(port=port)
+    if not client.is_running():
+        print('No render daemon on port {0}, start one with --serve'.format(port))
+        return 1
+
+    for job in jobs:
+        # The daemon runs from a directory of its own
+        job = dict(job, path=os.path.abspath(job['path']), output_format=output_format, reader_backend=reader_backend,
+                   profile=profile)
+        if job['override']:
+            job['override'] = os.path.abspath(job['override'])
+        if ranges:
+            pico = CyPico.PicoFile()
+            pico.output_name = job['path']
+            pico.output_format = output_format
+            job['override'] = pico.range_output_name(job)
+        print('Job {0}: {1}'.format(client.submit(job), job['override'] or job['path']))
+    return 0
+
+
+def main(argv=None):
+    from PicoSlicer import CyDaemon  # Builds on CyAsync, which builds on this module
+
+    parser = argparse.ArgumentParser(prog='python -m PicoSlicer',
+                                     description='Render .pico files without the GUI')
+    parser.add_argument('root', nargs='?', help='directory to scan for .pico files')
+    parser.add_argument('-m', '--manifest', help='.json or .csv job manifest')
+    parser.add_argument('-s', '--start-frame', type=int, default=gSTART_FRAME,
+                        help='first frame number for scanned files (default %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='render processes per file (default %(default)s)')
+    parser.add_argument('--transport', default='reader', choices=('reader', 'shared'),
+                        help='workers each open the take, or one process decodes it for all of them through '
+                             'shared memory (default %(default)s)')
+    parser.add_argument('-f', '--format', default='jpg', choices=('jpg', 'ffmpeg', 'opencv'),
+                        help='output format (default %(default)s)')
+    parser.add_argument('-r', '--reader', default='pycara', choices=sorted(CyReader.READER_BACKENDS),
+                        help='reader backend (default %(default)s)')
+    parser.add_argument('-c', '--channels', choices=('separate', 'sheet'),
+                        help='render every enabled camera, to one output each or tiled into a contact sheet')
+    parser.add_argument('-p', '--profile', default='full', choices=sorted(CyPico.PROFILES),
+                        help='output size and quality, proxy is a quick review render (default %(default)s)')
+    parser.add_argument('--unpack', action='store_true',
+                        help='decode every take once into ~/.pico_slicer/raw, renders read frames from there')
+    parser.add_argument('--stats', action='store_true',
+                        help='time every render stage and write <output>.stats.json')
+    parser.add_argument('--force', action='store_true', help='render files that already have output')
+    parser.add_argument('--index', default=CyIndex.gINDEX_PATH,
+                        help='metadata index database (default %(default)s)')
+    parser.add_argument('--no-index', action='store_true', help='probe every file instead of using the index')
+    parser.add_argument('-t', '--timecodes',
+                        help='.edl, or .json or .csv of tc_in, tc_out, start_frame, override and name ranges, '
+                             'rendered from whichever indexed files hold them, one pass per file')
+    parser.add_argument('--edl-fps', type=int, default=CyEdl.gEDL_FPS,
+                        help='framerate the timecodes of an .edl count at, the takes\' render rate '
+                             '(default %(default)s)')
+    parser.add_argument('--covers', metavar='TIMECODE',
+                        help='index the files, print the ones that cover TIMECODE and exit without rendering')
+    parser.add_argument('--serve', action='store_true',
+                        help='run a render daemon on localhost that takes jobs until it is shut down')
+    parser.add_argument('--submit', action='store_true',
+                        help='queue the jobs on the running render daemon instead of rendering them here')
+    parser.add_argument('--port', type=int, default=CyDaemon.gPORT,
+                        help='render daemon port (default %(default)s)')
+    parser.add_argument('--scan-threads', type=int, default=gSCAN_THREADS,
+                        help='threads used to scan the root directory (default %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        index = None if args.no_index else CyIndex.PicoIndex(args.index)
+        CyDaemon.PicoDaemon(port=args.port, workers=args.workers, index=index).serve_forever()
+        return 0
+
+    if args.root is None and args.manifest is None and args.timecodes is None:
+        parser.error('give a root directory, a manifest, or both')
+    if args.no_index and (args.covers is not None or args.timecodes is not None):
+        parser.error('--covers and --timecodes need the index')
+
+    jobs = []
+    if args.manifest is not None:
+        jobs.extend(load_manifest(args.manifest))
+    if args.root is not None:
+        print('Scanning {0} for .pico files...'.format(args.root))
+        jobs.extend(make_job(path, args.start_frame) for path in scan_for_pico_files(args.root, args.scan_threads))
+
+    index = None
+    if not args.no_index:
+        index = CyIndex.PicoIndex(args.index)
+
+    if args.timecodes is not None:
+        # The scanned files only feed the index, the ranges decide what renders
+        index.update([job['path'] for job in jobs], args.reader)
+        index.prune()
+        jobs, unresolved = CyLookup.TakeLookup.from_index(index).jobs(
+            CyLookup.load_ranges(args.timecodes, args.edl_fps))
+        for timecode_range in unresolved:
+            print('No take holds all of {0} - {1}'.format(timecode_range['tc_in'], timecode_range['tc_out']))
+
+    if not jobs:
+        print('Zero pico files could be found, try a different directory, bye.')
+        return 1
+
+    if args.covers is not None:
+        index.update([job['path'] for job in jobs], args.reader)
+        for path in index.covering(args.covers):
+            print(path)
+        return 0
+
+    if args.submit:
+        return submit_jobs(jobs, args.port, args.timecodes is not None, output_format=args.format,
+                           reader_backend=args.reader, profile=args.profile)
+
+    workers = args.workers
+    if args.format != 'jpg':
+        workers = None
+
+    if args.timecodes is not None:
+        # Every file renders all of its ranges in one pass
+        files, failed = run_selects(jobs, output_format=args.format, force=args.force, reader_backend=args.reader,
+                                    stats=args.stats, index=index, profile=args.profile, unpack=args.unpack)
+        print('\n{0} of {1} file(s) rendered'.format(files - failed, files))
+        return 1 if failed else 0
+
+    failed = run_jobs(jobs, workers=workers, output_format=args.format, force=args.force,
+                      reader_backend=args.reader, stats=args.stats, index=index, channels=args.channels,
+                      profile=args.profile, unpack=args.unpack, transport=args.transport)
+    print('\n{0} of {1} file(s) rendered'.format(len(jobs) - failed, len(jobs)))
+    return 1 if failed else 0
@@ -0,0 +1,187 @@
+""" Render checkpoints,
+    Small json manifest next to an image sequence recording which frames made it to disk, what each one shows
+    and a hash of everything else that decides what they look like. An interrupted render picks up where it
+    stopped, a render whose range moved only renders the new frames and renumbers the rest.
+    """
+import os
+import json
+import time
+import hashlib
+import threading
+import collections
+
+# - Globals - #
+gSAVE_INTERVAL = 2.0  # Seconds between manifest saves while a render runs
+
+_JPEG_START = b'\xff\xd8'
+_JPEG_END = b'\xff\xd9'
+
+
+def params_hash(params):
+    """
+    :param params: json serialisable dict, see CyPico.PicoFile.render_params
+    :return: str
+    """
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def is_complete_frame(image_path, size):
+    """
+    Cheap check of a frame on disk, its size and the jpg start and end markers, nothing gets decoded.
+    A frame cut short by a full disk or a crash fails it.
+    :param image_path: str
+    :param size: int, bytes it had when it was written
+    :return: bool
+    """
+    try:
+        if os.path.getsize(image_path) != size or size < 4:
+            return False
+        with open(image_path, 'rb') as f:
+            start = f.read(2)
+            f.seek(-2, os.SEEK_END)
+            return start == _JPEG_START and f.read(2) == _JPEG_END
+    except OSError:
+        return False
+
+
+class RenderCheckpoint(object):
+    def __init__(self, manifest_path, params, keys, save_interval=gSAVE_INTERVAL):
+        """
+        Completed frames of an image sequence, saved every save_interval seconds and on save().
+        Every frame is recorded by file name, relative to the manifest, with the key of what it shows,
+        so frames survive a change of range and only get renamed when their number moves.
+        Safe to update from writer threads.
+        :param manifest_path: str
+        :param params: dict, render parameters every frame shares, frames recorded under others don't count
+        :param keys: dict of image_output_name -> list, what each frame of the current render shows,
+                     see CyPico.PicoFile.frame_keys
+        :param save_interval: float
+        """
+        self.manifest_path = manifest_path
+        self.params_hash = params_hash(params)
+        self.keys = collections.OrderedDict((os.path.basename(name), list(key)) for name, key in keys.items())
+        self.save_interval = save_interval
+
+        self.directory = os.path.dirname(os.path.abspath(manifest_path))
+        self.frames = {}  # file name -> [bytes, key]
+        self.saved_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        """
+        :param manifest_path: str
+        :return: dict or None when there is no readable manifest
+        """
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self):
+        """
+        Picks up the frames of earlier renders with the same parameters, whatever their range was
+        :return: int, number of frames they had recorded
+        """
+        manifest = self.read_manifest(self.manifest_path)
+        if manifest is None or manifest.get('params') != self.params_hash:
+            return 0
+        with self.lock:
+            self.frames = dict(manifest.get('frames', {}))
+            return len(self.frames)
+
+    def _is_whole(self, name):
+        size, _ = self.frames[name]
+        if is_complete_frame(os.path.join(self.directory, name), size):
+            return True
+        with self.lock:
+            self.frames.pop(name, None)
+        return False
+
+    def reuse(self):
+        """
+        Matches the recorded frames against the current render. Frames already under the right name are
+        kept, frames that show the right thing under another number are renamed into place.
+        :return: tuple(set of str, int), file names still to render and number of frames renamed
+        """
+        by_key = {}
+        for name, (_, key) in self.frames.items():
+            by_key.setdefault(tuple(key), []).append(name)
+
+        pending = set()
+        moves = []
+        taken = set()
+        for name, key in self.keys.items():
+            recorded = self.frames.get(name)
+            if recorded is not None and recorded[1] == key and self._is_whole(name):
+                taken.add(name)
+                continue
+
+            source = None
+            for candidate in by_key.get(tuple(key), ()):
+                if candidate not in taken and candidate in self.frames and self._is_whole(candidate):
+                    source = candidate
+                    break
+            if source is None:
+                pending.add(name)
+            else:
+                taken.add(source)
+                moves.append((source, name))
+
+        self._move(moves)
+        return pending, len(moves)
+
+    def _move(self, moves):
+        # Out of the way first, a frame can be moving onto a name another one is moving off
+        staged = []
+        for source, name in moves:
+            temp_name = name + '.moving'
+            os.replace(os.path.join(self.directory, source), os.path.join(self.directory, temp_name))
+            with self.lock:
+                staged.append((temp_name, name, self.frames.pop(source)))
+
+        for temp_name, name, recorded in staged:
+            os.replace(os.path.join(self.directory, temp_name), os.path.join(self.directory, name))
+            with self.lock:
+                self.frames[name] = recorded
+        if moves:
+            self.save()
+
+    def done(self, image_output_name, size):
+        """
+        Records a frame of the current render once it is on disk
+        :param image_output_name: str
+        :param size: int, bytes written
+        :return:
+        """
+        name = os.path.basename(image_output_name)
+        with self.lock:
+            self.frames[name] = [size, self.keys[name]]
+            due = time.monotonic() - self.saved_at >= self.save_interval
+        if due:
+            self.save()
+
+    @property
+    def complete(self):
+        # Frames outside the current range can stay recorded, they are only reused
+        return all(self.frames.get(name, (None, None))[1] == key for name, key in self.keys.items())
+
+    def save(self):
+        """
+        Writes the manifest, through a temporary file so a crash never leaves half of one
+        :return:
+        """
+        with self.lock:
+            manifest = {'params': self.params_hash,
+                        'total_frames': len(self.keys),
+                        'complete': self.complete,
+                        'frames': dict(self.frames)}
+            temp_path = self.manifest_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(temp_path, self.manifest_path)
+            self.saved_at = time.monotonic()
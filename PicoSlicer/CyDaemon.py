@@ -0,0 +1,680 @@
+""" Render daemon,
+    Long running local render worker, so slices don't need someone sat at the UI on the licensed machine.
+    It keeps a process pool and warm readers from one job to the next, takes probe and render jobs over
+    JSON-RPC on localhost and keeps its queue on disk, jobs it was running when it stopped start again, resumed.
+    Every request has to carry the token the daemon leaves in a file only its user can read.
+    """
+import os
+import hmac
+import json
+import time
+import sqlite3
+import secrets
+import asyncio
+import logging
+import itertools
+import threading
+import collections
+import multiprocessing
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PicoSlicer import CyAsync
+from PicoSlicer import CyBatch
+from PicoSlicer import CyIndex
+from PicoSlicer import CyPico
+from PicoSlicer import CyRaw
+from PicoSlicer import CyReader
+
+# - Globals - #
+gHOST = '127.0.0.1'  # Jobs write wherever they are told to, only local clients get to send them
+gPORT = 8723
+gDAEMON_DIR = os.path.join(os.path.expanduser('~'), '.pico_slicer')  # Queue and token files
+gQUEUE_PATH = os.path.join(gDAEMON_DIR, 'daemon.sqlite')
+gMAX_JOBS = 2  # Jobs rendering at once, all of them sharing the process pool
+gWARM_READERS = 8  # Readers kept open between jobs
+gCLIENT_TIMEOUT = 10.0  # Seconds a client waits on a call
+
+# PicoFile attributes a job can set on top of the CyBatch job fields, and the render options it can pass
+gJOB_ATTRIBUTES = ('reader_backend', 'output_format', 'profile', 'video_codec', 'video_fourcc')
+gRENDER_OPTIONS = ('write_threads', 'write_depth', 'instrument', 'stats_path', 'prefetch', 'buffer_pool', 'transport')
+
+gOUTPUT_FORMATS = ('jpg', 'ffmpeg', 'opencv')
+gSTATS_EXTENSIONS = ('.json', '.csv')
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+def token_path(port, token_dir=gDAEMON_DIR):
+    """
+    Where the daemon on port keeps the token its clients have to send
+    :param port: int
+    :param token_dir: str
+    :return: str
+    """
+    return os.path.join(token_dir, 'daemon-{0}.token'.format(port))
+
+
+def write_token(path):
+    """
+    Writes a new random token to a file only the current user can read, replacing any earlier one
+    :param path: str
+    :return: str, the token
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    if os.path.lexists(path):
+        os.remove(path)
+    token = secrets.token_hex(32)
+    # Created exclusively, never through a link left at the same place
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, 'w') as f:
+        f.write(token)
+    return token
+
+
+def read_token(path):
+    """
+    :param path: str
+    :return: str, raises IOError when there is no token, no daemon was started there
+    """
+    with open(path) as f:
+        return f.read().strip()
+
+
+def _check_output_path(path, name, extensions=None):
+    # Jobs are written by the daemon's user, only to places a client spelt out in full
+    if path is None:
+        return
+    if not isinstance(path, str) or not os.path.isabs(path):
+        raise ValueError('{0} has to be an absolute path: {1!r}'.format(name, path))
+    if not os.path.isdir(os.path.dirname(path)):
+        raise ValueError('{0} is not in an existing directory: {1}'.format(name, path))
+    if extensions is not None and os.path.splitext(path)[1].lower() not in extensions:
+        raise ValueError('{0} has to end in {1}: {2}'.format(name, ' or '.join(extensions), path))
+
+
+def check_job(job, options):
+    """
+    Refuses a job before it gets queued, rather than failing once it runs
+    :param job: dict, see PicoDaemon.submit
+    :param options: dict
+    :return:
+    """
+    if not isinstance(job, dict) or not isinstance(options, dict):
+        raise ValueError('A job and its options have to be objects')
+    path = job.get('path')
+    if not isinstance(path, str) or not os.path.isabs(path) or not os.path.isfile(path):
+        raise ValueError('A job needs the absolute path of an existing take: {0!r}'.format(path))
+    _check_output_path(job.get('override'), 'override')
+    _check_output_path(options.get('stats_path'), 'stats_path', gSTATS_EXTENSIONS)
+
+    unknown = set(options) - set(gRENDER_OPTIONS) - {'timeout'}
+    if unknown:
+        raise ValueError('Unknown render options: {0}'.format(', '.join(sorted(unknown))))
+    if job.get('output_format', 'jpg') not in gOUTPUT_FORMATS:
+        raise ValueError('Unknown output format: {0}'.format(job['output_format']))
+    if job.get('reader_backend', 'pycara') not in CyReader.READER_BACKENDS:
+        raise ValueError('Unknown reader backend: {0}'.format(job['reader_backend']))
+    if job.get('profile', 'full') not in CyPico.PROFILES:
+        raise ValueError('Unknown output profile: {0}'.format(job['profile']))
+
+
+def job_from_pico(pico):
+    """
+    A daemon job that renders what a PicoFile set up by the UI would
+    :param pico: CyPico.PicoFile
+    :return: dict
+    """
+    job = CyBatch.make_job(os.path.abspath(pico.file_path), pico.start_frame)
+    if pico.override:
+        job['override'] = os.path.abspath(pico.override)
+    if pico.render_length == 'Slice':
+        job['tc_in'] = str(pico.timecode_in)
+        job['tc_out'] = str(pico.timecode_out)
+    for attribute in gJOB_ATTRIBUTES:
+        job[attribute] = getattr(pico, attribute)
+    return job
+
+
+class JobQueue(object):
+    def __init__(self, queue_path=gQUEUE_PATH):
+        """
+        The daemon's jobs, in a small sqlite database so they survive a restart.
+        Jobs still running when the last daemon stopped are queued again.
+        Safe to use from several threads.
+        :param queue_path: str
+        """
+        self.queue_path = queue_path
+        if os.path.dirname(queue_path):
+            os.makedirs(os.path.dirname(queue_path), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(queue_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                                    'id INTEGER PRIMARY KEY AUTOINCREMENT, job TEXT, options TEXT, state TEXT, '
+                                    'submitted REAL, started REAL, finished REAL, '
+                                    'frames INTEGER, total INTEGER, fps REAL, error TEXT)')
+            self.connection.execute('UPDATE jobs SET state = ?, started = NULL WHERE state = ?', (QUEUED, RUNNING))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job['job'] = json.loads(job['job'])
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def submit(self, job, options):
+        """
+        :param job: dict
+        :param options: dict
+        :return: int, id of the job
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute('INSERT INTO jobs (job, options, state, submitted) VALUES (?, ?, ?, ?)',
+                                             (json.dumps(job), json.dumps(options), QUEUED, time.time()))
+            return cursor.lastrowid
+
+    def next_queued(self):
+        """
+        :return: dict, the oldest queued job, or None
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT * FROM jobs WHERE state = ? ORDER BY id LIMIT 1',
+                                          (QUEUED,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def start(self, job_id):
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE jobs SET state = ?, started = ? WHERE id = ?',
+                                    (RUNNING, time.time(), job_id))
+
+    def finish(self, job_id, state, frames=0, total=None, fps=None, error=None):
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE jobs SET state = ?, finished = ?, frames = ?, total = ?, fps = ?, '
+                                    'error = ? WHERE id = ?',
+                                    (state, time.time(), frames, total, fps, error, job_id))
+
+    def requeue(self, job_id):
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE jobs SET state = ?, started = NULL WHERE id = ?', (QUEUED, job_id))
+
+    def cancel(self, job_id):
+        """
+        :param job_id: int
+        :return: bool, whether the job was still queued
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute('UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state = ?',
+                                             (CANCELLED, time.time(), job_id, QUEUED))
+            return cursor.rowcount > 0
+
+    def get(self, job_id):
+        """
+        :param job_id: int
+        :return: dict, or None when there is no such job
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def jobs(self, state=None, limit=100):
+        """
+        :param state: str, only the jobs in that state
+        :param limit: int, most recent first
+        :return: list of dict
+        """
+        with self.lock:
+            if state is None:
+                rows = self.connection.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+            else:
+                rows = self.connection.execute('SELECT * FROM jobs WHERE state = ? ORDER BY id DESC LIMIT ?',
+                                               (state, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self):
+        """
+        :return: dict of state -> number of jobs
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return dict((state, count) for state, count in rows)
+
+
+class WarmReaders(object):
+    def __init__(self, max_readers=gWARM_READERS):
+        """
+        Readers left open by finished jobs, least recently used dropped first.
+        A reader is handed to one job at a time, and only for as long as its take hasn't changed on disk.
+        :param max_readers: int
+        """
+        self.max_readers = max_readers
+        self.readers = collections.OrderedDict()  # (path, size, mtime_ns, backend) -> reader
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(file_path, reader_backend):
+        try:
+            return tuple(CyRaw.source_stamp(file_path)) + (reader_backend,)
+        except OSError:
+            return None
+
+    def take(self, file_path, reader_backend):
+        """
+        :param file_path: str
+        :param reader_backend: str
+        :return: PicoReaderBackend or PyPico.PicoReader, None when there is no warm one
+        """
+        key = self._key(file_path, reader_backend)
+        with self.lock:
+            return self.readers.pop(key, None)
+
+    def give(self, file_path, reader_backend, reader):
+        key = self._key(file_path, reader_backend)
+        if key is None or reader is None:
+            return
+        with self.lock:
+            self.readers[key] = reader
+            self.readers.move_to_end(key)
+            while len(self.readers) > self.max_readers:
+                self.readers.popitem(last=False)
+
+
+class _DaemonRunner(CyAsync.JobRunner):
+    def __init__(self, max_jobs, readers):
+        super(_DaemonRunner, self).__init__(max_jobs)
+        self.readers = readers
+
+    def _prepare(self, pico, index):
+        total = super(_DaemonRunner, self)._prepare(pico, index)
+        # Indexed takes aren't opened by read, a warm reader saves opening them for the render
+        if pico.file_buffer is None:
+            pico.file_buffer = self.readers.take(pico.file_path, pico.reader_backend)
+        return total
+
+
+class PicoDaemon(object):
+    def __init__(self, host=gHOST, port=gPORT, queue_path=gQUEUE_PATH, workers=None, max_jobs=gMAX_JOBS,
+                 index=None, token_dir=gDAEMON_DIR):
+        """
+        Local render service, see serve_forever. Jobs render in order of submission, max_jobs at a time,
+        every image sequence render resumable and split over the shared pool of workers processes.
+        :param host: str
+        :param port: int
+        :param queue_path: str, see JobQueue
+        :param workers: int, processes of the render pool, defaults to the cpu count
+        :param max_jobs: int
+        :param index: CyIndex.PicoIndex, defaults to CyIndex.default_index
+        :param token_dir: str, where the token clients need is left, see token_path
+        """
+        self.host = host
+        self.port = port
+        self.token_dir = token_dir
+        self.token = None
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.queue = JobQueue(queue_path)
+        self.index = index if index is not None else CyIndex.default_index()
+        self.readers = WarmReaders()
+        self.runner = _DaemonRunner(max_jobs, self.readers)
+
+        self.pool = None
+        self.loop = None
+        self.server = None
+        self.wake = None
+        self.stopping = False
+        self.tasks = {}  # job id -> asyncio.Task
+        self.progress = {}  # job id -> CyAsync.JobProgress
+        self.frames_rendered = 0
+        self.started = time.time()
+
+        self.methods = {'submit': self.submit,
+                        'probe': self.probe,
+                        'job': self.job,
+                        'jobs': self.jobs,
+                        'cancel': self.cancel,
+                        'status': self.status,
+                        'shutdown': self.shutdown}
+
+    def serve_forever(self):
+        """
+        Serves until shutdown is called, from a client or another thread
+        :return:
+        """
+        # Forked before any other thread runs, the workers start with nothing held
+        if self.workers > 1:
+            self.pool = multiprocessing.Pool(self.workers)
+
+        self.loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=self.loop.run_forever, name='PicoDaemonLoop', daemon=True)
+        loop_thread.start()
+        dispatch = asyncio.run_coroutine_threadsafe(self._dispatch(), self.loop)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), _RpcHandler)
+        self.server.pico_daemon = self
+        self.port = self.server.server_address[1]
+        self.token = write_token(token_path(self.port, self.token_dir))
+        logging.info('Pico daemon listening on %s:%d with %d workers', self.host, self.port, self.workers)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self._remove_token()
+
+            # Running jobs are stopped between two frames and queued again for the next daemon
+            dispatch.cancel()
+            asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            loop_thread.join()
+            self.loop.close()
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+            self.queue.close()
+
+    def _remove_token(self):
+        # Unless another daemon took the port over since
+        path = token_path(self.port, self.token_dir)
+        try:
+            if read_token(path) == self.token:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def allowed_hosts(self):
+        """
+        :return: set of str, Host headers a request may carry, anything else was sent to another name
+        """
+        return set('{0}:{1}'.format(host, self.port) for host in (self.host, '127.0.0.1', 'localhost'))
+
+    def is_authorized(self, token):
+        """
+        :param token: str, sent by the client
+        :return: bool
+        """
+        return self.token is not None and token is not None and hmac.compare_digest(token.encode(),
+                                                                                     self.token.encode())
+
+    def _wake(self):
+        if self.wake is not None:
+            self.wake.set()
+
+    async def _dispatch(self):
+        self.wake = asyncio.Event()
+        while True:
+            while len(self.tasks) < self.max_jobs:
+                queued = self.queue.next_queued()
+                if queued is None:
+                    break
+                self.queue.start(queued['id'])
+                self.tasks[queued['id']] = asyncio.ensure_future(self._run(queued))
+            await self.wake.wait()
+            self.wake.clear()
+
+    async def _stop(self):
+        self.stopping = True
+        running = list(self.tasks.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def _make_pico(self, job):
+        pico = CyBatch.make_pico(dict(CyBatch.make_job(job['path']), **job))
+        for attribute in gJOB_ATTRIBUTES:
+            if attribute in job:
+                setattr(pico, attribute, job[attribute])
+        return pico
+
+    async def _run(self, queued):
+        job_id = queued['id']
+        options = dict(queued['options'])
+        timeout = options.pop('timeout', None)
+        pico = self._make_pico(queued['job'])
+        workers = self.workers if pico.output_format == 'jpg' else None
+
+        progress = None
+        state, error = DONE, None
+        try:
+            async for progress in self.runner.render_job(pico, index=self.index, timeout=timeout, workers=workers,
+                                                         pool=self.pool, resume=True, **options):
+                self.progress[job_id] = progress
+                self.frames_rendered += 1
+        except asyncio.CancelledError:
+            state = QUEUED if self.stopping else CANCELLED
+        except asyncio.TimeoutError:
+            state, error = FAILED, 'Timed out after {0} seconds'.format(timeout)
+        except Exception as e:
+            state, error = FAILED, '{0}: {1}'.format(type(e).__name__, e)
+            logging.warning('Job %d failed, %s', job_id, error)
+        finally:
+            self.tasks.pop(job_id, None)
+            self.progress.pop(job_id, None)
+            self.readers.give(pico.file_path, pico.reader_backend, pico.file_buffer)
+            if state == QUEUED:
+                self.queue.requeue(job_id)
+            else:
+                self.queue.finish(job_id, state, progress.frames if progress is not None else 0,
+                                  progress.total if progress is not None else None,
+                                  progress.fps if progress is not None else None, error)
+            self._wake()
+
+    # ------ Methods ------ #
+
+    def call(self, request):
+        """
+        Answers a JSON-RPC 2.0 request
+        :param request: dict
+        :return: dict
+        """
+        reply = {'jsonrpc': '2.0', 'id': request.get('id') if isinstance(request, dict) else None}
+        method = self.methods.get(request.get('method')) if isinstance(request, dict) else None
+        if method is None:
+            reply['error'] = {'code': -32601, 'message': 'Method not found'}
+            return reply
+
+        params = request.get('params') or {}
+        try:
+            reply['result'] = method(*params) if isinstance(params, list) else method(**params)
+        except (TypeError, ValueError, KeyError) as e:
+            reply['error'] = {'code': -32602, 'message': '{0}: {1}'.format(type(e).__name__, e)}
+        except Exception as e:
+            reply['error'] = {'code': -32000, 'message': '{0}: {1}'.format(type(e).__name__, e)}
+        return reply
+
+    def submit(self, job, options=None):
+        """
+        :param job: dict, a CyBatch job plus any of gJOB_ATTRIBUTES
+        :param options: dict, any of gRENDER_OPTIONS and timeout, seconds
+        :return: int, job id
+        """
+        options = dict(options or {})
+        check_job(job, options)
+
+        job_id = self.queue.submit(job, options)
+        self.loop.call_soon_threadsafe(self._wake)
+        return job_id
+
+    def probe(self, path, reader_backend='pycara'):
+        """
+        :param path: str
+        :param reader_backend: str
+        :return: dict, see CyReader.PicoProbe.to_dict
+        """
+        reader, probe = self.index.probe(path, reader_backend)
+        self.readers.give(path, reader_backend, reader)
+        return probe.to_dict()
+
+    def job(self, job_id):
+        """
+        :param job_id: int
+        :return: dict, with the frames, total and fps of a running job as it goes
+        """
+        job = self.queue.get(job_id)
+        if job is None:
+            raise ValueError('No job {0}'.format(job_id))
+        progress = self.progress.get(job_id)
+        if progress is not None:
+            job.update(frames=progress.frames, total=progress.total, fps=progress.fps, eta=progress.eta)
+        return job
+
+    def jobs(self, state=None, limit=100):
+        return self.queue.jobs(state, limit)
+
+    def cancel(self, job_id):
+        """
+        Drops a queued job, or stops a running one between two frames
+        :param job_id: int
+        :return: bool, whether there was anything to cancel
+        """
+        if self.queue.cancel(job_id):
+            return True
+        task = self.tasks.get(job_id)
+        if task is None:
+            return False
+        self.loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def status(self):
+        """
+        :return: dict, queue counts, running jobs and throughput
+        """
+        running = dict(self.progress)
+        return {'jobs': self.queue.counts(),
+                'running': dict((job_id, progress._asdict()) for job_id, progress in running.items()),
+                'fps': sum(progress.fps for progress in running.values()),
+                'frames_rendered': self.frames_rendered,
+                'workers': self.workers,
+                'warm_readers': len(self.readers.readers),
+                'uptime': time.time() - self.started}
+
+    def shutdown(self):
+        # From a request thread, serve_forever only returns once the request is answered
+        threading.Thread(target=self.server.shutdown, name='PicoDaemonShutdown').start()
+        return True
+
+
+class _RpcHandler(BaseHTTPRequestHandler):
+    def _refuse(self, post=True):
+        """
+        Only local clients that can read the daemon's token get in. A web page can make the browser send
+        requests to localhost, those carry an Origin, or a Host of their own once its name points here.
+        :param post: bool, also check the content type and token
+        :return: bool, whether the request was refused, it is answered if so
+        """
+        daemon = self.server.pico_daemon
+        if self.headers.get('Origin') is not None or self.headers.get('Host') not in daemon.allowed_hosts():
+            status, message = 403, 'Only local clients are served'
+        elif post and self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            status, message = 415, 'Requests have to be application/json'
+        elif post and not daemon.is_authorized(self.headers.get('X-Pico-Token')):
+            status, message = 401, 'Missing or wrong daemon token'
+        else:
+            return False
+        self._reply({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32001, 'message': message}}, status)
+        return True
+
+    def do_POST(self):
+        if self._refuse():
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError:
+            self._reply({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+            return
+        self._reply(self.server.pico_daemon.call(request))
+
+    def do_GET(self):
+        # Status for curl, it holds no paths
+        if self._refuse(post=False):
+            return
+        self._reply(self.server.pico_daemon.status())
+
+    def _reply(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+class DaemonClient(object):
+    def __init__(self, host=gHOST, port=gPORT, timeout=gCLIENT_TIMEOUT, token_dir=gDAEMON_DIR):
+        """
+        Talks to a PicoDaemon, as the user it runs as
+        :param host: str
+        :param port: int
+        :param timeout: float, seconds
+        :param token_dir: str, see token_path
+        """
+        self.url = 'http://{0}:{1}/'.format(host, port)
+        self.timeout = timeout
+        self.token_path = token_path(port, token_dir)
+        self.counter = itertools.count(1)
+        # Straight to localhost, whatever proxy the environment sets
+        self.opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def call(self, method, **params):
+        """
+        :param method: str, see PicoDaemon.methods
+        :param params: passed on to the method
+        :return: the method's result
+        """
+        body = json.dumps({'jsonrpc': '2.0', 'id': next(self.counter), 'method': method, 'params': params})
+        # Read every call, a restarted daemon has a new one
+        headers = {'Content-Type': 'application/json', 'X-Pico-Token': read_token(self.token_path)}
+        request = urllib.request.Request(self.url, data=body.encode(), headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                reply = json.load(response)
+        except urllib.error.HTTPError as e:
+            with e:
+                reply = json.load(e)
+        if 'error' in reply:
+            raise RuntimeError(reply['error']['message'])
+        return reply['result']
+
+    def is_running(self):
+        """
+        :return: bool, there is a daemon answering
+        """
+        try:
+            self.call('status')
+        except (OSError, ValueError, RuntimeError):
+            return False
+        return True
+
+    def submit(self, job, **options):
+        """
+        :param job: dict, see PicoDaemon.submit and job_from_pico
+        :param options: see PicoDaemon.submit
+        :return: int, job id
+        """
+        return self.call('submit', job=job, options=options)
+
+    def probe(self, path, reader_backend='pycara'):
+        return self.call('probe', path=path, reader_backend=reader_backend)
+
+    def job(self, job_id):
+        return self.call('job', job_id=job_id)
+
+    def jobs(self, state=None, limit=100):
+        return self.call('jobs', state=state, limit=limit)
+
+    def cancel(self, job_id):
+        return self.call('cancel', job_id=job_id)
+
+    def status(self):
+        return self.call('status')
+
+    def shutdown(self):
+        return self.call('shutdown')
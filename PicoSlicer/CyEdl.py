@@ -0,0 +1,78 @@
+""" EDL selects,
+    Reads the source ranges out of a CMX 3600 style edit decision list,
+    in the same range format CyLookup.load_ranges gives for csv and json.
+    """
+import os
+import re
+
+from PicoSlicer import CyTimecode
+
+# - Globals - #
+gEDL_FPS = 30  # Default framerate of EDL timecodes, the same a 60 fps take renders at, an EDL doesn't record it
+gSTART_FRAME = 1001
+
+_TIMECODE = r'(\d{2}:\d{2}:\d{2}[:;]\d{2})'
+_EVENT = re.compile(r'^(\d+)\s+(\S+)\s+(\S+)\s+(C|D|W\d+|K\S*)\s+(?:\d+\s+)?' +
+                    r'\s+'.join([_TIMECODE] * 4) + r'\s*$')
+_CLIP_NAME = re.compile(r'^\*\s*FROM CLIP NAME:\s*(.+?)\s*$', re.IGNORECASE)
+_FCM = re.compile(r'^FCM:\s*(NON[- ]?)?DROP[- ]?FRAME\s*$', re.IGNORECASE)
+
+
+def load_edl(edl_path, fps=gEDL_FPS, start_frame=gSTART_FRAME):
+    """
+    One range per event, from its source in to the frame before its source out,
+    named after the event's clip name when it has one. The zero length cut that leads into
+    a dissolve or wipe is skipped. Timecodes count drop-frame after an FCM: DROP FRAME line,
+    or when they have a ; before the frames.
+    :param edl_path: str
+    :param fps: int, framerate of the EDL timecodes, an EDL only records whether it is drop-frame
+    :param start_frame: int, first frame number of every range
+    :return: list of dict with tc_in, tc_out, start_frame, override and name
+    """
+    ranges = []
+    names = set()
+    event = None
+    fcm_drop_frame = False
+    with open(edl_path) as f:
+        for line in f:
+            line = line.strip()
+
+            match = _FCM.match(line)
+            if match is not None:
+                fcm_drop_frame = match.group(1) is None
+                continue
+
+            match = _EVENT.match(line)
+            if match is not None:
+                source_in, source_out = match.group(5), match.group(6)
+                if source_in == source_out:
+                    event = None
+                    continue
+
+                # EDL outs are exclusive, the ranges we render are not
+                drop_frame = fcm_drop_frame or ';' in source_out
+                if drop_frame and fps not in CyTimecode.gDROP_FRAME_RATES:
+                    raise ValueError('{0} counts drop-frame, there is no drop-frame at {1} fps'.format(edl_path, fps))
+                CyTimecode.to_frames(source_in, fps, drop_frame)
+                tc_out = CyTimecode.to_timecode(CyTimecode.to_frames(source_out, fps, drop_frame) - 1, fps, drop_frame)
+                event = {'number': match.group(1),
+                         'tc_in': source_in,
+                         'tc_out': tc_out,
+                         'start_frame': start_frame,
+                         'override': None,
+                         'name': None}
+                ranges.append(event)
+                continue
+
+            match = _CLIP_NAME.match(line)
+            if match is not None and event is not None and event['name'] is None:
+                # Clip names are usually file names, and the same clip can be cut in more than once
+                name = os.path.splitext(os.path.basename(match.group(1)))[0]
+                if name in names:
+                    name = '{0}_{1}'.format(name, event['number'])
+                names.add(name)
+                event['name'] = name
+
+    for event in ranges:
+        del event['number']
+    return ranges
@@ -0,0 +1,214 @@
+""" Metadata index,
+    SQLite cache of what PicoFile.read pulls out of every .pico, keyed by path, size and modification time,
+    so a take is only opened again once it changes on disk. Also answers which takes cover a timecode.
+    """
+import os
+import json
+import sqlite3
+import threading
+
+from PicoSlicer import CyReader
+from PicoSlicer import CyTimecode
+
+# - Globals - #
+gINDEX_PATH = os.path.join(os.path.expanduser('~'), '.pico_slicer', 'index.sqlite')
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+class PicoIndex(object):
+    # Bumped whenever the derived columns change meaning, the rows are rebuilt from their stored probes
+    SCHEMA_VERSION = 1
+    SCHEMA = '''CREATE TABLE IF NOT EXISTS takes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    render_fps INTEGER NOT NULL,
+                    drop_frame INTEGER NOT NULL,
+                    tc_first INTEGER NOT NULL,
+                    tc_last INTEGER NOT NULL,
+                    probe TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS takes_timecode ON takes (render_fps, drop_frame, tc_first, tc_last);'''
+
+    def __init__(self, index_path=gINDEX_PATH):
+        """
+        Persistent probe cache, one row per take.
+        A row only counts while the file still has the size and mtime it was probed with.
+        Safe to share between threads.
+        :param index_path: str, sqlite database, ':memory:' for a throwaway index
+        """
+        self.index_path = index_path
+        if index_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        with self.lock:
+            self._migrate()
+
+    def _migrate(self):
+        # Rows of an older schema keep their probes, only what is derived from them gets worked out again
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        rows = []
+        if version != self.SCHEMA_VERSION:
+            exists = self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'takes'")
+            if exists.fetchone() is not None:
+                rows = self.connection.execute('SELECT path, size, mtime_ns, probe FROM takes').fetchall()
+            with self.connection:
+                self.connection.execute('DROP INDEX IF EXISTS takes_timecode')
+                self.connection.execute('DROP TABLE IF EXISTS takes')
+
+        with self.connection:
+            self.connection.executescript(self.SCHEMA)
+            for file_path, size, mtime_ns, probe in rows:
+                self.connection.execute('INSERT INTO takes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (file_path, size, mtime_ns) +
+                                        self.timecode_range(CyReader.PicoProbe.from_dict(json.loads(probe))) +
+                                        (probe,))
+            self.connection.execute('PRAGMA user_version = {0:d}'.format(self.SCHEMA_VERSION))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def _stat(file_path):
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def timecode_range(probe):
+        """
+        First and last timecode a take can render, as frame counts at its render framerate, see CyTimecode.
+        Same arithmetic as PicoFile.read, a capture frame f sits at jam + f / 2.
+        :param probe: CyReader.PicoProbe
+        :return: tuple(int render_fps, int drop_frame, int first, int last)
+        """
+        render_fps, drop_frame = CyTimecode.timecode_rate(probe.raw_fps / 2)
+        jam_frames = CyTimecode.to_frames(probe.jam_timecode, render_fps, drop_frame)
+        first = jam_frames + (probe.frame_zero + 1) // 2
+        last = jam_frames + probe.stop_capture_frame_number // 2
+        return render_fps, int(drop_frame), first, last
+
+    def get(self, file_path):
+        """
+        Cached probe of a take, stale rows are dropped
+        :param file_path: str
+        :return: CyReader.PicoProbe or None
+        """
+        file_path = os.path.abspath(file_path)
+        try:
+            size, mtime_ns = self._stat(file_path)
+        except OSError:
+            self.remove(file_path)
+            return None
+
+        with self.lock:
+            row = self.connection.execute('SELECT size, mtime_ns, probe FROM takes WHERE path = ?',
+                                          (file_path,)).fetchone()
+        if row is None:
+            return None
+        if row[0] != size or row[1] != mtime_ns:
+            self.remove(file_path)
+            return None
+        return CyReader.PicoProbe.from_dict(json.loads(row[2]))
+
+    def put(self, file_path, probe):
+        file_path = os.path.abspath(file_path)
+        size, mtime_ns = self._stat(file_path)
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO takes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (file_path, size, mtime_ns) + self.timecode_range(probe) +
+                                    (json.dumps(probe.to_dict()),))
+
+    def remove(self, file_path):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM takes WHERE path = ?', (os.path.abspath(file_path),))
+
+    def probe(self, file_path, backend='pycara'):
+        """
+        Same as CyReader.probe, but takes the index knows about are not opened at all
+        :param file_path: str
+        :param backend: str, a key of CyReader.READER_BACKENDS
+        :return: tuple(reader or None, CyReader.PicoProbe)
+        """
+        probe = self.get(file_path)
+        if probe is not None:
+            return None, probe
+
+        reader, probe = CyReader.probe(file_path, backend)
+        self.put(file_path, probe)
+        return reader, probe
+
+    def update(self, file_paths, backend='pycara'):
+        """
+        Probes every take that is missing or stale
+        :param file_paths: list of str
+        :param backend: str, a key of CyReader.READER_BACKENDS
+        :return: int, number of takes that had to be opened
+        """
+        opened = 0
+        for file_path in file_paths:
+            if self.get(file_path) is None:
+                self.put(file_path, CyReader.probe(file_path, backend)[1])
+                opened += 1
+        return opened
+
+    def prune(self):
+        """
+        Drops the rows of takes that were deleted or changed since they were probed
+        :return: int, number of rows dropped
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT path, size, mtime_ns FROM takes').fetchall()
+
+        pruned = 0
+        for file_path, size, mtime_ns in rows:
+            try:
+                current = self._stat(file_path)
+            except OSError:
+                current = None
+            if current != (size, mtime_ns):
+                self.remove(file_path)
+                pruned += 1
+        return pruned
+
+    def probes(self):
+        """
+        Every take in the index, without checking them against the disk
+        :return: list of tuple(str path, CyReader.PicoProbe)
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT path, probe FROM takes ORDER BY path').fetchall()
+        return [(path, CyReader.PicoProbe.from_dict(json.loads(probe))) for path, probe in rows]
+
+    def covering(self, timecode):
+        """
+        Takes that hold the given timecode, straight from the index without opening or stating any file
+        :param timecode: str
+        :return: list of str, sorted paths
+        """
+        with self.lock:
+            rates = self.connection.execute('SELECT DISTINCT render_fps, drop_frame FROM takes').fetchall()
+
+            paths = []
+            for render_fps, drop_frame in rates:
+                frames = CyTimecode.to_frames(str(timecode), render_fps, bool(drop_frame))
+                paths.extend(row[0] for row in self.connection.execute(
+                    'SELECT path FROM takes WHERE render_fps = ? AND drop_frame = ? AND tc_first <= ? AND tc_last >= ?',
+                    (render_fps, drop_frame, frames, frames)))
+
+        return sorted(paths)
+
+
+def default_index():
+    """
+    The index at gINDEX_PATH, opened once per process
+    :return: PicoIndex
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = PicoIndex(gINDEX_PATH)
+        return _default_index
@@ -0,0 +1,218 @@
+""" Timecode lookup,
+    Resolves editorial timecode ranges to the takes that hold them, through an interval tree
+    over every take's renderable timecode span, and turns them into render jobs.
+    """
+import csv
+import json
+
+from PicoSlicer import CyEdl
+from PicoSlicer import CyTimecode
+
+# - Globals - #
+gSTART_FRAME = 1001
+
+
+class IntervalTree(object):
+    def __init__(self, intervals):
+        """
+        Static interval tree, stored as an array sorted by start where every midpoint is a node
+        and knows the furthest end below it. Overlap queries take O(log n + matches).
+        :param intervals: list of tuple(int first, int last, value), inclusive bounds
+        """
+        self.intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.max_last = [None] * len(self.intervals)
+        self._build(0, len(self.intervals))
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        furthest = self.intervals[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > furthest:
+                furthest = child
+        self.max_last[mid] = furthest
+        return furthest
+
+    def overlapping(self, first, last):
+        """
+        Every interval that shares at least one frame with first to last
+        :param first: int
+        :param last: int
+        :return: list of tuple(int first, int last, value), sorted by start
+        """
+        found = []
+        self._query(0, len(self.intervals), first, last, found)
+        return found
+
+    def _query(self, lo, hi, first, last, found):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        # Nothing below this node reaches the query
+        if self.max_last[mid] < first:
+            return
+
+        self._query(lo, mid, first, last, found)
+        interval = self.intervals[mid]
+        if interval[0] > last:
+            # Everything right of here starts even later
+            return
+        if interval[1] >= first:
+            found.append(interval)
+        self._query(mid + 1, hi, first, last, found)
+
+
+class TakeSpan(object):
+    def __init__(self, path, probe):
+        """
+        Renderable timecode span of one take, as frame counts at its render framerate, see CyTimecode
+        :param path: str
+        :param probe: CyReader.PicoProbe
+        """
+        self.path = path
+        self.frame_zero = probe.frame_zero
+        self.render_fps, self.drop_frame = CyTimecode.timecode_rate(probe.raw_fps / 2)
+        self.jam_frames = CyTimecode.to_frames(probe.jam_timecode, self.render_fps, self.drop_frame)
+
+        # A capture frame f sits at jam + f / 2, same as PicoFile.read
+        self.first = self.jam_frames + (probe.frame_zero + 1) // 2
+        self.last = self.jam_frames + probe.stop_capture_frame_number // 2
+
+    def frame_offset(self, frames):
+        """
+        Reader frame index of a timecode in this take
+        :param frames: int, Timecode frame count
+        :return: int
+        """
+        return (frames - self.jam_frames) * 2 - self.frame_zero
+
+
+class TakeLookup(object):
+    def __init__(self, probes):
+        """
+        Timecode to take resolver, one interval tree per render framerate and drop-frame flag,
+        frame counts of different timecode rates don't compare
+        :param probes: list of tuple(str path, CyReader.PicoProbe)
+        """
+        by_rate = {}
+        for path, probe in probes:
+            span = TakeSpan(path, probe)
+            by_rate.setdefault((span.render_fps, span.drop_frame), []).append((span.first, span.last, span))
+        self.trees = dict((rate, IntervalTree(spans)) for rate, spans in by_rate.items())
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        :param index: CyIndex.PicoIndex
+        :return: TakeLookup
+        """
+        return cls(index.probes())
+
+    def resolve(self, tc_in, tc_out):
+        """
+        Splits a timecode range over the takes that hold it, a take only covering part of the range
+        gets just that part. Where takes overlap, the one that starts first keeps the shared frames
+        and the next one picks up after it, so every frame of the range comes from a single take.
+        :param tc_in: str
+        :param tc_out: str
+        :return: list of dict with path, render_fps, drop_frame, tc_in, tc_out, frame_offset and offset,
+                 offset being the segment's first frame counted from tc_in, sorted by timecode
+        """
+        overlaps = []
+        for (render_fps, drop_frame), tree in self.trees.items():
+            first = CyTimecode.to_frames(str(tc_in), render_fps, drop_frame)
+            last = CyTimecode.to_frames(str(tc_out), render_fps, drop_frame)
+            for span_first, span_last, span in tree.overlapping(first, last):
+                overlaps.append((max(first, span_first) - first, min(last, span_last) - first, span.path,
+                                 span, first, render_fps, drop_frame))
+        # Takes starting together, the one going on longest first
+        overlaps.sort(key=lambda overlap: (overlap[0], -overlap[1], overlap[2]))
+
+        segments = []
+        covered = 0  # Offset of the first frame no segment has yet
+        for offset, last_offset, _, span, first, render_fps, drop_frame in overlaps:
+            offset = max(offset, covered)
+            if offset > last_offset:
+                continue
+            covered = last_offset + 1
+
+            segment_first = first + offset
+            segment_last = first + last_offset
+            segments.append({'path': span.path,
+                             'render_fps': render_fps,
+                             'drop_frame': drop_frame,
+                             'tc_in': CyTimecode.to_timecode(segment_first, render_fps, drop_frame),
+                             'tc_out': CyTimecode.to_timecode(segment_last, render_fps, drop_frame),
+                             'frame_offset': span.frame_offset(segment_first),
+                             'offset': offset,
+                             'length': segment_last - segment_first + 1})
+        return segments
+
+    def jobs(self, ranges):
+        """
+        Render jobs for a batch of timecode ranges, in the job format CyBatch.make_pico takes.
+        A range split over several takes keeps counting frames from its start frame,
+        so with an override the pieces land in one continuous sequence.
+        Split jobs are numbered by piece, a movie can't be shared between them.
+        :param ranges: list of dict with tc_in, tc_out and optionally start_frame, override and name
+        :return: tuple(list of dict jobs, list of dict ranges nothing covers in full)
+        """
+        jobs = []
+        unresolved = []
+        for timecode_range in ranges:
+            start_frame = int(timecode_range.get('start_frame') or gSTART_FRAME)
+            segments = self.resolve(timecode_range['tc_in'], timecode_range['tc_out'])
+
+            # Frames of the range no take holds
+            covered = 0
+            for segment in sorted(segments, key=lambda segment: segment['offset']):
+                if segment['offset'] > covered:
+                    break
+                covered = max(covered, segment['offset'] + segment['length'])
+            if not segments or covered < self._range_length(timecode_range, segments[0]['render_fps'],
+                                                            segments[0]['drop_frame']):
+                unresolved.append(timecode_range)
+
+            for piece, segment in enumerate(segments):
+                jobs.append({'path': segment['path'],
+                             'tc_in': segment['tc_in'],
+                             'tc_out': segment['tc_out'],
+                             'start_frame': start_frame + segment['offset'],
+                             'override': timecode_range.get('override') or None,
+                             'name': timecode_range.get('name') or None,
+                             'piece': piece + 1 if len(segments) > 1 else None})
+
+        return jobs, unresolved
+
+    @staticmethod
+    def _range_length(timecode_range, render_fps, drop_frame):
+        return (CyTimecode.to_frames(str(timecode_range['tc_out']), render_fps, drop_frame) -
+                CyTimecode.to_frames(str(timecode_range['tc_in']), render_fps, drop_frame) + 1)
+
+
+def load_ranges(ranges_path, edl_fps=CyEdl.gEDL_FPS):
+    """
+    Reads timecode ranges, a .json list of objects, a .csv with a header row or an .edl.
+    Recognised fields are tc_in, tc_out, start_frame, override and name, the first two are required.
+    :param ranges_path: str
+    :param edl_fps: int, framerate the timecodes of an .edl count at
+    :return: list of dict
+    """
+    if ranges_path.lower().endswith('.edl'):
+        return CyEdl.load_edl(ranges_path, edl_fps)
+    elif ranges_path.endswith('.json'):
+        with open(ranges_path) as f:
+            rows = json.load(f)
+    else:
+        with open(ranges_path, newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    return [{'tc_in': row['tc_in'],
+             'tc_out': row['tc_out'],
+             'start_frame': int(row.get('start_frame') or gSTART_FRAME),
+             'override': row.get('override') or None,
+             'name': row.get('name') or None} for row in rows]
@@ -0,0 +1,196 @@
+""" Burn-in overlay,
+    Pre-renders Hershey glyphs once per font, scale and thickness, then builds every frame's
+    timecode box by blitting glyph masks into the overlay region instead of calling cv2.putText.
+    """
+import cv2
+import numpy as np
+
+
+class GlyphAtlas(object):
+    def __init__(self, font=cv2.FONT_HERSHEY_DUPLEX, scale=1.0, thickness=2):
+        """
+        Glyph masks for one font, rasterised the first time each character is used.
+        Characters are laid out with the same advances cv2.putText uses, so a composed
+        string matches a putText of the whole string.
+        :param font: int, cv2 Hershey font
+        :param scale: float
+        :param thickness: int
+        """
+        self.font = font
+        self.scale = scale
+        self.thickness = thickness
+
+        (_, height), baseline = cv2.getTextSize('0123456789:', font, scale, thickness)
+        self.pad = thickness + 2
+        self.ascent = height + self.pad
+        self.descent = baseline + self.pad
+
+        self.glyphs = {}  # char -> (uint8 mask, left offset from the pen position)
+        self.advances = {}
+
+    def advance(self, char):
+        if char not in self.advances:
+            single = cv2.getTextSize(char, self.font, self.scale, self.thickness)[0][0]
+            double = cv2.getTextSize(char * 2, self.font, self.scale, self.thickness)[0][0]
+            self.advances[char] = double - single
+        return self.advances[char]
+
+    def glyph(self, char):
+        if char not in self.glyphs:
+            width = self.advance(char) + self.pad * 2
+            tile = np.zeros((self.ascent + self.descent, width), dtype=np.uint8)
+            cv2.putText(tile, char, (self.pad, self.ascent), self.font, self.scale, 255, self.thickness)
+            self.glyphs[char] = (tile, -self.pad)
+        return self.glyphs[char]
+
+    def width(self, text):
+        return sum(self.advance(char) for char in text)
+
+    def compose(self, text, base=None, start=0, stop=None):
+        """
+        Mask of a string, its pen origin sits at (-left, ascent).
+        Only characters start to stop are drawn, on top of a copy of base if given,
+        so the mask of a prefix can be reused for every string that shares it.
+        :param text: str
+        :param base: uint8 numpy array, mask of text[:start] composed for the same layout
+        :param start: int
+        :param stop: int or None
+        :return: tuple(uint8 numpy array, int left)
+        """
+        shape = (self.ascent + self.descent, self.width(text) + self.pad * 2)
+        if base is not None and base.shape == shape:
+            mask = base.copy()
+        else:
+            mask = np.zeros(shape, dtype=np.uint8)
+            start = 0
+
+        pen = self.pad + self.width(text[:start])
+        for char in text[start:stop]:
+            glyph, left = self.glyph(char)
+            x = pen + left
+            region = mask[:, x:x + glyph.shape[1]]
+            np.maximum(region, glyph, out=region)
+            pen += self.advance(char)
+        return mask, -self.pad
+
+
+class BurnInOverlay(object):
+    # Layout of the original burn in at scale 1, relative to the text origin
+    BOX = (-4, -30, 200, 10)
+    LINE_HEIGHT = 40
+
+    def __init__(self, position=(20, 70), scale=1.0, thickness=2, font=cv2.FONT_HERSHEY_DUPLEX,
+                 fields=('timecode',), filename=None, after_rotation=False,
+                 color=(255, 255, 255), background=(0, 0, 0)):
+        """
+        Draws the burn in boxes, one line per field, from a glyph atlas.
+        With the defaults the pixels are the same as the old cv2.rectangle and cv2.putText burn in.
+        :param position: tuple, text origin of the first line
+        :param scale: float, font and box scale
+        :param thickness: int
+        :param font: int, cv2 Hershey font
+        :param fields: tuple, any of 'timecode', 'frame' and 'filename', top to bottom
+        :param filename: str, shown by the 'filename' field
+        :param after_rotation: bool, draw on the rotated frame so the text reads upright
+        :param color: tuple, text colour
+        :param background: tuple or None, box colour, None draws no box
+        """
+        self.position = position
+        self.scale = scale
+        self.fields = tuple(fields)
+        self.filename = filename
+        self.after_rotation = after_rotation
+        self.color = color
+        self.background = background
+
+        self.atlas = GlyphAtlas(font, scale, thickness)
+        self.static = {}  # Composed masks of text that doesn't change between frames
+        self.prefixes = {}  # field -> (prefix text, mask), the start of a timecode only changes once a second
+        self.fills = {}  # Solid colour tiles the masks are copied from
+
+    def __getstate__(self):
+        # Worker processes rebuild the glyph masks on their side
+        state = dict(self.__dict__)
+        state['atlas'] = GlyphAtlas(self.atlas.font, self.atlas.scale, self.atlas.thickness)
+        state['static'] = {}
+        state['prefixes'] = {}
+        state['fills'] = {}
+        return state
+
+    def scaled(self, factor):
+        """
+        The same overlay laid out for frames resized by factor
+        :param factor: float
+        :return: BurnInOverlay, self when factor is 1
+        """
+        if factor == 1:
+            return self
+        return BurnInOverlay(position=tuple(int(round(v * factor)) for v in self.position),
+                             scale=self.scale * factor,
+                             thickness=max(1, int(round(self.atlas.thickness * factor))),
+                             font=self.atlas.font, fields=self.fields, filename=self.filename,
+                             after_rotation=self.after_rotation, color=self.color, background=self.background)
+
+    def _text(self, field, timecode, frame_number):
+        if field == 'timecode':
+            return timecode
+        elif field == 'frame':
+            return str(frame_number)
+        elif field == 'filename':
+            return self.filename or ''
+        raise ValueError('Unknown burn in field: {0}'.format(field))
+
+    def _mask(self, field, text):
+        if field == 'filename':
+            if text not in self.static:
+                self.static[text] = self.atlas.compose(text)
+            return self.static[text]
+
+        # Everything but the last two characters gets reused while it doesn't change
+        start = max(len(text) - 2, 0)
+        prefix = text[:start]
+        cached_prefix, base = self.prefixes.get(field, (None, None))
+        if cached_prefix != prefix:
+            base, _ = self.atlas.compose(text, stop=start)
+            self.prefixes[field] = (prefix, base)
+        return self.atlas.compose(text, base, start)
+
+    def __call__(self, frame, timecode, frame_number=None):
+        """
+        Draws the overlay in place
+        :param frame: numpy array
+        :param timecode: str
+        :param frame_number: int, output frame number for the 'frame' field
+        :return: numpy array
+        """
+        (ox, oy) = self.position
+        for line, field in enumerate(self.fields):
+            text = self._text(field, timecode, frame_number)
+            y = oy + int(round(line * self.LINE_HEIGHT * self.scale))
+
+            if self.background is not None:
+                (bx0, by0, bx1, by1) = [int(round(v * self.scale)) for v in self.BOX]
+                bx1 = max(bx1, self.atlas.width(text) - bx0)
+                cv2.rectangle(frame, (ox + bx0, y + by0), (ox + bx1, y + by1), self.background, -1)
+
+            mask, left = self._mask(field, text)
+            self._blit(frame, mask, ox + left, y - self.atlas.ascent)
+
+        return frame
+
+    def _blit(self, frame, mask, x, y):
+        # Clip the mask against the frame, the overlay can hang off the edge like putText does
+        (h, w) = mask.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        roi = frame[y0:y1, x0:x1]
+        key = (roi.shape, roi.dtype)
+        if key not in self.fills:
+            # Filled before it's shared, channels can be burnt in from several threads
+            fill = np.empty_like(roi)
+            fill[:] = self.color if frame.ndim == 3 else self.color[0]
+            self.fills[key] = fill
+        cv2.copyTo(self.fills[key], mask[y0 - y:y1 - y, x0 - x:x1 - x], roi)
@@ -2,20 +2,1088 @@ import sys
 import os
 import re
 import time
+import queue
+import shutil
+import tempfile
 import datetime
 import subprocess
 import logging
+import threading
+import functools
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
-from timecode import Timecode
 
-try:
-    from PyCara import PyPico
-except RuntimeError:
-    print('No valid CaraPost license found, render functions are disabled')
-except ModuleNotFoundError:
-    print('Could not find PyCara installed')
+from PicoSlicer import CyReader
+from PicoSlicer import CyOverlay
+from PicoSlicer import CyStats
+from PicoSlicer import CyCheckpoint
+from PicoSlicer import CyTimecode
+from PicoSlicer import CyRaw
+
+# - Globals - #
+gFFMPEG = 'ffmpeg'
+gFRAME_CACHE_BYTES = 512 * 1024 * 1024  # Budget of the cache shared_frame_cache hands out
+gPREFETCH_DEPTH = 4  # Frames decoded ahead of a serial render to start with, 0 turns read-ahead off
+gPREFETCH_MAX_DEPTH = 16
+gSHARED_FRAME_BYTES = 256 * 1024 * 1024  # Budget of the slots a shared memory render passes frames through
+gSLOTS_PER_WORKER = 2  # One frame being rendered and one waiting, per render process
+gSHARED_POLL_INTERVAL = 0.5  # Seconds between checks that the processes of a shared memory render are alive
+gPOOL_CHUNK_FRAMES = 8  # Most frames of a task in a pool shared with other renders, see PicoFile.render
+gPOOL_CHUNKS_PER_WORKER = 2  # Tasks of one render queued in a shared pool at a time, per worker
+gMIN_BURN_IN_SCALE = 0.5  # Smallest the burn in shrinks with a profile before the timecode gets hard to read
+
+_shared_frame_cache = None
+_shared_frame_cache_lock = threading.Lock()
+
+
+# - Frame operations - #
+
+class FrameRotator(object):
+    # Clockwise quarter turns to their lossless OpenCV rotation
+    QUARTER_TURNS = {1: cv2.ROTATE_90_CLOCKWISE,
+                     2: cv2.ROTATE_180,
+                     3: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+    def __init__(self, angle):
+        """
+        Rotates frames clockwise by angle degrees, keeping the whole frame in bounds.
+        Multiples of 90 degrees are a lossless transpose/flip, anything else falls back to
+        an affine warp whose matrix is computed once per frame geometry.
+        :param angle: float, degrees clockwise
+        """
+        self.angle = angle
+        self.rotate_code = None
+        self.quarter_turns = None
+
+        if not angle % 90:
+            self.quarter_turns = int(angle // 90) % 4
+            self.rotate_code = self.QUARTER_TURNS.get(self.quarter_turns)
+
+        # Cached affine geometry, only used for arbitrary angles
+        self.source_shape = None
+        self.matrix = None
+        self.output_size = None
+
+    def __call__(self, image, dst=None):
+        """
+        :param image: numpy array
+        :param dst: numpy array of output_shape to rotate into, a new array is allocated without one
+        :return: numpy array, dst when given, image itself when there is nothing to rotate
+        """
+        if self.quarter_turns is not None:
+            if self.rotate_code is None:
+                return image
+            return cv2.rotate(image, self.rotate_code, dst=dst)
+
+        if image.shape[:2] != self.source_shape:
+            self._prepare(image.shape[:2])
+
+        # perform the actual rotation and return the image
+        return cv2.warpAffine(image, self.matrix, self.output_size, dst=dst)
+
+    def output_shape(self, source_shape):
+        """
+        Shape of a rotated frame, without rotating anything
+        :param source_shape: tuple, shape of the decoded frame
+        :return: tuple
+        """
+        (h, w) = source_shape[:2]
+        if self.quarter_turns is not None:
+            if self.quarter_turns % 2:
+                return (w, h) + tuple(source_shape[2:])
+            return tuple(source_shape)
+
+        if source_shape[:2] != self.source_shape:
+            self._prepare(source_shape[:2])
+        (nW, nH) = self.output_size
+        return (nH, nW) + tuple(source_shape[2:])
+
+    def _prepare(self, source_shape):
+        # grab the dimensions of the image and then determine the
+        # center
+        (h, w) = source_shape
+        (cX, cY) = (w // 2, h // 2)
+
+        # grab the rotation matrix (applying the negative of the
+        # angle to rotate clockwise), then grab the sine and cosine
+        # (i.e., the rotation components of the matrix)
+        M = cv2.getRotationMatrix2D((cX, cY), -self.angle, 1.0)
+        cos = np.abs(M[0, 0])
+        sin = np.abs(M[0, 1])
+
+        # compute the new bounding dimensions of the image
+        nW = int((h * sin) + (w * cos))
+        nH = int((h * cos) + (w * sin))
+
+        # adjust the rotation matrix to take into account translation
+        M[0, 2] += (nW / 2) - cX
+        M[1, 2] += (nH / 2) - cY
+
+        self.source_shape = source_shape
+        self.matrix = M
+        self.output_size = (nW, nH)
+
+
+class FrameBufferPool(object):
+    def __init__(self, count=1):
+        """
+        Preallocated output frames, so rotation writes into the same memory every frame
+        instead of allocating. A frame has to be released once it has been written before it is
+        handed out again, acquire blocks while every frame is still out.
+        :param count: int, at least one more than the frames that can be waiting to be written
+        """
+        self.count = max(1, count)
+        self.buffers = []
+        self.free = []
+        self.condition = threading.Condition()
+
+    def acquire(self, shape, dtype):
+        """
+        :param shape: tuple
+        :param dtype: numpy dtype
+        :return: numpy array, contents undefined
+        """
+        with self.condition:
+            if not self.buffers or self.buffers[0].shape != tuple(shape) or self.buffers[0].dtype != dtype:
+                # New geometry, frames of the old one still being written are forgotten on release
+                self.buffers = [np.empty(shape, dtype=dtype) for _ in range(self.count)]
+                self.free = list(self.buffers)
+
+            while not self.free:
+                self.condition.wait()
+            return self.free.pop()
+
+    def release(self, buffer):
+        """
+        Hands a frame back, anything that didn't come from the pool is ignored
+        :param buffer: numpy array
+        :return:
+        """
+        with self.condition:
+            if any(buffer is pooled for pooled in self.buffers) and not any(buffer is free for free in self.free):
+                self.free.append(buffer)
+                self.condition.notify()
+
+    def for_frame(self, frame, rotator):
+        """
+        A frame for the rotated version of frame, None when the rotator has nothing to do
+        :param frame: numpy array
+        :param rotator: FrameRotator
+        :return: numpy array or None
+        """
+        if rotator.quarter_turns is not None and rotator.rotate_code is None:
+            return None
+        return self.acquire(rotator.output_shape(frame.shape), frame.dtype)
+
+
+class OutputProfile(object):
+    def __init__(self, scale=1.0, quality=100, grayscale=False, interpolation=cv2.INTER_AREA):
+        """
+        What a render writes, frames are scaled and converted as soon as they are decoded
+        so the burn in, the rotation and the encode all work on the smaller frame.
+        :param scale: float, output size relative to the decoded frame
+        :param quality: int, 0 to 100 jpg quality
+        :param grayscale: bool, write single channel frames
+        :param interpolation: int, cv2 interpolation used to scale
+        """
+        self.scale = scale
+        self.quality = quality
+        self.grayscale = grayscale
+        self.interpolation = interpolation
+
+    def __repr__(self):
+        return 'OutputProfile(scale={0}, quality={1}, grayscale={2})'.format(self.scale, self.quality,
+                                                                            self.grayscale)
+
+    @property
+    def is_identity(self):
+        # Frames go through untouched, only the encode can differ
+        return self.scale == 1 and not self.grayscale
+
+    def __call__(self, frame):
+        """
+        :param frame: numpy array, freshly decoded
+        :return: numpy array, frame itself when there is nothing to do
+        """
+        if self.scale != 1:
+            (h, w) = frame.shape[:2]
+            size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+            frame = cv2.resize(frame, size, interpolation=self.interpolation)
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def burn_in(self, overlay):
+        """
+        The burn in to draw on frames of this profile, shrunk along with them down to gMIN_BURN_IN_SCALE
+        :param overlay: CyOverlay.BurnInOverlay
+        :return: CyOverlay.BurnInOverlay
+        """
+        return overlay.scaled(max(self.scale, gMIN_BURN_IN_SCALE))
+
+
+# Presets the UI and the command line pick from by name
+PROFILES = {'full': OutputProfile(),
+            'proxy': OutputProfile(scale=0.5, quality=75, grayscale=True),
+            'thumbnail': OutputProfile(scale=0.25, quality=60, grayscale=True)}
+
+
+def output_profile(profile):
+    """
+    :param profile: str, a key of PROFILES, or an OutputProfile
+    :return: OutputProfile
+    """
+    if isinstance(profile, OutputProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('Unknown output profile: {0}'.format(profile))
+
+
+def process_frame(frame, timecode, frame_number, rotator, overlay, buffers=None, profile=None):
+    """
+    Burns the timecode in and rotates a freshly decoded frame
+    :param frame: numpy array from PicoReader.get_image
+    :param timecode: str
+    :param frame_number: int, output frame number
+    :param rotator: FrameRotator
+    :param overlay: CyOverlay.BurnInOverlay
+    :param buffers: FrameBufferPool, rotate into one of its frames instead of a new array
+    :param profile: OutputProfile, scales the frame before anything else touches it
+    :return: numpy array
+    """
+    if profile is not None:
+        frame = profile(frame)
+
+    # Manipulate the frame
+    if not overlay.after_rotation:
+        overlay(frame, timecode, frame_number)
+
+    # Rotate the frame 90 degrees
+    frame = rotator(frame, buffers.for_frame(frame, rotator) if buffers is not None else None)
+
+    if overlay.after_rotation:
+        overlay(frame, timecode, frame_number)
+
+    return frame
+
+
+def process_frame_timed(reader, render_index, timecode, frame_number, rotator, overlay, stats, frame=None,
+                        buffers=None, profile=None):
+    """
+    Same as reading a frame and running process_frame, recording every stage in stats
+    :param reader: PicoReader
+    :param render_index: int
+    :param timecode: str
+    :param frame_number: int, output frame number
+    :param rotator: FrameRotator
+    :param overlay: CyOverlay.BurnInOverlay
+    :param stats: CyStats.RenderStats
+    :param frame: numpy array, an already decoded frame, skips the read
+    :param buffers: FrameBufferPool, rotate into one of its frames instead of a new array
+    :param profile: OutputProfile, scales the frame before anything else touches it
+    :return: numpy array
+    """
+    if frame is None:
+        time_stamp = time.perf_counter()
+        frame = reader.get_image(render_index)
+        stats.add('read', time.perf_counter() - time_stamp)
+
+    if profile is not None:
+        time_stamp = time.perf_counter()
+        frame = profile(frame)
+        stats.add('scale', time.perf_counter() - time_stamp)
+
+    if not overlay.after_rotation:
+        time_stamp = time.perf_counter()
+        overlay(frame, timecode, frame_number)
+        stats.add('overlay', time.perf_counter() - time_stamp)
+
+    time_stamp = time.perf_counter()
+    frame = rotator(frame, buffers.for_frame(frame, rotator) if buffers is not None else None)
+    stats.add('rotate', time.perf_counter() - time_stamp)
+
+    if overlay.after_rotation:
+        time_stamp = time.perf_counter()
+        overlay(frame, timecode, frame_number)
+        stats.add('overlay', time.perf_counter() - time_stamp)
+
+    return frame
+
+
+def write_frame(frame, image_output_name, quality=100):
+    """
+    Saves a processed frame to disk
+    :param frame: numpy array
+    :param image_output_name: str
+    :param quality: int, 0 to 100 jpg quality
+    :return: int, bytes written
+    """
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise IOError('Could not encode {0}'.format(image_output_name))
+    buffer.tofile(image_output_name)
+    return buffer.size
+
+
+class ImageSequenceWriter(object):
+    ordered = False  # Frames carry their own file names, any thread can write any frame
+
+    def __init__(self, quality=100):
+        """
+        Default render output, one jpg per frame
+        :param quality: int, 0 to 100 jpg quality
+        """
+        self.quality = quality
+
+    def write(self, frame, image_output_name):
+        return write_frame(frame, image_output_name, self.quality)
+
+    def close(self):
+        return 0
+
+
+class FFmpegPipeWriter(object):
+    ordered = True
+
+    def __init__(self, video_output_name, fps, codec='libx264', crf=0, preset='ultrafast', pix_fmt='yuv422p'):
+        """
+        Streams raw BGR frames straight into an ffmpeg process over stdin,
+        no intermediate image sequence is written.
+        ffmpeg is started on the first frame, once the frame geometry is known.
+        :param video_output_name: str
+        :param fps: int or float, encoding framerate
+        :param codec: str, ffmpeg video codec
+        :param crf: int or None, constant rate factor, None to leave it to the codec
+        :param preset: str or None, encoder preset, None to leave it to the codec
+        :param pix_fmt: str, output pixel format
+        """
+        self.video_output_name = video_output_name
+        self.fps = fps
+        self.codec = codec
+        self.crf = crf
+        self.preset = preset
+        self.pix_fmt = pix_fmt
+
+        self.process = None
+
+    def _start(self, frame):
+        (h, w) = frame.shape[:2]
+        input_pix_fmt = 'gray' if frame.ndim == 2 else 'bgr24'
+
+        command = [gFFMPEG, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', input_pix_fmt, '-s', '{0}x{1}'.format(w, h), '-r', str(self.fps),
+                   '-i', '-',
+                   '-vcodec', self.codec, '-pix_fmt', self.pix_fmt]
+        if self.crf is not None:
+            command += ['-crf', str(self.crf)]
+        if self.preset is not None:
+            command += ['-preset', self.preset]
+        command.append(self.video_output_name)
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.PIPE)
+
+    def write(self, frame, image_output_name=None):
+        if self.process is None:
+            self._start(frame)
+
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            self.close()
+            raise RuntimeError('ffmpeg stopped reading frames for {0}'.format(self.video_output_name))
+
+    def close(self):
+        if self.process is None:
+            return 0
+
+        process = self.process
+        self.process = None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        err = process.stderr.read()
+        process.wait()
+
+        if process.returncode:
+            raise RuntimeError('ffmpeg failed encoding {0}: {1}'.format(self.video_output_name,
+                                                                       err.decode(errors='replace').strip()))
+        return os.path.getsize(self.video_output_name)
+
+
+class OpenCVVideoWriter(object):
+    ordered = True
+
+    def __init__(self, video_output_name, fps, fourcc='mp4v'):
+        """
+        Encodes frames with cv2.VideoWriter, for machines without an ffmpeg binary.
+        The writer is opened on the first frame, once the frame geometry is known.
+        :param video_output_name: str
+        :param fps: int or float, encoding framerate
+        :param fourcc: str, four character codec code
+        """
+        self.video_output_name = video_output_name
+        self.fps = fps
+        self.fourcc = fourcc
+
+        self.writer = None
+
+    def write(self, frame, image_output_name=None):
+        if self.writer is None:
+            (h, w) = frame.shape[:2]
+            self.writer = cv2.VideoWriter(self.video_output_name, cv2.VideoWriter_fourcc(*self.fourcc),
+                                          self.fps, (w, h), frame.ndim == 3)
+            if not self.writer.isOpened():
+                raise RuntimeError('OpenCV could not open {0} for writing'.format(self.video_output_name))
+
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is None:
+            return 0
+
+        self.writer.release()
+        self.writer = None
+        return os.path.getsize(self.video_output_name)
+
+
+class InstrumentedWriter(object):
+    def __init__(self, writer, stats):
+        """
+        Records write latency and bytes written of another writer
+        :param writer: ImageSequenceWriter, FFmpegPipeWriter or OpenCVVideoWriter
+        :param stats: CyStats.RenderStats
+        """
+        self.writer = writer
+        self.stats = stats
+        self.ordered = writer.ordered
+
+    def write(self, frame, image_output_name):
+        time_stamp = time.perf_counter()
+        size = self.writer.write(frame, image_output_name)
+        self.stats.add('write', time.perf_counter() - time_stamp)
+        if size:
+            self.stats.add_bytes(size)
+        return size
+
+    def close(self):
+        # Video writers only know their size once the file is finalised
+        size = self.writer.close()
+        if size:
+            self.stats.add_bytes(size)
+        return size
+
+
+class CheckpointWriter(object):
+    def __init__(self, writer, checkpoint):
+        """
+        Records every frame another writer finishes in a render checkpoint
+        :param writer: ImageSequenceWriter or InstrumentedWriter
+        :param checkpoint: CyCheckpoint.RenderCheckpoint
+        """
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.ordered = writer.ordered
+
+    def write(self, frame, image_output_name):
+        size = self.writer.write(frame, image_output_name)
+        self.checkpoint.done(image_output_name, size)
+        return size
+
+    def close(self):
+        return self.writer.close()
+
+
+class WriteBehindWriter(object):
+    def __init__(self, writer, threads=2, depth=8, on_written=None):
+        """
+        Hands frames to a thread pool that owns encoding and writing, so the render loop
+        doesn't wait on the filesystem. At most depth frames are in flight, after that
+        write() blocks until a slot frees up.
+        Video writers need their frames in order, so they always get a single thread.
+        :param writer: ImageSequenceWriter, FFmpegPipeWriter, OpenCVVideoWriter or InstrumentedWriter
+        :param threads: int, writer threads for image sequences
+        :param depth: int, maximum number of queued frames
+        :param on_written: callable, called with every frame once the writer is done with it
+        """
+        self.writer = writer
+        self.on_written = on_written
+        self.ordered = writer.ordered
+        if writer.ordered:
+            threads = 1
+
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.BoundedSemaphore(max(depth, threads))
+        self.error = None
+
+    def _done(self, future, frame):
+        if self.error is None and future.exception() is not None:
+            self.error = future.exception()
+        if self.on_written is not None:
+            self.on_written(frame)
+        self.slots.release()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    def write(self, frame, image_output_name):
+        self._check()
+        self.slots.acquire()
+        future = self.executor.submit(self.writer.write, frame, image_output_name)
+        future.add_done_callback(lambda done: self._done(done, frame))
+
+    def close(self):
+        """
+        Blocks until every queued frame has been flushed, then raises the first write error if any
+        :return:
+        """
+        self.executor.shutdown(wait=True)
+        try:
+            self._check()
+        finally:
+            size = self.writer.close()
+        return size
+
+
+def contact_sheet(frames, columns=None, background=0):
+    """
+    Tiles same sized frames left to right, top to bottom
+    :param frames: list of numpy array
+    :param columns: int, defaults to the smallest square grid that fits them
+    :param background: int, value of the empty tiles
+    :return: numpy array
+    """
+    if columns is None:
+        columns = int(np.ceil(np.sqrt(len(frames))))
+    rows = -(-len(frames) // columns)
+    (h, w) = frames[0].shape[:2]
+
+    sheet = np.full((rows * h, columns * w) + frames[0].shape[2:], background, dtype=frames[0].dtype)
+    for tile, frame in enumerate(frames):
+        row, column = divmod(tile, columns)
+        sheet[row * h:(row + 1) * h, column * w:(column + 1) * w] = frame
+    return sheet
+
+
+# - Frame cache - #
+
+class FrameCache(object):
+    def __init__(self, max_bytes=gFRAME_CACHE_BYTES):
+        """
+        Decoded frames keyed by (file path, frame index, channel), least recently used ones are evicted
+        once the frames add up to more than max_bytes. Safe to share between threads.
+        Frames get drawn on in place, so callers always get their own copy.
+        :param max_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.frames = collections.OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get(self, file_path, index, channel=None):
+        """
+        :param file_path: str
+        :param index: int
+        :param channel: int or None
+        :return: numpy array copy, or None on a miss
+        """
+        key = (file_path, index, channel)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.hits += 1
+        return frame.copy()
+
+    def put(self, file_path, index, frame, channel=None):
+        """
+        Stores a copy of frame, frames bigger than the whole budget are not kept
+        :param file_path: str
+        :param index: int
+        :param frame: numpy array
+        :param channel: int or None
+        :return:
+        """
+        if frame is None or frame.nbytes > self.max_bytes:
+            return
+        frame = frame.copy()
+
+        key = (file_path, index, channel)
+        with self.lock:
+            previous = self.frames.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self.frames[key] = frame
+            self.bytes += frame.nbytes
+
+            while self.bytes > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self, file_path=None):
+        """
+        :param file_path: str, only drop this file's frames
+        :return:
+        """
+        with self.lock:
+            for key in [key for key in self.frames if file_path is None or key[0] == file_path]:
+                self.bytes -= self.frames.pop(key).nbytes
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions,
+                    'frames': len(self.frames),
+                    'bytes': self.bytes,
+                    'max_bytes': self.max_bytes}
+
+
+class CachedReader(object):
+    def __init__(self, reader, cache, file_path):
+        """
+        Reader wrapper that goes through a FrameCache for get_image, everything else is passed through
+        :param reader: PicoReaderBackend or PyPico.PicoReader
+        :param cache: FrameCache
+        :param file_path: str, the cache key of the reader's file
+        """
+        self.reader = reader
+        self.cache = cache
+        self.file_path = file_path
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+    def get_image(self, index, channel=None):
+        frame = self.cache.get(self.file_path, index, channel)
+        if frame is None:
+            frame = self.reader.get_image(index) if channel is None else self.reader.get_image(index, channel)
+            self.cache.put(self.file_path, index, frame, channel)
+        return frame
+
+
+class PrefetchReader(object):
+    # Frames in a row the queue has to stay full before it gives a slot back
+    SHRINK_AFTER = 64
+
+    def __init__(self, reader, indices, depth=gPREFETCH_DEPTH, max_depth=gPREFETCH_MAX_DEPTH):
+        """
+        Reader wrapper that decodes the frames a render is going to ask for on a background thread,
+        while the render thread overlays, rotates and writes the previous ones.
+        The queue starts depth frames deep and adapts to the measured decode and processing times:
+        when the render has to wait on a decoder that is faster on average, the wait was jitter
+        and the queue doubles, up to max_depth. While the decoder keeps it full, or can't keep up
+        anyway, it shrinks back a frame at a time.
+        Frames asked for out of order are read straight from the reader.
+        :param reader: PicoReaderBackend, PyPico.PicoReader or CachedReader
+        :param indices: list of int, frame indices in the order they will be asked for
+        :param depth: int
+        :param max_depth: int
+        """
+        self.reader = reader
+        self.indices = list(indices)
+        self.depth = max(1, depth)
+        self.min_depth = self.depth
+        self.max_depth = max(self.depth, max_depth)
+
+        self.frames = collections.deque()
+        self.position = 0  # Next entry of indices the render should ask for
+        self.error = None
+        self.done = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.read_lock = threading.Lock()  # Readers aren't known to be thread safe
+
+        # Running averages, in seconds, and counters for the depth
+        self.decode_time = None
+        self.consume_time = None
+        self.returned_at = None
+        self.stalls = 0
+        self.full_streak = 0
+
+        self.thread = threading.Thread(target=self._produce, name='PicoPrefetch', daemon=True)
+        self.thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+    def _produce(self):
+        try:
+            for index in self.indices:
+                with self.condition:
+                    while not self.closed and len(self.frames) >= self.depth:
+                        self.condition.wait()
+                    if self.closed:
+                        return
+
+                time_stamp = time.perf_counter()
+                with self.read_lock:
+                    frame = self.reader.get_image(index)
+                decode_time = time.perf_counter() - time_stamp
+
+                with self.condition:
+                    self.decode_time = self._average(self.decode_time, decode_time)
+                    self.frames.append(frame)
+                    self.condition.notify_all()
+        except Exception as e:
+            with self.condition:
+                self.error = e
+        finally:
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+
+    @staticmethod
+    def _average(average, value):
+        # Slow moving, so the one slow decode that made the render wait doesn't count as the decoder's speed
+        return value if average is None else average * 0.95 + value * 0.05
+
+    def get_image(self, index, channel=None):
+        with self.condition:
+            if channel is None and self.position < len(self.indices) and self.indices[self.position] == index:
+                self.position += 1
+                if self.returned_at is not None:
+                    self.consume_time = self._average(self.consume_time, time.perf_counter() - self.returned_at)
+
+                stalled = False
+                while not self.frames and not self.done:
+                    stalled = True
+                    self.condition.wait()
+                if not self.frames:
+                    raise self.error if self.error is not None else RuntimeError('Prefetch ended early')
+
+                self._adapt(stalled)
+                frame = self.frames.popleft()
+                self.condition.notify_all()
+                self.returned_at = time.perf_counter()
+                return frame
+
+        with self.read_lock:
+            return self.reader.get_image(index) if channel is None else self.reader.get_image(index, channel)
+
+    def _adapt(self, stalled):
+        # Called with the condition held, before the frame is taken off the queue
+        keeps_up = (self.decode_time is not None and self.consume_time is not None and
+                    self.decode_time <= self.consume_time)
+        if stalled:
+            self.stalls += 1
+        if stalled and keeps_up:
+            self.full_streak = 0
+            self.depth = min(self.max_depth, self.depth * 2)
+        elif stalled or len(self.frames) >= self.depth:
+            self.full_streak += 1
+            if self.full_streak >= self.SHRINK_AFTER:
+                self.full_streak = 0
+                self.depth = max(self.min_depth, self.depth - 1)
+        else:
+            self.full_streak = 0
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.frames.clear()
+            self.condition.notify_all()
+        self.thread.join()
+
+
+def shared_frame_cache():
+    """
+    The FrameCache of gFRAME_CACHE_BYTES every PicoFile in the process can share
+    :return: FrameCache
+    """
+    global _shared_frame_cache
+    with _shared_frame_cache_lock:
+        if _shared_frame_cache is None:
+            _shared_frame_cache = FrameCache(gFRAME_CACHE_BYTES)
+        return _shared_frame_cache
+
+
+# - Process pool workers - #
+
+# Every worker process opens its own reader, PicoReader instances can't be shared between processes
+_worker_reader = None
+_worker_rotator = None
+_worker_overlay = None
+_worker_profile = None
+_worker_quality = 100
+_worker_buffers = None
+_worker_instrument = False
+_worker_reader_key = None  # Take the reader of a long lived pool worker is open on, see _render_pooled_chunk
+
+
+def _open_worker_reader(file_path, reader_backend, raw_path=None):
+    open_reader = functools.partial(CyReader.open_reader, file_path, reader_backend)
+    if raw_path is not None:
+        # Every worker maps the same unpacked frames, the take itself is only opened for frames it doesn't hold
+        return CyRaw.RawFrameReader(raw_path, fallback=open_reader)
+    return open_reader()
+
+
+def _init_render_worker(file_path, reader_backend, rotation, overlay, profile, quality, buffer_pool, instrument,
+                        raw_path=None):
+    global _worker_reader
+    _worker_reader = _open_worker_reader(file_path, reader_backend, raw_path)
+    _configure_render_worker(rotation, overlay, profile, quality, buffer_pool, instrument)
+
+
+def _configure_render_worker(rotation, overlay, profile, quality, buffer_pool, instrument):
+    global _worker_rotator, _worker_overlay, _worker_profile, _worker_quality, _worker_buffers, _worker_instrument
+    _worker_rotator = FrameRotator(rotation)
+    _worker_overlay = overlay
+    _worker_profile = profile
+    _worker_quality = quality
+    # Workers write before they rotate the next frame, one buffer is all they need
+    _worker_buffers = FrameBufferPool(1) if buffer_pool else None
+    _worker_instrument = instrument
+
+
+def _render_chunk(chunk, stop_path=None):
+    """
+    Renders a contiguous block of the render plan inside a worker process
+    :param chunk: list of (render_index, timecode, frame_number, image_output_name)
+    :param stop_path: str, the rest of the chunk is dropped once there is a file there
+    :return: tuple(list, dict or None), (image_output_name, bytes) of every frame written
+             and the chunk stats when instrumented
+    """
+    written = []
+    if not _worker_instrument:
+        for render_index, timecode, frame_number, image_output_name in chunk:
+            if stop_path is not None and os.path.exists(stop_path):
+                break
+            frame = _worker_reader.get_image(render_index)
+            frame = process_frame(frame, timecode, frame_number, _worker_rotator, _worker_overlay, _worker_buffers,
+                                  _worker_profile)
+            written.append((image_output_name, write_frame(frame, image_output_name, _worker_quality)))
+            if _worker_buffers is not None:
+                _worker_buffers.release(frame)
+
+        return written, None
+
+    stats = CyStats.RenderStats(len(chunk))
+    writer = InstrumentedWriter(ImageSequenceWriter(_worker_quality), stats)
+    for render_index, timecode, frame_number, image_output_name in chunk:
+        if stop_path is not None and os.path.exists(stop_path):
+            break
+        frame = process_frame_timed(_worker_reader, render_index, timecode, frame_number,
+                                    _worker_rotator, _worker_overlay, stats, buffers=_worker_buffers,
+                                    profile=_worker_profile)
+        written.append((image_output_name, writer.write(frame, image_output_name)))
+        if _worker_buffers is not None:
+            _worker_buffers.release(frame)
+
+    return written, stats.to_dict()
+
+
+def _render_pooled_chunk(task):
+    """
+    _render_chunk for a pool that outlives the render, see PicoFile.render. Every chunk brings its render settings,
+    the worker keeps its reader from one render to the next for as long as they are of the same take.
+    :param task: tuple(reader key, settings, stop path, chunk), settings being the arguments of _init_render_worker,
+                 see _render_chunk for the stop path
+    :return: see _render_chunk
+    """
+    global _worker_reader_key
+    reader_key, settings, stop_path, chunk = task
+    if os.path.exists(stop_path):
+        return [], None
+    if reader_key != _worker_reader_key:
+        _worker_reader_key = None
+        _init_render_worker(*settings)
+        _worker_reader_key = reader_key
+    else:
+        _configure_render_worker(*settings[2:8])
+    return _render_chunk(chunk, stop_path)
+
+
+class _PooledChunks(object):
+    def __init__(self, pool, tasks, window):
+        """
+        Results of _render_pooled_chunk tasks in the order they finish, with at most window of them
+        in the pool at a time, so renders sharing a pool take turns and a stopped one leaves little behind
+        :param pool: multiprocessing.Pool
+        :param tasks: list, see _render_pooled_chunk
+        :param window: int
+        """
+        self.pool = pool
+        self.tasks = collections.deque(tasks)
+        self.window = window
+        self.in_flight = 0
+        self.results = queue.Queue()  # Filled by the pool's result thread
+
+    def _submit(self):
+        while self.tasks and self.in_flight < self.window:
+            self.pool.apply_async(_render_pooled_chunk, (self.tasks.popleft(),),
+                                  callback=self.results.put, error_callback=self.results.put)
+            self.in_flight += 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._submit()
+        if not self.in_flight:
+            raise StopIteration
+        result = self.results.get()
+        self.in_flight -= 1
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def drain(self):
+        """
+        Submits nothing more and waits for the tasks already in the pool
+        :return: list, results of the ones that didn't fail
+        """
+        self.tasks.clear()
+        finished = []
+        while self.in_flight:
+            result = self.results.get()
+            self.in_flight -= 1
+            if not isinstance(result, BaseException):
+                finished.append(result)
+        return finished
+
+
+# ----------------------------------------------------- #
+
+
+class SharedFrameRing(object):
+    def __init__(self, slots, shape, dtype, name=None):
+        """
+        Fixed size frame slots in one block of shared memory. Created when no name is given,
+        attached to by name in the other processes, which then only pass slot numbers around.
+        The creator unlinks the block on close.
+        :param slots: int
+        :param shape: tuple, of every frame
+        :param dtype: numpy dtype
+        :param name: str, shared memory block to attach to
+        """
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=max(1, frame_bytes * slots))
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.memory.buf)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def __getitem__(self, slot):
+        return self.frames[slot]
+
+    def close(self):
+        self.frames = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # A frame is still referenced, the mapping goes with the process
+        if self.owner:
+            self.memory.unlink()
+
+
+def _decode_to_ring(file_path, reader_backend, raw_path, ring_name, slots, shape, dtype, indices, instrument,
+                    work_queue, free_queue, result_queue, workers):
+    """
+    Decoder process of a shared memory render, fills a free slot with every frame in turn
+    and queues its slot for the render processes. Ends with a stop for every render process.
+    """
+    ring = None
+    stats = CyStats.RenderStats() if instrument else None
+    try:
+        reader = _open_worker_reader(file_path, reader_backend, raw_path)
+        ring = SharedFrameRing(slots, shape, dtype, name=ring_name)
+        for position, render_index in enumerate(indices):
+            slot = free_queue.get()
+            time_stamp = time.perf_counter()
+            frame = reader.get_image(render_index)
+            if frame is None or frame.shape != ring.shape:
+                raise ValueError('Frame {0} of {1} is missing or not {2}'.format(render_index, file_path, ring.shape))
+            ring[slot][...] = frame
+            if stats is not None:
+                stats.add('read', time.perf_counter() - time_stamp)
+            work_queue.put((slot, position))
+            frame = None
+    except Exception as e:
+        result_queue.put(('error', '{0}: {1}'.format(type(e).__name__, e)))
+    else:
+        result_queue.put(('done', stats.to_dict() if stats is not None else None))
+    finally:
+        for _ in range(workers):
+            work_queue.put(None)
+        if ring is not None:
+            ring.close()
+
+
+def _render_from_ring(ring_name, slots, shape, dtype, plan, rotation, overlay, profile, quality, buffer_pool,
+                      instrument, work_queue, free_queue, result_queue):
+    """
+    Render process of a shared memory render, burns in, rotates and writes the frames the decoder queues
+    straight out of their slot, then hands the slot back
+    """
+    ring = None
+    stats = CyStats.RenderStats() if instrument else None
+    rotator = FrameRotator(rotation)
+    buffers = FrameBufferPool(1) if buffer_pool else None
+    writer = ImageSequenceWriter(quality)
+    if stats is not None:
+        writer = InstrumentedWriter(writer, stats)
+    try:
+        ring = SharedFrameRing(slots, shape, dtype, name=ring_name)
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            slot, position = item
+            render_index, timecode, frame_number, image_output_name = plan[position]
+
+            frame = ring[slot]
+            if stats is not None:
+                frame = process_frame_timed(None, render_index, timecode, frame_number, rotator, overlay, stats,
+                                            frame=frame, buffers=buffers, profile=profile)
+            else:
+                frame = process_frame(frame, timecode, frame_number, rotator, overlay, buffers, profile)
+            size = writer.write(frame, image_output_name)
+
+            # Without a rotation or a profile the slot itself got written, it is only free now
+            free_queue.put(slot)
+            if buffers is not None:
+                buffers.release(frame)
+            frame = None
+            result_queue.put(('frame', image_output_name, size))
+    except Exception as e:
+        result_queue.put(('error', '{0}: {1}'.format(type(e).__name__, e)))
+    else:
+        result_queue.put(('done', stats.to_dict() if stats is not None else None))
+    finally:
+        if ring is not None:
+            ring.close()
 
 
 class PicoFile(object):
@@ -30,15 +1098,24 @@ class PicoFile(object):
         self.render_length = None
         self.timecode_in = None
         self.timecode_out = None
+        self.drop_frame_override = None  # True or False overrides what CyTimecode.timecode_rate makes of the framerate
 
         # Attributes from Pico file in memory
+        self.reader_backend = 'pycara'  # See CyReader.READER_BACKENDS
         self.file_buffer = None
+        self.frame_cache = None  # FrameCache, decoded frames are kept there for the check and serial renders
+        self.use_raw = True  # Read frames from the take's unpacked file when there is one, see unpack
+        self.raw_dir = None  # Where unpacked files go, defaults to CyRaw.gRAW_DIR
+        self.raw_reader = None
 
+        self.probe = None  # CyReader.PicoProbe
         self.header = None
         self.base_timecode = None
 
         self.channels = None  # Not entirely sure we need this - Scratch that, we do need it.
         self.jam_timecode = None
+        self.jam_frames = None
+        self.drop_frame = None  # Drop-frame timecode, worked out from the measured framerate
         self.raw_fps = None
         self.frame_in = None
         self.frame_out = None
@@ -49,69 +1126,74 @@ class PicoFile(object):
         self.total_frames = None
 
         # Attributes for render action
+        self.rotation = -90  # Degrees clockwise, frames come off the Cara sideways
+        self.burn_in = CyOverlay.BurnInOverlay()
+        self.profile = 'full'  # Key of PROFILES or an OutputProfile, size, quality and colour of what gets written
         self.output_name = None
+        self.output_format = 'jpg'  # 'jpg' image sequence, or 'ffmpeg' / 'opencv' straight to a video file
+        self.render_stats = None  # CyStats.RenderStats of the current or last render
+
+        # Attributes for video output
+        self.video_extension = '.mov'
+        self.video_codec = 'libx264'  # ffmpeg codec, for output_format 'ffmpeg'
+        self.video_fourcc = 'mp4v'  # Four character codec code, for output_format 'opencv'
+        self.video_crf = 0
+        self.video_preset = 'ultrafast'
+        self.video_pix_fmt = 'yuv422p'
         self.render_fps = None
         self.ref_timecode = None
 
-    def read(self):
+    def read(self, index=None):
         """
         Loads a pico file in memory and populates it's attributes
+        :param index: CyIndex.PicoIndex, takes it already knows about are not opened until they render
         :return:
         """
 
-        # Load .pico file in memory
-        self.file_buffer = PyPico.PicoReader()
-        self.file_buffer.open(self.file_path)
+        # Load .pico file in memory, and everything we need from its metadata in one go
+        if index is not None:
+            self.file_buffer, self.probe = index.probe(self.file_path, self.reader_backend)
+        else:
+            self.file_buffer, self.probe = CyReader.probe(self.file_path, self.reader_backend)
+        self.raw_reader = None
 
         # Get .pico file header
-        self.header = self.file_buffer.get_header()
+        self.header = self.probe.header
 
         # Get .pico file last timecode jam
-        self.base_timecode = [str(self.file_buffer.get_frame(0).jamsync_timecode.hours),
-                              str(self.file_buffer.get_frame(0).jamsync_timecode.minutes),
-                              str(self.file_buffer.get_frame(0).jamsync_timecode.seconds),
-                              str(self.file_buffer.get_frame(0).jamsync_timecode.frames)]
-
-        # Get .pico file properties
-        properties = self.file_buffer.get_properties()
+        self.base_timecode = self.probe.jam_timecode
 
         # Get .pico file active channels
-        self.channels = []
-        channel = 0
-        while channel < 4:
-            if properties['channels.{0}.enabled'.format(channel)] == 'True':
-                self.channels.append(channel)
-                channel += 1
-            else:
-                channel += 1
+        self.channels = self.probe.channels
 
         # Get measured framerate
-        self.raw_fps = float(properties['channels.{0}.framerate_measured'.format(self.channels[0])])
+        self.raw_fps = self.probe.raw_fps
 
-        # Timecode operations
-        self.render_fps = int(round(self.raw_fps / 2))
+        # Timecode operations, in whole frame counts at the render framerate. A capture frame f sits at jam + f / 2
+        self.render_fps, self.drop_frame = CyTimecode.timecode_rate(self.raw_fps / 2)
+        if self.drop_frame_override is not None:
+            self.drop_frame = self.drop_frame_override
 
-        jam_timecode_str = ':'.join(self.base_timecode)
-        self.jam_timecode = Timecode(self.render_fps, jam_timecode_str)
+        self.jam_frames = CyTimecode.to_frames(self.base_timecode, self.render_fps, self.drop_frame)
+        self.jam_timecode = self.to_timecode(self.jam_frames)
 
         # Set .pico file render first and last frame, can be full or by tc inputs
         if self.render_length == 'Slice':
-            self.timecode_in = Timecode(self.render_fps, str(self.timecode_in))
-            self.timecode_out = Timecode(self.render_fps, str(self.timecode_out))
-            self.frame_in = (self.timecode_in.frames - self.jam_timecode.frames) * 2
-            self.frame_out = (self.timecode_out.frames - self.jam_timecode.frames) * 2
+            self.frame_in = (self.to_frames(self.timecode_in) - self.jam_frames) * 2
+            self.frame_out = (self.to_frames(self.timecode_out) - self.jam_frames) * 2
 
         else:
-            self.frame_in = int(self.header.start_capture_frame_number)
-            self.frame_out = int(self.header.stop_capture_frame_number)
-            self.timecode_in = Timecode(self.render_fps, frames=int(self.header.start_capture_frame_number))
-            self.timecode_out = Timecode(self.render_fps, frames=int(self.header.stop_capture_frame_number))
+            self.frame_in = self.probe.start_capture_frame_number
+            self.frame_out = self.probe.stop_capture_frame_number
+
+        self.timecode_in = self.to_timecode(self.jam_frames + self.frame_in // 2)
+        self.timecode_out = self.to_timecode(self.jam_frames + self.frame_out // 2)
 
         # Reference Timecode
-        self.ref_timecode = Timecode(self.render_fps, frames=(self.jam_timecode.frames + (self.frame_in / 2)))
+        self.ref_timecode = self.timecode_in
 
         # Get .pico file "zero" frame from the burn in
-        self.frame_zero = int(self.file_buffer.read_burn_in(0))
+        self.frame_zero = self.probe.frame_zero
 
         # .pico file frame operations
         self.frame_offset = self.frame_in - self.frame_zero
@@ -131,19 +1213,135 @@ class PicoFile(object):
         else:
             self.output_name = self.file_path
 
+    def to_frames(self, timecode):
+        """
+        :param timecode: str
+        :return: int, frame count at the file's render framerate, see CyTimecode
+        """
+        return CyTimecode.to_frames(str(timecode), self.render_fps, self.drop_frame)
+
+    def to_timecode(self, frames):
+        """
+        :param frames: int, frame count at the file's render framerate
+        :return: str
+        """
+        return CyTimecode.to_timecode(frames, self.render_fps, self.drop_frame)
+
+    def video_fps(self):
+        """
+        :return: int or float, encoding framerate, drop-frame takes run at 1000/1001 of their timecode rate
+        """
+        return self.render_fps * 1000.0 / 1001.0 if self.drop_frame else self.render_fps
+
+    def open_reader(self):
+        """
+        The reader for the file, frames come from its unpacked file when it has an up to date one, see unpack
+        :return: CyRaw.RawFrameReader, PicoReaderBackend or PyPico.PicoReader
+        """
+        if self.use_raw:
+            raw_reader = self.open_raw_reader()
+            if raw_reader is not None:
+                return raw_reader
+        return self.open_source_reader()
+
+    def open_source_reader(self):
+        """
+        The reader of the take itself, opened on first use when read() got its metadata from an index
+        :return: PicoReaderBackend or PyPico.PicoReader
+        """
+        if self.file_buffer is None:
+            self.file_buffer = CyReader.open_reader(self.file_path, self.reader_backend)
+        if self.frame_cache is not None and not isinstance(self.file_buffer, CachedReader):
+            self.file_buffer = CachedReader(self.file_buffer, self.frame_cache, os.path.abspath(self.file_path))
+        return self.file_buffer
+
+    def raw_path(self):
+        """
+        :return: str, where unpack puts the take's frames
+        """
+        return CyRaw.raw_path(self.file_path, self.raw_dir)
+
+    def open_raw_reader(self):
+        """
+        :return: CyRaw.RawFrameReader, None when the take wasn't unpacked or changed since
+        """
+        if self.raw_reader is None:
+            try:
+                raw_reader = CyRaw.RawFrameReader(self.raw_path(), fallback=self.open_source_reader)
+            except (OSError, ValueError):
+                return None
+            if not raw_reader.is_current():
+                raw_reader.close()
+                return None
+            self.raw_reader = raw_reader
+        return self.raw_reader
+
+    def unpack(self):
+        """
+        Decodes every frame the current range renders once into the take's unpacked file, see CyRaw.
+        Later renders, checks and workers map frames from there instead of decoding them, whatever their range,
+        as long as the take doesn't change. Frames an earlier unpack holds are kept without decoding them again.
+        Progress is yielded the same way render yields it.
+        :return: generator
+        """
+        indices = set(render_index for render_index, _, _, _ in self.render_plan())
+        raw_reader = self.open_raw_reader()
+        if raw_reader is not None:
+            if raw_reader.has_indices(indices):
+                return
+            indices.update(raw_reader.indices())
+
+        # Frames already unpacked come from the old file, the rest get decoded
+        reader = raw_reader if raw_reader is not None else self.open_source_reader()
+        unpack_progress_frames = 0
+        try:
+            for _ in CyRaw.write_raw(self.raw_path(), reader, indices, self.file_path, self.channels[0]):
+                yield unpack_progress_frames
+                unpack_progress_frames += 2
+        finally:
+            if raw_reader is not None:
+                raw_reader.close()
+            self.raw_reader = None
+
+    def frame_geometry(self, render_index):
+        """
+        Shape and dtype of the decoded frames, from the unpacked file when there is one,
+        otherwise from decoding a frame, the probed metadata doesn't carry the image size
+        :param render_index: int, frame to decode
+        :return: tuple(tuple, numpy dtype)
+        """
+        raw_reader = self.open_raw_reader() if self.use_raw else None
+        if raw_reader is not None:
+            return raw_reader.shape, raw_reader.dtype
+        frame = self.open_source_reader().get_image(render_index)
+        if frame is None:
+            raise ValueError('Frame {0} of {1} could not be decoded'.format(render_index, self.file_path))
+        return frame.shape, frame.dtype
+
     def report(self):
-        for k, v in vars(self).iteritems():
+        for k, v in vars(self).items():
             print('Check thread report: {0} - {1}'.format(k, v))
 
-    def validate_timecode_input(self):
+    def validate_timecode_input(self, decode=False):
         """
         Before trying to render a .pico file,
-        we first need to validate the desired timecode range, for this,
-        we load a frame into memory and try to get it's shape attribute, which,
+        we first need to validate the desired timecode range.
+        By default this only checks the range's frame indices against the header,
+        with decode we also load the first frame into memory and try to get it's shape attribute, which,
         if it is a valid numpy array, will be positive.
+        :param decode: bool, also decode the first frame
         :return: bool
         """
-        frame = self.file_buffer.get_image(self.frame_offset)
+        # The render plan never goes past the take's last frame, see _plan_frames
+        first_index = self.frame_offset + (self.frame_in % 2)
+        last_index = self.frame_offset + self.total_frames
+        if not self.probe.has_indices(first_index, last_index):
+            return False
+
+        if not decode:
+            return True
+
+        frame = self.open_reader().get_image(self.frame_offset)
         try:
             test = frame.shape
         except Exception as e:
@@ -155,92 +1353,642 @@ class PicoFile(object):
             test = None
             frame = None
 
-    def render(self):
+    def render_plan(self):
+        """
+        Works out every frame a render will produce, in order
+        :return: list of (render_index, timecode, frame_number, image_output_name)
+        """
 
         # Because we will be modifying a lot of values, instead of operating on the attributes,
         # we'll store what we need in local variables.
-        render_progress_frames = 0
         render_index = self.frame_offset
         render_output_name = self.output_name.replace('.pico', '')
         render_frame_in = self.frame_in
         render_frame_out = self.frame_out
         render_start_frame = self.start_frame
 
-        # Which Timecode are we going to render, user or file
-        if self.render_length == 'Slice':
-            render_tc = self.timecode_in
+        # Timecode of the first frame, as a frame count
+        render_tc = self.jam_frames + render_frame_in // 2
+
+        # Control counters (Not really control counters anymore)
+        if self.frame_padding <= 3:
+            self.frame_padding = 4
         else:
-            render_tc = self.ref_timecode
+            pass
+
+        return self._plan_frames(render_index, render_tc, render_frame_in, render_frame_out, render_start_frame,
+                                 render_output_name, self.frame_padding)
 
+    def _plan_frames(self, render_index, render_tc, render_frame_in, render_frame_out, render_start_frame,
+                     render_output_name, frame_padding):
         # Check if we are starting on a sub-frame, if so, step one frame up
 
         if render_frame_in % 2:  # If render_frame_in is a sub-frame
             render_frame_in += 1
             render_index += 1
-            render_tc.frames += 1
+            render_tc += 1
 
-        # Utility function for rotating the frame, probs, it should not be here
-        def rotate_bound(image, angle):
-            # grab the dimensions of the image and then determine the
-            # center
-            (h, w) = image.shape[:2]
-            (cX, cY) = (w // 2, h // 2)
+        # Every other capture frame up to and including render_frame_out + 1, timecodes all labelled in one go.
+        # With an odd span render_frame_out + 1 is past the end of the take when render_frame_out is its last frame
+        count = max(0, (render_frame_out + 3 - render_frame_in) // 2)
+        count = max(0, min(count, (self.probe.last_index() - render_index) // 2 + 1))
+        timecodes = CyTimecode.timecodes(render_tc, count, self.render_fps, self.drop_frame)
 
-            # grab the rotation matrix (applying the negative of the
-            # angle to rotate clockwise), then grab the sine and cosine
-            # (i.e., the rotation components of the matrix)
-            M = cv2.getRotationMatrix2D((cX, cY), -angle, 1.0)
-            cos = np.abs(M[0, 0])
-            sin = np.abs(M[0, 1])
+        plan = []
+        for step, timecode in enumerate(timecodes):
+            # Where are we going to save that new fresh frame?
+            frame_number = render_start_frame + step
+            image_output_name = render_output_name + '.{0:0>{1}}.jpg'.format(frame_number, frame_padding)
+            plan.append((render_index + step * 2, timecode, frame_number, image_output_name))
 
-            # compute the new bounding dimensions of the image
-            nW = int((h * sin) + (w * cos))
-            nH = int((h * cos) + (w * sin))
+        return plan
 
-            # adjust the rotation matrix to take into account translation
-            M[0, 2] += (nW / 2) - cX
-            M[1, 2] += (nH / 2) - cY
+    def range_output_name(self, timecode_range):
+        """
+        Where a range of render_ranges goes, its override, its name next to the file's output,
+        or the file's output suffixed with the range's timecode in.
+        Video pieces of a range split over several takes get a part number, see CyLookup.TakeLookup.jobs.
+        :param timecode_range: dict
+        :return: str, ending in .pico like output_name
+        """
+        if timecode_range.get('override'):
+            output_name = timecode_range['override'].replace('.pico', '')
+        elif timecode_range.get('name'):
+            output_name = os.path.join(os.path.dirname(self.output_name), timecode_range['name'])
+        else:
+            output_name = (self.output_name.replace('.pico', '') + '_' +
+                           str(timecode_range['tc_in']).replace(':', '').replace(';', ''))
 
-            # perform the actual rotation and return the image
-            return cv2.warpAffine(image, M, (nW, nH))
+        if self.output_format != 'jpg' and timecode_range.get('piece'):
+            output_name += '_part{0}'.format(timecode_range['piece'])
+        return output_name + '.pico'
 
-        # Control counters (Not really control counters anymore)
-        if self.frame_padding <= 3:
-            self.frame_padding = 4
+    def range_plan(self, timecode_range):
+        """
+        Same as render_plan for one timecode range of the file, the file must have been read
+        :param timecode_range: dict with tc_in, tc_out, start_frame and optionally override or name
+        :return: list of (render_index, timecode, frame_number, image_output_name)
+        """
+        timecode_in = self.to_frames(timecode_range['tc_in'])
+        frame_in = (timecode_in - self.jam_frames) * 2
+        frame_out = (self.to_frames(timecode_range['tc_out']) - self.jam_frames) * 2
+        if not self.probe.has_indices(frame_in - self.frame_zero, frame_out - self.frame_zero):
+            raise ValueError('Timecode range {0} - {1} is not in {2}'.format(timecode_range['tc_in'],
+                                                                             timecode_range['tc_out'],
+                                                                             self.file_path))
+
+        frame_padding = max(4, len(str(frame_out - frame_in)))
+        start_frame = timecode_range.get('start_frame') or self.start_frame
+        render_output_name = self.range_output_name(timecode_range).replace('.pico', '')
+        return self._plan_frames(frame_in - self.frame_zero, timecode_in, frame_in, frame_out, start_frame,
+                                 render_output_name, frame_padding)
+
+    def video_output_name(self, output_name=None):
+        """
+        :param output_name: str, defaults to output_name
+        :return: str
+        """
+        if output_name is None:
+            output_name = self.output_name
+        return output_name.replace('.pico', '') + self.video_extension
+
+    def open_writer(self, output_name=None):
+        """
+        Builds the output stage for the current output_format
+        :param output_name: str, video output other than output_name
+        :return: ImageSequenceWriter, FFmpegPipeWriter or OpenCVVideoWriter
+        """
+        if self.output_format == 'jpg':
+            return ImageSequenceWriter(output_profile(self.profile).quality)
+        elif self.output_format == 'ffmpeg':
+            return FFmpegPipeWriter(self.video_output_name(output_name), self.video_fps(), codec=self.video_codec,
+                                    crf=self.video_crf, preset=self.video_preset, pix_fmt=self.video_pix_fmt)
+        elif self.output_format == 'opencv':
+            return OpenCVVideoWriter(self.video_output_name(output_name), self.video_fps(), fourcc=self.video_fourcc)
         else:
-            pass
+            raise ValueError('Unknown output format: {0}'.format(self.output_format))
 
-        # Render loop
-        while render_frame_in < (render_frame_out + 2):
-            # Load a new frame in memory
-            frame = self.file_buffer.get_image(render_index)
+    def frame_profile(self):
+        """
+        :return: OutputProfile, None when frames are written the size and colour they are decoded
+        """
+        profile = output_profile(self.profile)
+        return None if profile.is_identity else profile
 
-            # Manipulate the frame
-            cv2.rectangle(frame, (16, 40), (220, 80), (0, 0, 0), -1)
-            cv2.putText(frame, str(render_tc), (20, 70), cv2.FONT_HERSHEY_DUPLEX, 1, (255, 255, 255), 2)
+    def frame_burn_in(self):
+        """
+        :return: CyOverlay.BurnInOverlay, burn_in laid out for the frames of the profile
+        """
+        if 'filename' in self.burn_in.fields and self.burn_in.filename is None:
+            self.burn_in.filename = os.path.basename(self.file_path)
+        return output_profile(self.profile).burn_in(self.burn_in)
 
-            # Rotate the frame 90 degrees
-            frame = rotate_bound(frame, -90)
+    def checkpoint_path(self):
+        """
+        :return: str, manifest of the frames a jpg render has finished, next to them
+        """
+        return self.output_name.replace('.pico', '') + '.render.json'
 
-            # Where are we going to save that new fresh frame?
-            image_output_name = render_output_name + '.{0:0>{1}}.jpg'.format(render_start_frame, self.frame_padding)
+    def render_params(self):
+        """
+        Everything but the range that decides what a render writes, frames rendered with other params can't be reused
+        :return: dict
+        """
+        profile = output_profile(self.profile)
+        burn_in = self.burn_in
+        stat = os.stat(self.file_path)
+        return {'source': [os.path.abspath(self.file_path), stat.st_size, stat.st_mtime_ns],
+                'reader_backend': self.reader_backend,
+                'rotation': self.rotation,
+                'profile': [profile.scale, profile.quality, profile.grayscale, profile.interpolation],
+                'burn_in': [burn_in.position, burn_in.scale, burn_in.atlas.thickness, burn_in.atlas.font,
+                            burn_in.fields, burn_in.filename, burn_in.after_rotation, burn_in.color,
+                            burn_in.background]}
+
+    def frame_keys(self, plan):
+        """
+        What every frame of a plan shows, its source frame and burnt in timecode, and its number when that
+        is burnt in too. Frames with the same key and render_params are the same whatever they are called.
+        :param plan: list, see render_plan
+        :return: collections.OrderedDict of image_output_name -> list
+        """
+        numbered = 'frame' in self.burn_in.fields
+        return collections.OrderedDict((image_output_name, [render_index, timecode,
+                                                            frame_number if numbered else None])
+                                       for render_index, timecode, frame_number, image_output_name in plan)
+
+    def render(self, workers=None, write_threads=0, write_depth=8, instrument=False, stats_path=None,
+               prefetch=gPREFETCH_DEPTH, buffer_pool=True, resume=False, transport='reader', pool=None):
+        """
+        Renders the frame range to a jpg sequence or a video file, yielding progress as it goes.
+        With workers > 1 and transport 'reader' the range is split in chunks and rendered by a process pool,
+        every worker opening its own reader. With transport 'shared' a single decoder process reads every frame
+        into shared memory slots and the workers render them from there, only slot numbers go through the queues.
+        With write_threads > 0 a serial render hands frames to a write-behind queue,
+        the generator only finishes once every frame is on disk.
+        Frames/sec and ETA are always kept in self.render_stats, with instrument=True it also
+        gets per-stage latency histograms and bytes written. The stats are the generator's return value.
+        :param workers: int, number of processes, None or 1 renders on this thread
+        :param write_threads: int, write-behind threads, 0 writes on the render thread
+        :param write_depth: int, frames queued for writing before the render loop waits
+        :param instrument: bool, time every stage of every frame
+        :param stats_path: str, dump the stats there once done, csv if it ends in .csv, json otherwise
+        :param prefetch: int, frames a serial render decodes ahead to start with, 0 reads in lockstep
+        :param buffer_pool: bool, rotate into a ring of preallocated frames instead of a new array per frame
+        :param resume: bool, keep a checkpoint of finished frames, see checkpoint_path, and only render the
+                       frames earlier renders with the same settings didn't leave whole on disk, whatever range
+                       they had. Frames whose number moved with the range are renamed. Image sequences only.
+        :param transport: str, 'reader' or 'shared', how parallel workers get their frames
+        :param pool: multiprocessing.Pool, renders the 'reader' transport in there instead of a pool of its own,
+                     its workers keep their reader open between renders of the same take. It is left running.
+        :return: generator
+        """
+        if transport not in ('reader', 'shared'):
+            raise ValueError('Unknown frame transport: {0}'.format(transport))
+        plan = self.render_plan()
+        if 'filename' in self.burn_in.fields and self.burn_in.filename is None:
+            self.burn_in.filename = os.path.basename(self.file_path)
+
+        checkpoint = None
+        resumed = 0
+        if resume and self.output_format == 'jpg':
+            checkpoint = CyCheckpoint.RenderCheckpoint(self.checkpoint_path(), self.render_params(),
+                                                       self.frame_keys(plan))
+            if checkpoint.load():
+                pending, renamed = checkpoint.reuse()
+                if renamed:
+                    logging.info('Renumbered %d frames of %s', renamed, self.output_name)
+                pending = [entry for entry in plan if os.path.basename(entry[3]) in pending]
+                resumed = len(plan) - len(pending)
+                plan = pending
 
-            # if self.override:
-            #     self.output_name = self.output_name + '.{0:0>{1}}.jpg'.format(self.frame_start, self.frame_padding)
-            # else:
-            #     self.output_name = self.output_name.replace('.pico', '.{0:0>{1}}.jpg'.format(self.frame_start,
-            #                                                                                  self.frame_padding))
+        stats = CyStats.RenderStats(len(plan))
+        self.render_stats = stats
 
-            # Save the fresh frame
-            cv2.imwrite(image_output_name, frame, [cv2.IMWRITE_JPEG_QUALITY, 100])
+        if workers is None or workers <= 1:
+            render_frames = self._render_serial(plan, stats, instrument, write_threads, write_depth, prefetch,
+                                                buffer_pool, checkpoint)
+        elif self.output_format != 'jpg':
+            raise ValueError('Parallel render needs jpg output, video frames are encoded in order')
+        elif transport == 'shared':
+            render_frames = self._render_shared(plan, stats, instrument, workers, buffer_pool, checkpoint)
+        else:
+            render_frames = self._render_parallel(plan, stats, instrument, workers, buffer_pool, checkpoint, pool)
 
-            # Yield progress
+        # Yield progress, frames already on disk count straight away
+        render_progress_frames = 0
+        try:
+            for _ in range(resumed):
+                yield render_progress_frames
+                render_progress_frames += 2
+
+            for _ in render_frames:
+                stats.frame_done()
+                yield render_progress_frames
+                render_progress_frames += 2
+        finally:
+            # Closing flushes the writers, the frames they still had queued are recorded before the save
+            try:
+                render_frames.close()
+            finally:
+                if checkpoint is not None:
+                    checkpoint.save()
+
+        stats.finish()
+        if stats_path is not None:
+            stats.dump(stats_path)
+
+        return stats
+
+    def render_ranges(self, ranges, write_threads=0, write_depth=8, instrument=False, stats_path=None,
+                      prefetch=gPREFETCH_DEPTH, buffer_pool=True):
+        """
+        Renders several timecode ranges of the file in one sequential sweep, each range to its own
+        jpg sequence or video file, see range_output_name. The ranges are merged into one ordered set
+        of frame indices, so a source frame shared by overlapping ranges is only decoded once.
+        Progress and stats work the same as render.
+        :param ranges: list of dict with tc_in, tc_out, start_frame and optionally override or name
+        :param write_threads: int, write-behind threads, 0 writes on the render thread
+        :param write_depth: int, frames queued for writing before the render loop waits
+        :param instrument: bool, time every stage of every frame
+        :param stats_path: str, dump the stats there once done, csv if it ends in .csv, json otherwise
+        :param prefetch: int, frames decoded ahead to start with, 0 reads in lockstep
+        :param buffer_pool: bool, rotate into a ring of preallocated frames instead of a new array per frame
+        :return: generator
+        """
+        plans = [self.range_plan(timecode_range) for timecode_range in ranges]
+
+        # Every output frame, grouped by the source frame it comes from
+        consumers = {}
+        for clip, plan in enumerate(plans):
+            for render_index, timecode, frame_number, image_output_name in plan:
+                consumers.setdefault(render_index, []).append((clip, timecode, frame_number, image_output_name))
+
+        stats = CyStats.RenderStats(sum(len(plan) for plan in plans))
+        self.render_stats = stats
+
+        # Progress
+        render_progress_frames = 0
+        for _ in self._render_sweep(ranges, consumers, stats, instrument, write_threads, write_depth, prefetch,
+                                    buffer_pool):
+            stats.frame_done()
             yield render_progress_frames
+            render_progress_frames += 2
+
+        stats.finish()
+        if stats_path is not None:
+            stats.dump(stats_path)
+
+        return stats
+
+    def _render_sweep(self, ranges, consumers, stats, instrument=False, write_threads=0, write_depth=8,
+                      prefetch=0, buffer_pool=False):
+        reader = self.open_reader()
+        prefetch = self._prefetch_depth(reader, consumers, prefetch)
+        if prefetch > 0:
+            reader = PrefetchReader(reader, sorted(consumers), depth=prefetch)
+        rotator = FrameRotator(self.rotation)
+        profile = self.frame_profile()
+        burn_in = self.frame_burn_in()
+
+        # Every writer can be holding on to its queue of frames
+        buffers = None
+        if buffer_pool:
+            queues = 1 if self.output_format == 'jpg' else len(ranges)
+            buffers = FrameBufferPool(self._frames_in_flight(write_threads, write_depth) * queues + 1)
+
+        # Image sequences can share a writer, videos need one each
+        writers = []
+        for clip, timecode_range in enumerate(ranges):
+            if self.output_format == 'jpg' and writers:
+                writers.append(writers[0])
+                continue
+            writer = self.open_writer(self.range_output_name(timecode_range))
+            if instrument:
+                writer = InstrumentedWriter(writer, stats)
+            if write_threads > 0:
+                writer = WriteBehindWriter(writer, threads=write_threads, depth=write_depth,
+                                           on_written=buffers.release if buffers is not None else None)
+            writers.append(writer)
+
+        try:
+            for render_index in sorted(consumers):
+                # Load the source frame once for every output it ends up in
+                time_stamp = time.perf_counter()
+                source = reader.get_image(render_index)
+                if instrument:
+                    stats.add('read', time.perf_counter() - time_stamp)
+
+                # Scaled once for every output too
+                if profile is not None:
+                    time_stamp = time.perf_counter()
+                    source = profile(source)
+                    if instrument:
+                        stats.add('scale', time.perf_counter() - time_stamp)
+
+                outputs = consumers[render_index]
+                for output, (clip, timecode, frame_number, image_output_name) in enumerate(outputs):
+                    # The burn in draws in place, only the last output can have the decoded frame itself
+                    frame = source if output == len(outputs) - 1 else source.copy()
+                    if instrument:
+                        frame = process_frame_timed(reader, render_index, timecode, frame_number,
+                                                    rotator, burn_in, stats, frame=frame, buffers=buffers)
+                    else:
+                        frame = process_frame(frame, timecode, frame_number, rotator, burn_in, buffers)
+                    writers[clip].write(frame, image_output_name)
+                    if buffers is not None and write_threads <= 0:
+                        buffers.release(frame)
+
+                    yield 1
+        finally:
+            if prefetch > 0:
+                reader.close()
+
+            # Close them all even if one fails, the first error still wins
+            error = None
+            for writer in set(writers):
+                try:
+                    writer.close()
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
 
-            # Prepare for the next loop
-            render_index += 2
-            render_frame_in += 2
+    def channel_output_name(self, channel):
+        return self.output_name.replace('.pico', '') + '_cam{0}.pico'.format(channel)
+
+    def render_channels(self, layout='separate', channels=None, write_threads=0, write_depth=8, instrument=False,
+                        stats_path=None):
+        """
+        Renders every enabled camera channel from one reader in one sweep, the channels of a frame
+        are decoded, burnt in and rotated in parallel. Layout 'separate' writes each channel to its own
+        output, see channel_output_name, 'sheet' tiles them into a single contact sheet output.
+        Progress is yielded once per frame, for all channels, the same way render yields it.
+        :param layout: str, 'separate' or 'sheet'
+        :param channels: list of int, defaults to self.channels
+        :param write_threads: int, write-behind threads, 0 writes on the render thread
+        :param write_depth: int, frames queued for writing before the render loop waits
+        :param instrument: bool, time every stage of every frame
+        :param stats_path: str, dump the stats there once done, csv if it ends in .csv, json otherwise
+        :return: generator
+        """
+        if layout not in ('separate', 'sheet'):
+            raise ValueError('Unknown channel layout: {0}'.format(layout))
+        channels = list(channels if channels is not None else self.channels)
+
+        plan = self.render_plan()
+        outputs = len(channels) if layout == 'separate' else 1
+        stats = CyStats.RenderStats(len(plan) * outputs)
+        self.render_stats = stats
+
+        # Progress
+        render_progress_frames = 0
+        for _ in self._render_channel_sweep(plan, channels, layout, stats, instrument, write_threads, write_depth):
+            stats.frame_done(outputs)
+            yield render_progress_frames
             render_progress_frames += 2
-            render_tc.frames += 1
-            render_start_frame += 1
 
+        stats.finish()
+        if stats_path is not None:
+            stats.dump(stats_path)
+
+        return stats
+
+    def _render_channel_sweep(self, plan, channels, layout, stats, instrument=False, write_threads=0, write_depth=8):
+        reader = self.open_reader()
+        read_lock = threading.Lock()  # Readers aren't known to be thread safe, the rest of the frame work is
+        rotator = FrameRotator(self.rotation)
+        profile = self.frame_profile()
+        burn_in = self.frame_burn_in()
+        prefix = self.output_name.replace('.pico', '')
+
+        if layout == 'sheet':
+            names = [self.output_name]
+        elif self.output_format == 'jpg':
+            names = [None]  # Image names are worked out per frame, one writer does for every channel
+        else:
+            names = [self.channel_output_name(channel) for channel in channels]
+
+        writers = []
+        for name in names:
+            writer = self.open_writer(name)
+            if instrument:
+                writer = InstrumentedWriter(writer, stats)
+            if write_threads > 0:
+                writer = WriteBehindWriter(writer, threads=write_threads, depth=write_depth)
+            writers.append(writer)
+
+        def process_channel(channel, render_index, timecode, frame_number):
+            time_stamp = time.perf_counter()
+            with read_lock:
+                frame = reader.get_image(render_index, channel)
+            if instrument:
+                stats.add('read', time.perf_counter() - time_stamp)
+                return process_frame_timed(reader, render_index, timecode, frame_number, rotator, burn_in,
+                                           stats, frame=frame, profile=profile)
+            return process_frame(frame, timecode, frame_number, rotator, burn_in, profile=profile)
+
+        executor = ThreadPoolExecutor(max_workers=len(channels), thread_name_prefix='PicoChannel')
+        try:
+            for render_index, timecode, frame_number, image_output_name in plan:
+                futures = [executor.submit(process_channel, channel, render_index, timecode, frame_number)
+                           for channel in channels]
+                frames = [future.result() for future in futures]
+
+                if layout == 'sheet':
+                    writers[0].write(contact_sheet(frames), image_output_name)
+                else:
+                    for position, (channel, frame) in enumerate(zip(channels, frames)):
+                        channel_image_name = (self.channel_output_name(channel).replace('.pico', '') +
+                                              image_output_name[len(prefix):])
+                        writers[position % len(writers)].write(frame, channel_image_name)
+
+                yield 1
+        finally:
+            executor.shutdown(wait=True)
+
+            # Close them all even if one fails, the first error still wins
+            error = None
+            for writer in writers:
+                try:
+                    writer.close()
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+
+    @staticmethod
+    def _prefetch_depth(reader, indices, prefetch):
+        # Unpacked frames are only mapped, there is no decode to get ahead of
+        if isinstance(reader, CyRaw.RawFrameReader) and reader.has_indices(indices):
+            return 0
+        return prefetch
+
+    @staticmethod
+    def _frames_in_flight(write_threads, write_depth):
+        # Frames a writer can still hold on to once write() returns, see WriteBehindWriter
+        if write_threads > 0:
+            return max(write_depth, write_threads)
+        return 0
+
+    def _render_serial(self, plan, stats, instrument=False, write_threads=0, write_depth=8, prefetch=0,
+                       buffer_pool=False, checkpoint=None):
+        reader = self.open_reader()
+        indices = [render_index for render_index, _, _, _ in plan]
+        prefetch = self._prefetch_depth(reader, indices, prefetch)
+        if prefetch > 0:
+            reader = PrefetchReader(reader, indices, depth=prefetch)
+        rotator = FrameRotator(self.rotation)
+        profile = self.frame_profile()
+        burn_in = self.frame_burn_in()
+
+        # Rotated frames go back to the pool once the writer is done with them
+        buffers = None
+        if buffer_pool:
+            buffers = FrameBufferPool(self._frames_in_flight(write_threads, write_depth) + 1)
+
+        writer = self.open_writer()
+        if instrument:
+            writer = InstrumentedWriter(writer, stats)
+        if checkpoint is not None:
+            writer = CheckpointWriter(writer, checkpoint)
+        if write_threads > 0:
+            writer = WriteBehindWriter(writer, threads=write_threads, depth=write_depth,
+                                       on_written=buffers.release if buffers is not None else None)
+
+        # Render loop
+        try:
+            for render_index, timecode, frame_number, image_output_name in plan:
+                if instrument:
+                    frame = process_frame_timed(reader, render_index, timecode, frame_number,
+                                                rotator, burn_in, stats, buffers=buffers, profile=profile)
+                else:
+                    # Load a new frame in memory
+                    frame = reader.get_image(render_index)
+
+                    # Manipulate and rotate the frame
+                    frame = process_frame(frame, timecode, frame_number, rotator, burn_in, buffers, profile)
+
+                # Save the fresh frame
+                writer.write(frame, image_output_name)
+                if buffers is not None and write_threads <= 0:
+                    buffers.release(frame)
+
+                yield 1
+        finally:
+            if prefetch > 0:
+                reader.close()
+            writer.close()
+
+    def _render_parallel(self, plan, stats, instrument, workers, buffer_pool=False, checkpoint=None, pool=None):
+        if not plan:
+            return
+
+        # A few chunks per worker keeps the pool busy when chunks finish unevenly.
+        # A shared pool gets small ones, a few at a time, each checking for the stop file before every frame
+        chunk_size = max(1, -(-len(plan) // (workers * 4)))
+        if pool is not None:
+            chunk_size = min(chunk_size, gPOOL_CHUNK_FRAMES)
+        chunks = [plan[i:i + chunk_size] for i in range(0, len(plan), chunk_size)]
+
+        raw_reader = self.open_raw_reader() if self.use_raw else None
+        raw_path = raw_reader.path if raw_reader is not None else None
+        settings = (self.file_path, self.reader_backend, self.rotation, self.frame_burn_in(), self.frame_profile(),
+                    output_profile(self.profile).quality, buffer_pool, instrument, raw_path)
+
+        own_pool = pool is None
+        if own_pool:
+            pool = multiprocessing.Pool(workers, initializer=_init_render_worker, initargs=settings)
+            results = pool.imap_unordered(_render_chunk, chunks)
+        else:
+            stop_dir = tempfile.mkdtemp(prefix='pico_render_')
+            stop_path = os.path.join(stop_dir, 'stop')
+            # A changed take or a new unpack opens a fresh reader
+            reader_key = tuple(CyRaw.source_stamp(self.file_path)) + (self.reader_backend, raw_path)
+            results = _PooledChunks(pool, [(reader_key, settings, stop_path, chunk) for chunk in chunks],
+                                    workers * gPOOL_CHUNKS_PER_WORKER)
+        try:
+            for written, chunk_stats in results:
+                if chunk_stats is not None:
+                    stats.merge(chunk_stats)
+                # The whole chunk is on disk, whether or not the render gets to count all of it
+                if checkpoint is not None:
+                    for image_output_name, size in written:
+                        checkpoint.done(image_output_name, size)
+                for _ in written:
+                    yield 1
+        finally:
+            if own_pool:
+                pool.terminate()
+                pool.join()
+            else:
+                # Nothing of this render is left writing once it is closed, frames still finished go on record
+                open(stop_path, 'w').close()
+                for written, _ in results.drain():
+                    if checkpoint is not None:
+                        for image_output_name, size in written:
+                            checkpoint.done(image_output_name, size)
+                shutil.rmtree(stop_dir, ignore_errors=True)
+
+    def _render_shared(self, plan, stats, instrument, workers, buffer_pool=False, checkpoint=None):
+        if not plan:
+            return
+
+        # Slots for every worker to have a frame in hand and one waiting, within the memory budget
+        shape, dtype = self.frame_geometry(plan[0][0])
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        slots = max(2, min(len(plan), workers * gSLOTS_PER_WORKER, gSHARED_FRAME_BYTES // frame_bytes))
+        ring = SharedFrameRing(slots, shape, dtype)
+
+        work_queue = multiprocessing.Queue()
+        free_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        for slot in range(slots):
+            free_queue.put(slot)
+
+        raw_reader = self.open_raw_reader() if self.use_raw else None
+        processes = [multiprocessing.Process(target=_decode_to_ring, name='PicoDecoder', daemon=True,
+                                             args=(self.file_path, self.reader_backend,
+                                                   raw_reader.path if raw_reader is not None else None,
+                                                   ring.name, slots, shape, dtype,
+                                                   [render_index for render_index, _, _, _ in plan], instrument,
+                                                   work_queue, free_queue, result_queue, workers))]
+        processes.extend(multiprocessing.Process(target=_render_from_ring, name='PicoRender', daemon=True,
+                                                 args=(ring.name, slots, shape, dtype, plan, self.rotation,
+                                                       self.frame_burn_in(), self.frame_profile(),
+                                                       output_profile(self.profile).quality, buffer_pool, instrument,
+                                                       work_queue, free_queue, result_queue))
+                         for _ in range(workers))
+        try:
+            for process in processes:
+                process.start()
+
+            running = len(processes)
+            while running:
+                try:
+                    message = result_queue.get(timeout=gSHARED_POLL_INTERVAL)
+                except queue.Empty:
+                    if any(process.exitcode not in (None, 0) for process in processes):
+                        raise RuntimeError('A render process of {0} died'.format(self.file_path))
+                    continue
+
+                if message[0] == 'error':
+                    raise RuntimeError(message[1])
+                if message[0] == 'done':
+                    running -= 1
+                    if message[1] is not None:
+                        stats.merge(message[1])
+                    continue
+
+                _, image_output_name, size = message
+                if checkpoint is not None:
+                    checkpoint.done(image_output_name, size)
+                yield 1
+        finally:
+            for process in processes:
+                if process.pid is None:
+                    continue
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            ring.close()
@@ -0,0 +1,180 @@
+""" Unpacked takes,
+    Decodes a take once into a flat file of raw frames: a fixed size header, an offset table keyed by
+    the reader frame indices render uses, then the frames back to back. Renders map frames straight
+    out of it with numpy.memmap instead of decoding them again, and worker processes share the same pages.
+    """
+import os
+import json
+import hashlib
+
+import numpy as np
+
+# - Globals - #
+gRAW_DIR = os.path.join(os.path.expanduser('~'), '.pico_slicer', 'raw')
+gMAGIC = b'PICORAW1'
+gHEADER_SIZE = 4096  # Magic and json description, space padded. Frames start on the next page after the table
+gPAGE_SIZE = 4096
+
+
+def raw_path(file_path, raw_dir=None):
+    """
+    Where a take gets unpacked, named after the take and its absolute path so takes with the same name don't clash
+    :param file_path: str
+    :param raw_dir: str, defaults to gRAW_DIR
+    :return: str
+    """
+    file_path = os.path.abspath(file_path)
+    digest = hashlib.sha1(file_path.encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(raw_dir or gRAW_DIR, '{0}-{1}.raw'.format(name, digest))
+
+
+def source_stamp(file_path):
+    """
+    :param file_path: str
+    :return: list, absolute path, size and mtime of the take an unpacked file was made from
+    """
+    stat = os.stat(file_path)
+    return [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns]
+
+
+def write_raw(output_path, reader, indices, file_path, channel=None):
+    """
+    Decodes every index in turn into output_path, yielding after each frame. The file is written next to
+    output_path and only moved into place once every frame is in, an unpack that stops halfway leaves nothing.
+    :param output_path: str
+    :param reader: PicoReaderBackend, PyPico.PicoReader or RawFrameReader
+    :param indices: list of int, reader frame indices
+    :param file_path: str, the take, its size and mtime decide when the unpacked file is out of date
+    :param channel: int, camera channel the frames come from, recorded so other channels aren't served from it
+    :return: generator
+    """
+    indices = sorted(set(indices))
+    first_index = indices[0]
+    table = np.full(indices[-1] - first_index + 1, -1, dtype='<i8')
+    data_offset = -(-(gHEADER_SIZE + table.nbytes) // gPAGE_SIZE) * gPAGE_SIZE
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = output_path + '.tmp'
+    shape = dtype = None
+    try:
+        with open(temp_path, 'wb') as f:
+            f.seek(data_offset)
+            for position, index in enumerate(indices):
+                frame = reader.get_image(index)
+                if frame is None:
+                    raise ValueError('Frame {0} of {1} could not be decoded'.format(index, file_path))
+                if shape is None:
+                    shape, dtype = frame.shape, frame.dtype
+                elif frame.shape != shape or frame.dtype != dtype:
+                    raise ValueError('Frame {0} of {1} is not the size of the others'.format(index, file_path))
+
+                table[index - first_index] = f.tell()
+                f.write(np.ascontiguousarray(frame).data)
+                yield position
+
+            header = {'source': source_stamp(file_path),
+                      'channel': channel,
+                      'shape': list(shape),
+                      'dtype': dtype.str,
+                      'first_index': first_index,
+                      'count': len(table)}
+            f.seek(0)
+            f.write((gMAGIC + json.dumps(header).encode()).ljust(gHEADER_SIZE, b' '))
+            f.write(table.tobytes())
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class RawFrameReader(object):
+    def __init__(self, path, fallback=None):
+        """
+        Reader for an unpacked take. Every frame it holds comes back as its own copy-on-write mapping of the file,
+        drawing on it only copies the pages drawn on and never reaches the file or the next caller.
+        Anything else, frames it doesn't hold, other channels and the rest of the reader interface,
+        goes to the take's own reader.
+        :param path: str, see write_raw
+        :param fallback: callable returning the take's reader, only called the first time it is needed
+        """
+        self.path = path
+        self.fallback = fallback
+        self.reader = None
+
+        # Kept open, frames keep coming from this file even if another unpack replaces it meanwhile
+        self.file = open(path, 'rb')
+        try:
+            header = self.file.read(gHEADER_SIZE)
+            if not header.startswith(gMAGIC):
+                raise ValueError('Not an unpacked take: {0}'.format(path))
+            header = json.loads(header[len(gMAGIC):].decode())
+            self.table = np.frombuffer(self.file.read(header['count'] * 8), dtype='<i8')
+        except Exception:
+            self.file.close()
+            raise
+
+        self.source = header['source']
+        self.channel = header['channel']
+        self.shape = tuple(header['shape'])
+        self.dtype = np.dtype(header['dtype'])
+        self.first_index = header['first_index']
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('fallback', 'reader', 'file'):
+            raise AttributeError(name)
+        return getattr(self.source_reader(), name)
+
+    def source_reader(self):
+        """
+        :return: the take's own reader, opened on first use
+        """
+        if self.reader is None:
+            if self.fallback is None:
+                raise IOError('{0} has no reader to fall back on'.format(self.path))
+            self.reader = self.fallback()
+        return self.reader
+
+    def is_current(self):
+        """
+        :return: bool, the take hasn't changed since it was unpacked
+        """
+        try:
+            return source_stamp(self.source[0]) == self.source
+        except OSError:
+            return False
+
+    def offset(self, index):
+        """
+        :param index: int
+        :return: int, byte offset of the frame, -1 when it wasn't unpacked
+        """
+        position = index - self.first_index
+        if 0 <= position < len(self.table):
+            return int(self.table[position])
+        return -1
+
+    def has_indices(self, indices):
+        """
+        :param indices: iterable of int
+        :return: bool, every one of them was unpacked
+        """
+        return all(self.offset(index) >= 0 for index in indices)
+
+    def indices(self):
+        """
+        :return: list of int, every frame index held
+        """
+        return [int(position) + self.first_index for position in np.flatnonzero(self.table >= 0)]
+
+    def get_image(self, index, channel=None):
+        offset = self.offset(index)
+        if offset < 0 or (channel is not None and channel != self.channel):
+            if channel is None:
+                return self.source_reader().get_image(index)
+            return self.source_reader().get_image(index, channel)
+        return np.memmap(self.file, dtype=self.dtype, mode='c', offset=offset, shape=self.shape)
+
+    def close(self):
+        # Frames already handed out keep their own mapping
+        self.file.close()
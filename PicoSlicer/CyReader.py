@@ -0,0 +1,266 @@
+""" Reader backends,
+    Everything PicoFile needs from a .pico reader, plus a synthetic stand-in
+    so the render paths can be run and benchmarked without a CaraPost license.
+    """
+import os
+import json
+
+import numpy as np
+
+try:
+    from PyCara import PyPico
+except RuntimeError:
+    print('No valid CaraPost license found, render functions are disabled')
+except ModuleNotFoundError:
+    print('Could not find PyCara installed')
+
+
+class PicoReaderBackend(object):
+    """
+    The subset of PyPico.PicoReader used by CyPico, any backend has to provide these
+    """
+    def open(self, file_path):
+        raise NotImplementedError
+
+    def get_header(self):
+        """
+        :return: object with start_capture_frame_number and stop_capture_frame_number
+        """
+        raise NotImplementedError
+
+    def get_properties(self):
+        """
+        :return: dict of str, with channels.N.enabled and channels.N.framerate_measured
+        """
+        raise NotImplementedError
+
+    def get_frame(self, index):
+        """
+        :return: object with a jamsync_timecode holding hours, minutes, seconds and frames
+        """
+        raise NotImplementedError
+
+    def get_image(self, index, channel=None):
+        """
+        :param index: int
+        :param channel: int, camera channel, None for the first enabled one
+        :return: numpy array, or None if there is no such frame
+        """
+        raise NotImplementedError
+
+    def read_burn_in(self, index):
+        """
+        :return: int, capture frame number of the frame
+        """
+        raise NotImplementedError
+
+
+# ----------------------------------------------------- #
+
+
+class SyntheticHeader(object):
+    def __init__(self, start_capture_frame_number, stop_capture_frame_number):
+        self.start_capture_frame_number = start_capture_frame_number
+        self.stop_capture_frame_number = stop_capture_frame_number
+
+
+class SyntheticTimecode(object):
+    def __init__(self, hours, minutes, seconds, frames):
+        self.hours = hours
+        self.minutes = minutes
+        self.seconds = seconds
+        self.frames = frames
+
+
+class SyntheticFrame(object):
+    def __init__(self, jamsync_timecode):
+        self.jamsync_timecode = jamsync_timecode
+
+
+class SyntheticPicoReader(PicoReaderBackend):
+    # Stand-in take, 20 seconds of a single 60 fps channel jammed at 01:00:00:00
+    DEFAULTS = {'width': 1280,
+                'height': 720,
+                'framerate': 60.0,
+                'channels': [0],
+                'jam_timecode': [1, 0, 0, 0],
+                'frame_zero': 100,
+                'start_capture_frame_number': 100,
+                'stop_capture_frame_number': 1300,
+                'seed': 0}
+
+    def __init__(self, **settings):
+        """
+        Generates deterministic frames in memory, the same index always gives the same image.
+        Settings passed here are overridden by the ones in the opened file, see write_synthetic_pico.
+        :param settings: any of DEFAULTS
+        """
+        self.settings = dict(self.DEFAULTS)
+        self.settings.update(settings)
+        self.base_image = None
+
+    def open(self, file_path):
+        # An existing file is a json description of the take, anything else uses the constructor settings
+        if os.path.isfile(file_path) and os.path.getsize(file_path):
+            with open(file_path) as f:
+                self.settings.update(json.load(f))
+
+        rng = np.random.default_rng(self.settings['seed'])
+        self.base_image = rng.integers(0, 256, (self.settings['height'], self.settings['width'], 3), dtype=np.uint8)
+
+    def get_header(self):
+        return SyntheticHeader(self.settings['start_capture_frame_number'], self.settings['stop_capture_frame_number'])
+
+    def get_properties(self):
+        properties = {}
+        for channel in range(4):
+            enabled = channel in self.settings['channels']
+            properties['channels.{0}.enabled'.format(channel)] = str(enabled)
+            properties['channels.{0}.framerate_measured'.format(channel)] = str(self.settings['framerate'] if enabled
+                                                                                else 0.0)
+        return properties
+
+    def get_frame(self, index):
+        return SyntheticFrame(SyntheticTimecode(*self.settings['jam_timecode']))
+
+    def frame_count(self):
+        return self.settings['stop_capture_frame_number'] - self.settings['frame_zero'] + 1
+
+    def get_image(self, index, channel=None):
+        if index < 0 or index >= self.frame_count():
+            return None
+        # Shifting the noise plate gives every frame different content, and a fresh array like a real decode
+        if channel is None or channel == self.settings['channels'][0]:
+            return np.roll(self.base_image, index * 4, axis=1)
+        if channel not in self.settings['channels']:
+            return None
+        # Other cameras see the same plate from somewhere else
+        return np.roll(self.base_image, (channel * 37, index * 4), axis=(0, 1))
+
+    def read_burn_in(self, index):
+        return self.settings['frame_zero'] + index
+
+
+def write_synthetic_pico(file_path, **settings):
+    """
+    Writes an on-disk stand-in .pico that SyntheticPicoReader can open
+    :param file_path: str
+    :param settings: any of SyntheticPicoReader.DEFAULTS
+    :return:
+    """
+    description = dict(SyntheticPicoReader.DEFAULTS)
+    description.update(settings)
+    with open(file_path, 'w') as f:
+        json.dump(description, f, indent=4)
+
+
+# ----------------------------------------------------- #
+
+
+class PicoProbe(object):
+    # Everything kept when a probe is cached, see to_dict
+    FIELDS = ('start_capture_frame_number', 'stop_capture_frame_number', 'jam_timecode', 'properties',
+              'channels', 'raw_fps', 'frame_zero')
+
+    def __init__(self, reader=None):
+        """
+        Everything PicoFile.read needs from an opened reader, collected in one pass.
+        Only the first frame's metadata is touched, no image gets decoded.
+        Without a reader the probe is empty, see from_dict.
+        :param reader: PicoReaderBackend or PyPico.PicoReader
+        """
+        self.header = None
+        self.start_capture_frame_number = None
+        self.stop_capture_frame_number = None
+        self.jam_timecode = None
+        self.properties = None
+        self.channels = None
+        self.raw_fps = None
+        self.frame_zero = None
+
+        if reader is None:
+            return
+
+        self.header = reader.get_header()
+        self.start_capture_frame_number = int(self.header.start_capture_frame_number)
+        self.stop_capture_frame_number = int(self.header.stop_capture_frame_number)
+
+        # Last timecode jam, as hours, minutes, seconds and frames strings
+        jamsync_timecode = reader.get_frame(0).jamsync_timecode
+        self.jam_timecode = [str(jamsync_timecode.hours),
+                             str(jamsync_timecode.minutes),
+                             str(jamsync_timecode.seconds),
+                             str(jamsync_timecode.frames)]
+
+        self.properties = reader.get_properties()
+        self.channels = [channel for channel in range(4)
+                         if self.properties.get('channels.{0}.enabled'.format(channel)) == 'True']
+        self.raw_fps = float(self.properties['channels.{0}.framerate_measured'.format(self.channels[0])])
+
+        # Capture frame number of frame index 0, from the burn in
+        self.frame_zero = int(reader.read_burn_in(0))
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        Rebuilds a probe from to_dict, there is no header object on these
+        :param values: dict
+        :return: PicoProbe
+        """
+        probe = cls()
+        for field in cls.FIELDS:
+            setattr(probe, field, values[field])
+        return probe
+
+    def last_index(self):
+        return self.stop_capture_frame_number - self.frame_zero
+
+    def has_indices(self, first, last):
+        """
+        Whether every frame index from first to last is in the take
+        :param first: int
+        :param last: int
+        :return: bool
+        """
+        return 0 <= first <= last <= self.last_index()
+
+
+def probe(file_path, backend='pycara'):
+    """
+    Opens a .pico and reads its metadata without decoding any frame
+    :param file_path: str
+    :param backend: str, a key of READER_BACKENDS
+    :return: tuple(reader, PicoProbe)
+    """
+    reader = open_reader(file_path, backend)
+    return reader, PicoProbe(reader)
+
+
+# ----------------------------------------------------- #
+
+def _pycara_reader():
+    return PyPico.PicoReader()
+
+
+READER_BACKENDS = {'pycara': _pycara_reader,
+                   'synthetic': SyntheticPicoReader}
+
+
+def open_reader(file_path, backend='pycara'):
+    """
+    Opens a .pico with the named reader backend
+    :param file_path: str
+    :param backend: str, a key of READER_BACKENDS
+    :return: PicoReaderBackend or PyPico.PicoReader
+    """
+    try:
+        factory = READER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError('Unknown reader backend: {0}'.format(backend))
+
+    reader = factory()
+    reader.open(file_path)
+    return reader
@@ -0,0 +1,172 @@
+""" Render metrics,
+    Per-stage latency histograms, frames/sec, ETA and bytes written for a render,
+    with json and csv dumps per job.
+    """
+import csv
+import json
+import time
+import bisect
+import threading
+
+
+class StageHistogram(object):
+    # Bucket upper bounds in milliseconds, the last bucket catches everything slower
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, float('inf'))
+
+    def __init__(self):
+        """
+        Fixed bucket latency histogram for one render stage
+        """
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, seconds):
+        milliseconds = seconds * 1000.0
+        self.counts[bisect.bisect_left(self.BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        if self.minimum is None or milliseconds < self.minimum:
+            self.minimum = milliseconds
+        if self.maximum is None or milliseconds > self.maximum:
+            self.maximum = milliseconds
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other['counts'])]
+        self.count += other['count']
+        self.total += other['total_ms']
+        for value in (other['min_ms'], other['max_ms']):
+            if value is None:
+                continue
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Upper bound of the bucket holding the given percentile, in milliseconds
+        :param percent: float, 0 to 100
+        :return: float
+        """
+        if not self.count:
+            return 0.0
+        target = self.count * percent / 100.0
+        running = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            running += count
+            if running >= target:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        return {'count': self.count,
+                'total_ms': self.total,
+                'mean_ms': self.mean(),
+                'min_ms': self.minimum,
+                'max_ms': self.maximum,
+                'p50_ms': self.percentile(50),
+                'p95_ms': self.percentile(95),
+                'counts': list(self.counts)}
+
+
+class RenderStats(object):
+    STAGES = ('read', 'scale', 'overlay', 'rotate', 'write')
+
+    def __init__(self, total_frames=0):
+        """
+        Counters for one render job, safe to update from writer threads
+        :param total_frames: int, frames the render will produce, used for the ETA
+        """
+        self.total_frames = total_frames
+        self.frames = 0
+        self.bytes_written = 0
+        self.stages = dict((stage, StageHistogram()) for stage in self.STAGES)
+
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].add(seconds)
+
+    def add_bytes(self, size):
+        with self.lock:
+            self.bytes_written += size
+
+    def frame_done(self, frames=1):
+        self.frames += frames
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+
+    def merge(self, other):
+        """
+        Folds in the stage timings and bytes of a to_dict() from a worker process
+        :param other: dict
+        :return:
+        """
+        with self.lock:
+            self.bytes_written += other['bytes_written']
+            for stage, histogram in other['stages'].items():
+                self.stages[stage].merge(histogram)
+
+    def elapsed(self):
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        return end_time - self.start_time
+
+    def fps(self):
+        elapsed = self.elapsed()
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """
+        Seconds left at the current rate
+        :return: float
+        """
+        fps = self.fps()
+        if not fps:
+            return 0.0
+        return max(0, self.total_frames - self.frames) / fps
+
+    def to_dict(self):
+        return {'frames': self.frames,
+                'total_frames': self.total_frames,
+                'elapsed': self.elapsed(),
+                'fps': self.fps(),
+                'bytes_written': self.bytes_written,
+                'stages': dict((stage, histogram.to_dict()) for stage, histogram in self.stages.items())}
+
+    def dump(self, path):
+        """
+        Writes the stats to path, as csv if it ends in .csv, json otherwise
+        :param path: str
+        :return:
+        """
+        if path.endswith('.csv'):
+            self.dump_csv(path)
+        else:
+            self.dump_json(path)
+
+    def dump_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def dump_csv(self, path):
+        # One row per stage, the job totals are repeated on every row
+        summary = self.to_dict()
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage', 'count', 'mean_ms', 'min_ms', 'max_ms', 'p50_ms', 'p95_ms',
+                             'frames', 'elapsed', 'fps', 'bytes_written'])
+            for stage in self.STAGES:
+                histogram = summary['stages'][stage]
+                writer.writerow([stage, histogram['count'], histogram['mean_ms'], histogram['min_ms'],
+                                 histogram['max_ms'], histogram['p50_ms'], histogram['p95_ms'],
+                                 summary['frames'], summary['elapsed'], summary['fps'], summary['bytes_written']])
@@ -0,0 +1,116 @@
+""" Integer timecode,
+    Timecodes as plain frame counts since midnight, with SMPTE drop-frame counting at 29.97 and 59.94.
+    Labels for a whole range of frames are built in one vectorised NumPy pass.
+    """
+import re
+
+import numpy as np
+
+# - Globals - #
+gDROP_FRAME_RATES = (30, 60)  # Counting bases that have a drop-frame variant, at 1000/1001 of the rate
+
+_TIMECODE = re.compile(r'^\s*(\d+)[:.](\d+)[:.](\d+)([:;.,])(\d+)\s*$')
+_DAY_SECONDS = 24 * 3600
+
+
+def timecode_rate(fps):
+    """
+    Counting base and drop-frame flag of a measured framerate.
+    Rates closer to the NTSC 1000/1001 of 30 or 60 than to the whole rate count drop-frame,
+    everything else counts at the nearest whole rate, 23.976 included.
+    :param fps: int or float
+    :return: tuple(int, bool)
+    """
+    nominal = max(1, int(round(fps)))
+    if nominal in gDROP_FRAME_RATES:
+        drop_frame = abs(fps - nominal * 1000.0 / 1001.0) < abs(fps - nominal)
+        return nominal, drop_frame
+    return nominal, False
+
+
+def _dropped(fps):
+    # Frame numbers skipped at the start of every minute but each tenth
+    return fps // 15
+
+
+def to_frames(timecode, fps, drop_frame=False):
+    """
+    Frame count of a timecode, counted from 00:00:00:00
+    :param timecode: str, hh:mm:ss:ff, a ; before the frames is read the same, or a sequence of four numbers
+    :param fps: int, counting base
+    :param drop_frame: bool
+    :return: int, raises ValueError for a field out of range at fps, or a label drop-frame skips
+    """
+    if isinstance(timecode, str):
+        match = _TIMECODE.match(timecode)
+        if match is None:
+            raise ValueError('Not a timecode: {0}'.format(timecode))
+        hours, minutes, seconds, _, frames = match.groups()
+    else:
+        hours, minutes, seconds, frames = timecode
+    hours, minutes, seconds, frames = int(hours), int(minutes), int(seconds), int(frames)
+    if minutes >= 60 or seconds >= 60 or frames >= fps:
+        raise ValueError('Not a timecode at {0} fps: {1}'.format(fps, timecode))
+    if drop_frame and minutes % 10 and not seconds and frames < _dropped(fps):
+        raise ValueError('Not a drop-frame timecode at {0} fps: {1}'.format(fps, timecode))
+
+    count = ((hours * 60 + minutes) * 60 + seconds) * fps + frames
+    if drop_frame:
+        total_minutes = hours * 60 + minutes
+        count -= _dropped(fps) * (total_minutes - total_minutes // 10)
+    return count
+
+
+def to_parts(frames, fps, drop_frame=False):
+    """
+    Hours, minutes, seconds and frames of frame counts, rolling over at 24 hours
+    :param frames: int or numpy int array
+    :param fps: int, counting base
+    :param drop_frame: bool
+    :return: tuple of four int or numpy int arrays
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    if drop_frame:
+        dropped = _dropped(fps)
+        per_ten_minutes = fps * 600 - dropped * 9
+        per_minute = fps * 60 - dropped
+        frames = frames % ((fps * _DAY_SECONDS) - dropped * 9 * 24 * 6)
+        tens, remainder = np.divmod(frames, per_ten_minutes)
+        # The first minute of every ten keeps all its frame numbers
+        skipped = np.where(remainder > dropped, dropped * ((remainder - dropped) // per_minute), 0)
+        frames = frames + dropped * 9 * tens + skipped
+
+    seconds, frame = np.divmod(frames, fps)
+    return seconds // 3600 % 24, seconds // 60 % 60, seconds % 60, frame
+
+
+def to_timecode(frames, fps, drop_frame=False):
+    """
+    :param frames: int
+    :param fps: int, counting base
+    :param drop_frame: bool
+    :return: str, hh:mm:ss:ff, or hh:mm:ss;ff drop-frame
+    """
+    return timecodes(frames, 1, fps, drop_frame)[0]
+
+
+def timecodes(first, count, fps, drop_frame=False):
+    """
+    Labels of count consecutive frames, formatted all at once
+    :param first: int, frame count of the first label
+    :param count: int
+    :param fps: int, counting base
+    :param drop_frame: bool
+    :return: list of str
+    """
+    if count <= 0:
+        return []
+
+    parts = to_parts(np.arange(first, first + count, dtype=np.int64), fps, drop_frame)
+    chars = np.empty((count, 11), dtype=np.uint8)
+    for column, values in zip((0, 3, 6, 9), parts):
+        chars[:, column] = values // 10 % 10 + ord('0')
+        chars[:, column + 1] = values % 10 + ord('0')
+    chars[:, 2] = chars[:, 5] = ord(':')
+    chars[:, 8] = ord(';') if drop_frame else ord(':')
+    return chars.view('S11').ravel().astype('U11').tolist()
@@ -0,0 +1,6 @@
+import sys
+
+from PicoSlicer import CyBatch
+
+if __name__ == '__main__':
+    sys.exit(CyBatch.main())
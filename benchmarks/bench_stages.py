@@ -0,0 +1,93 @@
+""" Render stage benchmark,
+    Measures frames/sec for read, overlay, rotate and write separately, then for a whole render,
+    against the synthetic reader so it runs on any machine.
+    Use --log to append the results to a json lines file and track them over time.
+    """
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PicoSlicer import CyPico
+from PicoSlicer import CyReader
+from PicoSlicer import CyOverlay
+
+
+def measure(frames, function):
+    time_stamp = time.perf_counter()
+    for index in range(frames):
+        function(index)
+    return frames / (time.perf_counter() - time_stamp)
+
+
+def bench_stages(width, height, frames, workers=None):
+    output_dir = tempfile.mkdtemp(prefix='pico_bench_')
+    try:
+        take = os.path.join(output_dir, 'bench.pico')
+        CyReader.write_synthetic_pico(take, width=width, height=height,
+                                      stop_capture_frame_number=100 + frames * 2)
+        reader = CyReader.open_reader(take, 'synthetic')
+        rotator = CyPico.FrameRotator(-90)
+        overlay = CyOverlay.BurnInOverlay()
+
+        # Every stage after read works on pre-decoded frames, so only that stage is timed
+        decoded = [reader.get_image(index * 2) for index in range(frames)]
+        overlaid = [overlay(frame.copy(), '01:00:00:00') for frame in decoded]
+        rotated = [rotator(frame) for frame in overlaid]
+
+        timecodes = ['01:00:{0:02}:{1:02}'.format(i // 30 % 60, i % 30) for i in range(frames)]
+
+        results = {'read': measure(frames, lambda i: reader.get_image(i * 2)),
+                   'overlay': measure(frames, lambda i: overlay(decoded[i], timecodes[i])),
+                   'rotate': measure(frames, lambda i: rotator(overlaid[i])),
+                   'write': measure(frames, lambda i: CyPico.write_frame(
+                       rotated[i], os.path.join(output_dir, 'write.{0:04}.jpg'.format(i))))}
+
+        pico = CyPico.PicoFile()
+        pico.reader_backend = 'synthetic'
+        pico.file_path = take
+        pico.override = os.path.join(output_dir, 'render.pico')
+        pico.start_frame = 1001
+        pico.render_length = 'Full'
+        pico.read()
+
+        time_stamp = time.perf_counter()
+        rendered = len(list(pico.render(workers=workers)))
+        results['render'] = rendered / (time.perf_counter() - time_stamp)
+
+        return results
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the PicoFile render stages')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frames', type=int, default=200, help='frames per stage (default %(default)s)')
+    parser.add_argument('--workers', type=int, default=None, help='render processes for the full render')
+    parser.add_argument('--log', help='json lines file to append the results to')
+    args = parser.parse_args(argv)
+
+    results = bench_stages(args.width, args.height, args.frames, args.workers)
+
+    print('{0}x{1}, {2} frames'.format(args.width, args.height, args.frames))
+    for stage, fps in results.items():
+        print('{0:<8} {1:>10.1f} fps'.format(stage, fps))
+
+    if args.log:
+        entry = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'width': args.width, 'height': args.height, 'frames': args.frames, 'workers': args.workers,
+                 'fps': results}
+        with open(args.log, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,9 @@ __status__ = 'Prototype'
 
 import os
 import sys
+import time
+import heapq
+import itertools
 
 import PySide6.QtCore as qc
 import PySide6.QtGui as qg
@@ -16,10 +19,17 @@ import PySide6.QtWidgets as qw
 import qdarkstyle
 
 from PicoSlicer import CyPico
+from PicoSlicer import CyIndex
+from PicoSlicer import CyDaemon
 
 # - Globals - #
 gDIALOG = None
 gROOT = os.getcwd()
+gWRITE_THREADS = 2  # Write-behind threads per render, 0 writes frames on the render thread
+gMAX_TRACKS = 2  # Tracks checked or rendered at the same time by Check All / Run All
+gMAX_PROCESSES = os.cpu_count() or 1  # Render processes shared by every running track
+gDAEMON_POLL_INTERVAL = 0.5  # Seconds between progress checks of a track rendering on the render daemon
+gFRAME_CACHE = False  # Share decoded frames between tracks, only pays off when they slice overlapping ranges
 
 
 class PicoWindow(qw.QMainWindow):
@@ -44,9 +54,16 @@ class PicoSlicer(qw.QDialog):
         # -- Attributes -- #
         self.pico_tracks = list()
         self.height = 720
+        self.scheduler = PicoRenderScheduler()
+        self.use_daemon = False  # Whether renders go to the render daemon, known once it has been probed
 
         self.draw()
 
+        # Probed once, away from the GUI thread
+        self.daemon_probe = PicoDaemonProbeThread()
+        self.daemon_probe.probed.connect(self._daemon_probed)
+        self.daemon_probe.start()
+
     def __call__(self, *args, **kwargs):
         self.show()
 
@@ -104,6 +121,9 @@ class PicoSlicer(qw.QDialog):
         overall_lyt.setAlignment(qc.Qt.AlignRight)
         self.layout().addLayout(overall_lyt)
 
+        self.throughput_lbl = qw.QLabel()
+        overall_lyt.addWidget(self.throughput_lbl)
+
         self.check_all_btn = qw.QPushButton()
         self.check_all_btn.setText('Check All')
         self.check_all_btn.setEnabled(True)
@@ -122,11 +142,14 @@ class PicoSlicer(qw.QDialog):
         add_track_btn.clicked.connect(self.add)
         self.check_all_btn.clicked.connect(self.check_all)
         self.run_all_btn.clicked.connect(self.render_all)
+        self.scheduler.throughput.connect(self._update_throughput)
+        self.scheduler.queue_finished.connect(self.throughput_lbl.clear)
 
     # ---------------------------------------------- #
 
     def add(self):
         new_pico_track = PicoTrack()
+        new_pico_track.use_daemon = self.use_daemon
         self.pico_tracks_lyt.addWidget(new_pico_track)
         self.pico_tracks.append(new_pico_track)
         new_pico_track.remove_track.connect(self.remove)
@@ -136,12 +159,22 @@ class PicoSlicer(qw.QDialog):
     # ---------------------------------------------- #
 
     def check_all(self):
-        for track in self.pico_tracks:
-            track.check()
+        self.scheduler.check(self.pico_tracks)
 
     def render_all(self):
-        for track in self.pico_tracks:
-            track.render_sequence()
+        self.scheduler.render(self.pico_tracks)
+
+    @qc.Slot(float, int)
+    def _update_throughput(self, fps, running):
+        self.throughput_lbl.setText('{0} running - {1:.1f} fps'.format(running, fps))
+
+    @qc.Slot(bool)
+    def _daemon_probed(self, running):
+        self.use_daemon = running
+        for pico_track in self.pico_tracks:
+            pico_track.use_daemon = running
+        if running:
+            print('Render daemon found, renders will be queued there')
 
     # ---------------------------------------------- #
 
@@ -176,7 +209,10 @@ class PicoTrack(qw.QFrame):
 
         # ------ Attributes ------- #
         self.pico = CyPico.PicoFile()
+        if gFRAME_CACHE:
+            self.pico.frame_cache = CyPico.shared_frame_cache()
         self.is_valid = False
+        self.use_daemon = False  # Render on the local render daemon, see PicoSlicer._daemon_probed
         self.check_thread = None
         self.render_thread = None
         self.animation = None
@@ -241,7 +277,11 @@ class PicoTrack(qw.QFrame):
         self.run_btn.setEnabled(False)
         self.run_btn.setMaximumWidth(self.run_btn.fontMetrics().boundingRect('Check').width() + 24)
         # self.run_btn.clicked.connect(self._download)
+        self.profile_cb = qw.QComboBox()
+        self.profile_cb.addItems(list(CyPico.PROFILES))
+        self.profile_cb.setToolTip('Output size and quality, proxy and thumbnail are fast review renders')
         progress_lyt.addWidget(self.progress_bar)
+        progress_lyt.addWidget(self.profile_cb)
         progress_lyt.addWidget(self.check_btn)
         progress_lyt.addWidget(self.run_btn)
         self.layout().addLayout(progress_lyt)
@@ -394,6 +434,7 @@ class PicoTrack(qw.QFrame):
             self.pico.start_frame = int(self.render_lyt.start_frame_le.placeholderText())
 
         self.pico.render_length = self.render_lyt.get_length()
+        self.pico.profile = str(self.profile_cb.currentText())
 
         if self.render_lyt.tc_in.text() != '':
             self.pico.timecode_in = str(self.render_lyt.tc_in.text())
@@ -404,21 +445,47 @@ class PicoTrack(qw.QFrame):
     # ---------------------------------------------------------- #
 
     def check(self):
+        self.start_check()
+
+    def render_sequence(self):
+        self.start_render()
+
+    def start_check(self, start=True):
+        """
+        Maps the GUI values and starts a check thread
+        :param start: bool, False leaves starting the thread to the caller, once it has connected its signals
+        :return: PicoCheckThread
+        """
         # Connect GUI values to PicoFile instance
         self._map_values_from_gui()
         self.check_thread = PicoCheckThread(self.pico)
         self.check_thread.is_timecode_valid.connect(self._test_result)
-        self.check_thread.start()
+        if start:
+            self.check_thread.start()
+        return self.check_thread
 
-    def render_sequence(self):
+    def start_render(self, workers=None, start=True):
+        """
+        Starts a render thread if the track has passed its check, the render goes to the local render daemon
+        when one was running at startup, see CyDaemon
+        :param workers: int, render processes for this track
+        :param start: bool, see start_check
+        :return: PicoRenderThread or None
+        """
         # Render sequence
         if self.is_valid:
-            self.render_thread = PicoRenderThread(self.pico)
+            if self.use_daemon:
+                self.render_thread = PicoDaemonRenderThread(self.pico, workers=workers)
+            else:
+                self.render_thread = PicoRenderThread(self.pico, workers=workers)
             self.render_thread.render_progress.connect(self._update_progress_bar)
+            self.render_thread.render_throughput.connect(self._update_throughput)
             self.render_thread.render_finished.connect(self._done)
-            self.render_thread.start()
+            if start:
+                self.render_thread.start()
+            return self.render_thread
         else:
-            pass
+            return None
 
     # ------ Slot Definitions ------ #
 
@@ -437,10 +504,16 @@ class PicoTrack(qw.QFrame):
     def _update_progress_bar(self, progress):
         self.progress_bar.setValue(progress)
 
+    @qc.Slot(float, float)
+    def _update_throughput(self, fps, eta):
+        minutes, seconds = divmod(int(eta), 60)
+        self.progress_bar.setFormat('%p% - {0:.1f} fps - ETA {1}:{2:02}'.format(fps, minutes, seconds))
+
     @qc.Slot()
     def _done(self):
         print('Render has finished')
         self.progress_bar.setValue(0)
+        self.progress_bar.setFormat('%p%')
 
 
 # ----------------------------------------------------- #
@@ -460,7 +533,7 @@ class PicoCheckThread(qc.QThread):
 
     def run(self):
         # Process Shit
-        self.pico_instance.read()
+        self.pico_instance.read(index=CyIndex.default_index())
         self.pico_instance.report()
         res = self.pico_instance.validate_timecode_input()
         self.is_timecode_valid.emit(res)
@@ -472,26 +545,171 @@ class PicoCheckThread(qc.QThread):
 class PicoRenderThread(qc.QThread):
     # -- Signals -- #
     render_progress = qc.Signal(int)
+    render_throughput = qc.Signal(float, float)  # Frames per second, seconds left
     render_finished = qc.Signal()
 
-    def __init__(self, pico_instance):
+    def __init__(self, pico_instance, workers=None, write_threads=gWRITE_THREADS, instrument=False, stats_path=None):
         super(PicoRenderThread, self).__init__()
         self.pico_instance = pico_instance
+        self.workers = workers
+        self.write_threads = write_threads
+        self.instrument = instrument
+        self.stats_path = stats_path
 
     def __del__(self):
         self.wait()
 
     def run(self):
         # Process Shit
-        for index, frames in enumerate(self.pico_instance.render()):
+        # A render that died halfway picks up from its first missing frame
+        render = self.pico_instance.render(workers=self.workers, write_threads=self.write_threads,
+                                           instrument=self.instrument, stats_path=self.stats_path, resume=True)
+        for index, frames in enumerate(render):
             progress = abs(index * 100 / (self.pico_instance.total_frames / 2))
             self.render_progress.emit(progress)
+            stats = self.pico_instance.render_stats
+            self.render_throughput.emit(stats.fps(), stats.eta())
+
+        if self.pico_instance.frame_cache is not None:
+            print('Frame cache: {hits} hits, {misses} misses, {frames} frames in {bytes} bytes'.format(
+                **self.pico_instance.frame_cache.stats()))
         self.render_finished.emit()
 
 
 # ----------------------------------------------------- #
 
 
+class PicoDaemonProbeThread(qc.QThread):
+    # -- Signals -- #
+    probed = qc.Signal(bool)
+
+    def __del__(self):
+        self.wait()
+
+    def run(self):
+        self.probed.emit(CyDaemon.DaemonClient(timeout=1.0).is_running())
+
+
+# ----------------------------------------------------- #
+
+
+class PicoDaemonRenderThread(PicoRenderThread):
+    def __init__(self, pico_instance, workers=None):
+        """
+        Hands the render to the local render daemon and follows it, with the same signals as a local render.
+        When the daemon can't take the job the track renders here instead.
+        """
+        super(PicoDaemonRenderThread, self).__init__(pico_instance, workers=workers)
+        self.job_id = None
+
+    def run(self):
+        client = CyDaemon.DaemonClient()
+        try:
+            self.job_id = client.submit(CyDaemon.job_from_pico(self.pico_instance))
+        except (OSError, ValueError, RuntimeError) as e:
+            print('Render daemon did not take the render, rendering here: {0}'.format(e))
+            super(PicoDaemonRenderThread, self).run()
+            return
+        print('Render queued on the render daemon as job {0}'.format(self.job_id))
+
+        # Whatever happens to the daemon, the track hears the render is over
+        try:
+            job = client.job(self.job_id)
+            while job['state'] in (CyDaemon.QUEUED, CyDaemon.RUNNING):
+                if job.get('total'):
+                    self.render_progress.emit(job['frames'] * 100 // job['total'])
+                    self.render_throughput.emit(job['fps'], job['eta'] if job.get('eta') is not None else 0.0)
+                time.sleep(gDAEMON_POLL_INTERVAL)
+                job = client.job(self.job_id)
+
+            if job['state'] != CyDaemon.DONE:
+                print('Render daemon job {0} {1} {2}'.format(self.job_id, job['state'], job['error'] or ''))
+        except (OSError, ValueError, RuntimeError) as e:
+            print('Lost the render daemon during job {0}: {1}'.format(self.job_id, e))
+        finally:
+            self.render_finished.emit()
+
+
+# ----------------------------------------------------- #
+
+
+class PicoRenderScheduler(qc.QObject):
+    # -- Signals -- #
+    throughput = qc.Signal(float, int)  # Aggregate frames per second, running jobs
+    queue_finished = qc.Signal()
+
+    # Checks are cheap and unlock renders, so they always go first
+    CHECK, RENDER = 0, 1
+
+    def __init__(self, max_tracks=gMAX_TRACKS, max_processes=gMAX_PROCESSES):
+        """
+        Queues track checks and renders and runs them under a global budget,
+        max_tracks jobs at a time sharing max_processes render processes.
+        Renders are started shortest slice first so the first results land quickly.
+        """
+        super(PicoRenderScheduler, self).__init__()
+        self.max_tracks = max_tracks
+        self.max_processes = max_processes
+
+        self.queue = []
+        self.running = {}  # thread -> track
+        self.rates = {}  # thread -> frames per second
+        self.counter = itertools.count()
+
+    def check(self, tracks):
+        for track in tracks:
+            self._push(self.CHECK, 0, track)
+        self._next()
+
+    def render(self, tracks):
+        for track in tracks:
+            if track.is_valid:
+                self._push(self.RENDER, track.pico.total_frames, track)
+        self._next()
+
+    def _push(self, kind, length, track):
+        # Don't queue the same job twice if the button gets hammered
+        for queued_kind, _, _, queued_track in self.queue:
+            if queued_kind == kind and queued_track is track:
+                return
+        heapq.heappush(self.queue, (kind, length, next(self.counter), track))
+
+    def _workers(self):
+        return max(1, self.max_processes // self.max_tracks)
+
+    def _next(self):
+        while self.queue and len(self.running) < self.max_tracks:
+            kind, _, _, track = heapq.heappop(self.queue)
+
+            # Connected before the thread starts, a job that is over straight away still frees its slot
+            if kind == self.CHECK:
+                thread = track.start_check(start=False)
+            else:
+                thread = track.start_render(workers=self._workers(), start=False)
+                if thread is None:
+                    continue
+                thread.render_throughput.connect(lambda fps, eta, t=thread: self._update_rate(t, fps))
+
+            self.running[thread] = track
+            thread.finished.connect(lambda t=thread: self._finished(t))
+            thread.start()
+
+    def _update_rate(self, thread, fps):
+        self.rates[thread] = fps
+        self.throughput.emit(sum(self.rates.values()), len(self.running))
+
+    def _finished(self, thread):
+        self.running.pop(thread, None)
+        self.rates.pop(thread, None)
+        self._next()
+
+        if not self.running and not self.queue:
+            self.queue_finished.emit()
+
+
+# ----------------------------------------------------- #
+
+
 class PicoTrackHeader(qw.QWidget):
     def __init__(self, text=None, shadow=True, color=(150, 150, 150)):
         super(PicoTrackHeader, self).__init__()
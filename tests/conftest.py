@@ -0,0 +1,74 @@
+""" Test fixtures,
+    Takes written for the synthetic reader, so every test runs without PyCara or a real .pico.
+    """
+import os
+import glob
+import hashlib
+
+import pytest
+
+from PicoSlicer import CyPico
+from PicoSlicer import CyReader
+
+# - Globals - #
+gWIDTH = 64
+gHEIGHT = 48
+gSTART_CAPTURE = 100  # Capture frame of the first frame, at the jam timecode 01:00:00:00 and 60 fps
+
+
+@pytest.fixture
+def make_take(tmp_path):
+    """
+    :return: callable(name='take', **settings) writing a synthetic take, see CyReader.write_synthetic_pico
+    """
+    def make_take(name='take', **settings):
+        take = str(tmp_path / '{0}.pico'.format(name))
+        settings.setdefault('width', gWIDTH)
+        settings.setdefault('height', gHEIGHT)
+        CyReader.write_synthetic_pico(take, **settings)
+        return take
+    return make_take
+
+
+@pytest.fixture
+def take(make_take):
+    return make_take(stop_capture_frame_number=gSTART_CAPTURE + 80)
+
+
+@pytest.fixture
+def make_pico(tmp_path):
+    """
+    :return: callable(take, output, tc_in=None, tc_out=None, **attributes) returning a read PicoFile
+             rendering into tmp_path/output, the whole take when no range is given
+    """
+    def make_pico(take, output, tc_in=None, tc_out=None, **attributes):
+        output_dir = tmp_path / output
+        output_dir.mkdir(exist_ok=True)
+
+        pico = CyPico.PicoFile()
+        pico.reader_backend = 'synthetic'
+        pico.file_path = take
+        pico.override = str(output_dir / 'shot.pico')
+        pico.start_frame = 1001
+        if tc_in is None:
+            pico.render_length = 'Full'
+        else:
+            pico.render_length = 'Slice'
+            pico.timecode_in = tc_in
+            pico.timecode_out = tc_out
+        for attribute, value in attributes.items():
+            setattr(pico, attribute, value)
+        pico.read()
+        return pico
+    return make_pico
+
+
+@pytest.fixture
+def frame_hashes():
+    """
+    :return: callable(output_dir) giving a dict of jpg name -> md5 of its bytes
+    """
+    def frame_hashes(output_dir):
+        return dict((os.path.basename(path), hashlib.md5(open(path, 'rb').read()).hexdigest())
+                    for path in sorted(glob.glob(os.path.join(str(output_dir), '*.jpg'))))
+    return frame_hashes
@@ -0,0 +1,91 @@
+""" Asyncio jobs,
+    Renders driven from an event loop stop between two frames on a timeout or a cancel, and can be resumed.
+    """
+import os
+import time
+import asyncio
+
+import pytest
+
+from PicoSlicer import CyAsync
+from PicoSlicer import CyCheckpoint
+
+
+@pytest.fixture
+def long_take(make_take):
+    return make_take('long', width=640, height=480, stop_capture_frame_number=700)
+
+
+def rendered(pico):
+    return sorted(name for name in os.listdir(os.path.dirname(pico.output_name)) if name.endswith('.jpg'))
+
+
+def test_run_job(take, make_pico, frame_hashes):
+    reference = make_pico(take, 'reference')
+    list(reference.render())
+
+    pico = make_pico(take, 'async')
+    stats = asyncio.run(CyAsync.JobRunner().run_job(pico))
+    assert stats.total_frames == len(pico.render_plan())
+    assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
+
+
+def test_progress(take, make_pico):
+    async def progress():
+        return [update async for update in CyAsync.render_job(make_pico(take, 'progress'))]
+
+    updates = asyncio.run(progress())
+    assert [update.frames for update in updates] == list(range(1, len(updates) + 1))
+    assert all(update.total == len(updates) for update in updates)
+
+
+def test_timeout(long_take, make_pico):
+    pico = make_pico(long_take, 'timeout')
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(CyAsync.JobRunner().run_job(pico, timeout=0.5, resume=True))
+
+    # Stopped between two frames, with everything written on record
+    written = rendered(pico)
+    assert 0 < len(written) < len(pico.render_plan())
+    manifest = CyCheckpoint.RenderCheckpoint.read_manifest(pico.checkpoint_path())
+    assert sorted(manifest['frames']) == written
+
+    pico = make_pico(long_take, 'timeout')
+    asyncio.run(CyAsync.JobRunner().run_job(pico, resume=True))
+    assert pico.render_stats.total_frames == len(pico.render_plan()) - len(written)
+    assert len(rendered(pico)) == len(pico.render_plan())
+
+
+def test_cancel(long_take, make_pico):
+    pico = make_pico(long_take, 'cancel')
+
+    async def cancel_after(frames):
+        task = asyncio.ensure_future(CyAsync.JobRunner().run_job(pico, write_threads=2))
+        while pico.render_stats is None or len(rendered(pico)) < frames:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel_after(10))
+    written = rendered(pico)
+    time.sleep(0.5)
+    assert rendered(pico) == written
+    assert 10 <= len(written) < len(pico.render_plan())
+
+
+def test_jobs_wait_for_a_slot(take, make_pico):
+    runner = CyAsync.JobRunner(max_jobs=1)
+    updates = []
+
+    async def job(output):
+        async for _ in runner.render_job(make_pico(take, output)):
+            updates.append(output)
+
+    async def both():
+        await asyncio.gather(job('first'), job('second'))
+
+    asyncio.run(both())
+    # One job ran to its end before the other got its first frame
+    frames = len(updates) // 2
+    assert updates == ['first'] * frames + ['second'] * frames
@@ -0,0 +1,77 @@
+""" Frame cache,
+    Least recently used frames go first, and a render through the cache writes the same frames.
+    """
+import os
+
+import numpy as np
+
+from PicoSlicer import CyPico
+
+
+def frame(value, size=10):
+    return np.full((size, size, 3), value, dtype=np.uint8)
+
+
+def test_eviction_and_counts():
+    # Room for three 300 byte frames
+    cache = CyPico.FrameCache(max_bytes=900)
+    for index in range(3):
+        cache.put('take', index, frame(index))
+    assert len(cache) == 3
+
+    assert cache.get('take', 0) is not None
+    assert cache.get('take', 3) is None
+    cache.put('take', 3, frame(3))
+    # 1 was used least recently
+    assert cache.get('take', 1) is None
+    assert [cache.get('take', index)[0, 0, 0] for index in (0, 2, 3)] == [0, 2, 3]
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (4, 2, 1)
+    assert stats['hit_rate'] == 4 / 6
+    assert (stats['frames'], stats['bytes']) == (3, 900)
+
+
+def test_keys_copies_and_clear():
+    cache = CyPico.FrameCache(max_bytes=900)
+    original = frame(1)
+    cache.put('take', 0, original)
+    cache.put('take', 0, frame(2), channel=1)
+    cache.put('other', 0, frame(3))
+    # Replacing a frame doesn't count it twice
+    cache.put('other', 0, frame(4))
+    assert cache.stats()['bytes'] == 900
+
+    # Drawing on what went in or came out leaves the cached frame alone
+    original[:] = 9
+    cache.get('take', 0)[:] = 9
+    assert cache.get('take', 0)[0, 0, 0] == 1
+    assert cache.get('take', 0, channel=1)[0, 0, 0] == 2
+    assert cache.get('other', 0)[0, 0, 0] == 4
+
+    # Bigger than the whole budget
+    cache.put('take', 1, frame(5, size=20))
+    assert cache.get('take', 1) is None
+    assert cache.stats()['evictions'] == 0
+
+    cache.clear('other')
+    assert cache.get('other', 0) is None
+    assert (len(cache), cache.stats()['bytes']) == (2, 600)
+    cache.clear()
+    assert (len(cache), cache.stats()['bytes']) == (0, 0)
+
+
+def test_render_through_cache(take, make_pico, frame_hashes):
+    reference = make_pico(take, 'reference')
+    list(reference.render())
+
+    cache = CyPico.FrameCache()
+    for output in ('first', 'second'):
+        pico = make_pico(take, output, frame_cache=cache)
+        list(pico.render())
+        assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
+
+    # The second render decoded nothing
+    frames = len(pico.render_plan())
+    assert cache.stats()['misses'] == frames
+    assert cache.stats()['hits'] >= frames
@@ -0,0 +1,51 @@
+""" Multi-camera renders,
+    Every channel of a take from one sweep, to outputs of their own or tiled into a contact sheet.
+    """
+import os
+
+import cv2
+import pytest
+
+
+@pytest.fixture
+def two_cameras(make_take):
+    return make_take('cameras', channels=[0, 2], stop_capture_frame_number=180)
+
+
+def test_separate_outputs(two_cameras, make_pico, frame_hashes):
+    reference = make_pico(two_cameras, 'reference')
+    list(reference.render())
+    expected = frame_hashes(os.path.dirname(reference.output_name))
+
+    pico = make_pico(two_cameras, 'channels')
+    assert pico.channels == [0, 2]
+    frames = len(pico.render_plan())
+    assert len(list(pico.render_channels())) == frames
+    assert pico.render_stats.total_frames == frames * 2
+
+    written = frame_hashes(os.path.dirname(pico.output_name))
+    assert len(written) == frames * 2
+    # The first camera is what a plain render writes, the other one is a different picture
+    cam0 = dict((name.replace('shot_cam0', 'shot'), md5) for name, md5 in written.items() if '_cam0.' in name)
+    cam2 = dict((name.replace('shot_cam2', 'shot'), md5) for name, md5 in written.items() if '_cam2.' in name)
+    assert cam0 == expected
+    assert sorted(cam2) == sorted(expected)
+    assert not set(cam2.values()) & set(expected.values())
+
+
+def test_contact_sheet(two_cameras, make_pico, frame_hashes):
+    pico = make_pico(two_cameras, 'sheet')
+    list(pico.render_channels(layout='sheet', channels=[2, 0], write_threads=2))
+    written = frame_hashes(os.path.dirname(pico.output_name))
+    assert len(written) == len(pico.render_plan())
+    assert pico.render_stats.total_frames == len(written)
+
+    # Both rotated frames side by side
+    sheet = cv2.imread(os.path.join(os.path.dirname(pico.output_name), sorted(written)[0]))
+    assert sheet.shape == (64, 96, 3)
+
+
+def test_unknown_layout(two_cameras, make_pico):
+    pico = make_pico(two_cameras, 'unknown')
+    with pytest.raises(ValueError):
+        next(pico.render_channels(layout='grid'))
@@ -0,0 +1,91 @@
+""" Resumable renders,
+    A render with resume=True only renders what earlier renders with the same settings
+    didn't leave whole on disk, and ends up with the same files as a render in one go.
+    """
+import os
+import json
+
+from PicoSlicer import CyCheckpoint
+
+
+def render_until(pico, frames, **render_options):
+    """
+    Renders frames frames with a checkpoint, then stops the render the way a cancel does
+    """
+    render_frames = pico.render(resume=True, **render_options)
+    for _ in zip(range(frames), render_frames):
+        pass
+    render_frames.close()
+
+
+def test_resume_after_interrupt(take, make_pico, frame_hashes):
+    reference = make_pico(take, 'reference')
+    list(reference.render())
+
+    pico = make_pico(take, 'resumed')
+    render_until(pico, 10)
+    manifest = CyCheckpoint.RenderCheckpoint.read_manifest(pico.checkpoint_path())
+    assert len(manifest['frames']) == 10
+    assert not manifest['complete']
+
+    pico = make_pico(take, 'resumed')
+    assert len(list(pico.render(resume=True))) == len(pico.render_plan())
+    assert pico.render_stats.total_frames == len(pico.render_plan()) - 10
+    assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
+    assert CyCheckpoint.RenderCheckpoint.read_manifest(pico.checkpoint_path())['complete']
+
+    # Nothing left to do, and other settings start over
+    pico = make_pico(take, 'resumed')
+    list(pico.render(resume=True))
+    assert pico.render_stats.total_frames == 0
+
+    pico = make_pico(take, 'resumed', rotation=90)
+    list(pico.render(resume=True))
+    assert pico.render_stats.total_frames == len(pico.render_plan())
+
+
+def test_resume_after_interrupted_write_behind(take, make_pico, frame_hashes):
+    # Frames still queued when the render stops get written on close, and have to make it into the manifest
+    reference = make_pico(take, 'reference')
+    list(reference.render())
+
+    pico = make_pico(take, 'resumed')
+    render_until(pico, 10, write_threads=2, write_depth=16)
+    written = frame_hashes(os.path.dirname(pico.output_name))
+    manifest = CyCheckpoint.RenderCheckpoint.read_manifest(pico.checkpoint_path())
+    assert sorted(manifest['frames']) == sorted(written)
+    assert len(written) >= 10
+
+    pico = make_pico(take, 'resumed')
+    list(pico.render(resume=True, write_threads=2, write_depth=16))
+    assert pico.render_stats.total_frames == len(pico.render_plan()) - len(written)
+    assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
+
+
+def test_resume_rerenders_damaged_frames(take, make_pico):
+    pico = make_pico(take, 'damaged')
+    list(pico.render(resume=True))
+
+    with open(pico.checkpoint_path()) as f:
+        first = sorted(json.load(f)['frames'])[0]
+    with open(os.path.join(os.path.dirname(pico.output_name), first), 'r+b') as f:
+        f.truncate(100)
+
+    pico = make_pico(take, 'damaged')
+    list(pico.render(resume=True))
+    assert pico.render_stats.total_frames == 1
+
+
+def test_widened_range_reuses_frames(take, make_pico, frame_hashes):
+    pico = make_pico(take, 'widened', '01:00:02:00', '01:00:02:15')
+    list(pico.render(resume=True))
+    narrow = len(pico.render_plan())
+
+    # Starting earlier renumbers the frames already there, only the new ones get rendered
+    pico = make_pico(take, 'widened', '01:00:01:25', '01:00:02:25')
+    list(pico.render(resume=True))
+    assert pico.render_stats.total_frames == len(pico.render_plan()) - narrow
+
+    reference = make_pico(take, 'reference', '01:00:01:25', '01:00:02:25')
+    list(reference.render())
+    assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
@@ -0,0 +1,197 @@
+""" Render daemon,
+    A PicoDaemon on a free port, rendering synthetic takes with a pool of its own.
+    """
+import os
+import stat
+import time
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from PicoSlicer import CyBatch
+from PicoSlicer import CyDaemon
+from PicoSlicer import CyIndex
+from PicoSlicer import CyCheckpoint
+
+
+@pytest.fixture
+def start_daemon(tmp_path):
+    """
+    :return: callable(**options) serving a PicoDaemon on a thread, every one of them stopped after the test
+    """
+    running = []
+
+    def start_daemon(**options):
+        options.setdefault('workers', 2)
+        daemon = CyDaemon.PicoDaemon(port=0, queue_path=str(tmp_path / 'daemon.sqlite'),
+                                     index=CyIndex.PicoIndex(str(tmp_path / 'index.sqlite')),
+                                     token_dir=str(tmp_path / 'daemon'), **options)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        running.append((daemon, thread))
+        wait_for(lambda: daemon.token is not None)
+        return daemon
+
+    yield start_daemon
+    for daemon, thread in running:
+        if thread.is_alive():
+            daemon.shutdown()
+        thread.join()
+
+
+def wait_for(condition, timeout=60.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'Timed out'
+        time.sleep(0.05)
+
+
+def client_of(daemon):
+    return CyDaemon.DaemonClient(port=daemon.port, token_dir=daemon.token_dir)
+
+
+def make_job(take, output_dir):
+    output_dir.mkdir(exist_ok=True)
+    job = CyBatch.make_job(take, 1001)
+    job.update(override=str(output_dir / 'shot.pico'), reader_backend='synthetic')
+    return job
+
+
+def rendered(output_dir):
+    return sorted(name for name in os.listdir(str(output_dir)) if name.endswith('.jpg'))
+
+
+def test_cancel_running_job(start_daemon, make_take, tmp_path):
+    # Frames of a cancelled job still queued in the shared pool must not keep being written
+    take = make_take(stop_capture_frame_number=100 + 1200, width=640, height=480)
+    daemon = start_daemon()
+    client = client_of(daemon)
+
+    job_id = client.submit(make_job(take, tmp_path / 'output'))
+    wait_for(lambda: (client.job(job_id)['frames'] or 0) >= 20)
+    assert client.cancel(job_id)
+    wait_for(lambda: client.job(job_id)['state'] == CyDaemon.CANCELLED)
+
+    written = rendered(tmp_path / 'output')
+    time.sleep(1.0)
+    assert rendered(tmp_path / 'output') == written
+    assert len(written) < 601
+
+    manifest = CyCheckpoint.RenderCheckpoint.read_manifest(str(tmp_path / 'output' / 'shot.render.json'))
+    assert sorted(manifest['frames']) == written
+    assert not manifest['complete']
+
+
+def post(daemon, body=b'{"jsonrpc": "2.0", "id": 1, "method": "status"}', **headers):
+    """
+    :return: int, the HTTP status of a raw request to the daemon
+    """
+    headers = dict((key.replace('_', '-'), value) for key, value in headers.items())
+    headers.setdefault('Content-Type', 'application/json')
+    request = urllib.request.Request('http://127.0.0.1:{0}/'.format(daemon.port), data=body, headers=headers)
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    try:
+        with opener.open(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.close()
+        return e.code
+
+
+def test_token_file(start_daemon):
+    daemon = start_daemon()
+    path = CyDaemon.token_path(daemon.port, daemon.token_dir)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert CyDaemon.read_token(path) == daemon.token
+    assert daemon.is_authorized(daemon.token)
+    assert not daemon.is_authorized(daemon.token[:-1] + 'x')
+    assert not daemon.is_authorized(None)
+
+    client_of(daemon).shutdown()
+    wait_for(lambda: not os.path.exists(path))
+
+
+def test_refused_requests(start_daemon):
+    daemon = start_daemon()
+    assert post(daemon, X_Pico_Token=daemon.token) == 200
+    assert post(daemon) == 401
+    assert post(daemon, X_Pico_Token='0' * 64) == 401
+    # Sent by a browser for a web page
+    assert post(daemon, X_Pico_Token=daemon.token, Origin='http://example.com') == 403
+    assert post(daemon, X_Pico_Token=daemon.token, Host='example.com:{0}'.format(daemon.port)) == 403
+    assert post(daemon, X_Pico_Token=daemon.token, Content_Type='text/plain') == 415
+    assert post(daemon, body=b'status', X_Pico_Token=daemon.token, Content_Type='text/plain') == 415
+
+
+@pytest.mark.parametrize('change, options', [
+    ({'path': 'take.pico'}, {}),
+    ({'path': '/nowhere/take.pico'}, {}),
+    ({'override': 'output/shot.pico'}, {}),
+    ({'override': '/nowhere/shot.pico'}, {}),
+    ({}, {'stats_path': 'stats.json'}),
+    ({}, {'stats_path': '{output}/stats.txt'}),
+    ({}, {'frames': 10}),
+    ({'output_format': 'png'}, {}),
+    ({'reader_backend': 'other'}, {}),
+    ({'profile': 'other'}, {}),
+])
+def test_check_job(take, tmp_path, change, options):
+    job = make_job(take, tmp_path / 'output')
+    CyDaemon.check_job(job, {'stats_path': str(tmp_path / 'output' / 'stats.json')})
+
+    job.update(change)
+    options = dict((key, value.format(output=tmp_path / 'output') if isinstance(value, str) else value)
+                   for key, value in options.items())
+    with pytest.raises(ValueError):
+        CyDaemon.check_job(job, options)
+
+
+def test_refused_job_is_not_queued(start_daemon, take, tmp_path):
+    daemon = start_daemon()
+    client = client_of(daemon)
+    job = make_job(take, tmp_path / 'output')
+    job['override'] = 'shot.pico'
+    with pytest.raises(RuntimeError):
+        client.submit(job)
+    assert client.jobs() == []
+
+
+def test_requeue_after_restart(start_daemon, make_take, tmp_path):
+    take = make_take(stop_capture_frame_number=100 + 1200, width=640, height=480)
+    daemon = start_daemon()
+    client = client_of(daemon)
+    job_id = client.submit(make_job(take, tmp_path / 'output'))
+    wait_for(lambda: (client.job(job_id)['frames'] or 0) >= 20)
+    client.shutdown()
+    # Stopped for good once its job is queued again, a new daemon would take a running job over
+    wait_for(lambda: daemon.loop.is_closed())
+    first = os.stat(str(tmp_path / 'output' / 'shot.1001.jpg')).st_mtime_ns
+
+    daemon = start_daemon()
+    client = client_of(daemon)
+    assert client.job(job_id)['state'] in (CyDaemon.QUEUED, CyDaemon.RUNNING)
+    wait_for(lambda: client.job(job_id)['state'] == CyDaemon.DONE)
+    assert len(rendered(tmp_path / 'output')) == 601
+    assert client.job(job_id)['frames'] == 601
+    # What the first daemon finished is kept
+    assert os.stat(str(tmp_path / 'output' / 'shot.1001.jpg')).st_mtime_ns == first
+
+
+def test_cancel_queued_job(start_daemon, make_take, take, tmp_path):
+    long_take = make_take('long', stop_capture_frame_number=100 + 1200, width=640, height=480)
+    daemon = start_daemon(max_jobs=1)
+    client = client_of(daemon)
+    running = client.submit(make_job(long_take, tmp_path / 'running'))
+    queued = client.submit(make_job(take, tmp_path / 'queued'))
+    wait_for(lambda: client.job(running)['state'] == CyDaemon.RUNNING)
+
+    assert client.cancel(queued)
+    assert client.job(queued)['state'] == CyDaemon.CANCELLED
+    assert not client.cancel(queued)
+    assert client.cancel(running)
+    wait_for(lambda: client.job(running)['state'] == CyDaemon.CANCELLED)
+    time.sleep(0.5)
+    assert rendered(tmp_path / 'queued') == []
+    assert client.status()['jobs'].get(CyDaemon.CANCELLED) == 2
@@ -0,0 +1,52 @@
+""" EDL selects,
+    Source ranges read out of an edit decision list.
+    """
+import pytest
+
+from PicoSlicer import CyLookup
+
+# - Globals - #
+gEDL = '''TITLE: SELECTS
+FCM: NON-DROP FRAME
+
+001  AX       V     C        01:00:01:00 01:00:02:00 00:00:00:00 00:00:01:00
+* FROM CLIP NAME: /takes/A001_C002.pico
+002  AX       V     C        01:00:05:00 01:00:05:00 00:00:01:00 00:00:01:00
+002  BX       V     D    015 01:00:10:00 01:00:11:00 00:00:01:00 00:00:02:00
+* FROM CLIP NAME: A001_C002.pico
+* COMMENT: a second cut of the same clip
+003  CX       V     C        01:00:20;00 01:00:21;00 00:00:02:00 00:00:03:00
+'''
+
+
+def test_load_edl(tmp_path):
+    edl_path = tmp_path / 'selects.edl'
+    edl_path.write_text(gEDL)
+
+    assert CyLookup.load_ranges(str(edl_path)) == [
+        {'tc_in': '01:00:01:00', 'tc_out': '01:00:01:29', 'start_frame': 1001, 'override': None,
+         'name': 'A001_C002'},
+        {'tc_in': '01:00:10:00', 'tc_out': '01:00:10:29', 'start_frame': 1001, 'override': None,
+         'name': 'A001_C002_002'},
+        {'tc_in': '01:00:20;00', 'tc_out': '01:00:20;29', 'start_frame': 1001, 'override': None, 'name': None}]
+
+
+def test_load_edl_fcm_and_framerate(tmp_path):
+    edl_path = tmp_path / 'selects.edl'
+    edl_path.write_text('FCM: DROP FRAME\n'
+                        '001  AX       V     C        01:01:00:02 01:01:01:00 00:00:00:00 00:00:00:28\n')
+    assert [(timecode_range['tc_in'], timecode_range['tc_out']) for timecode_range in
+            CyLookup.load_ranges(str(edl_path))] == [('01:01:00:02', '01:01:00;29')]
+
+    # The out steps back a frame at the EDL's own rate
+    edl_path.write_text('001  AX       V     C        01:00:01:00 01:00:02:00 00:00:00:00 00:00:01:00\n')
+    assert [timecode_range['tc_out'] for timecode_range in CyLookup.load_ranges(str(edl_path), 24)] == ['01:00:01:23']
+
+    # Frames that don't exist at that rate
+    edl_path.write_text('001  AX       V     C        01:00:01:00 01:00:01:29 00:00:00:00 00:00:00:29\n')
+    with pytest.raises(ValueError):
+        CyLookup.load_ranges(str(edl_path), 24)
+    edl_path.write_text('FCM: DROP FRAME\n'
+                        '001  AX       V     C        01:00:01:00 01:00:02:00 00:00:00:00 00:00:01:00\n')
+    with pytest.raises(ValueError):
+        CyLookup.load_ranges(str(edl_path), 24)
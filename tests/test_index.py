@@ -0,0 +1,96 @@
+""" Metadata index,
+    Cached probes go stale with their take, survive a schema change, and answer which takes hold a timecode.
+    """
+import os
+import json
+import sqlite3
+
+import pytest
+
+from PicoSlicer import CyIndex
+from PicoSlicer import CyReader
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CyIndex.PicoIndex(str(tmp_path / 'index.sqlite'))
+    yield index
+    index.close()
+
+
+def no_probe(file_path, backend='pycara'):
+    raise AssertionError('{0} was opened'.format(file_path))
+
+
+def test_cached_probe(index, take, monkeypatch):
+    reader, probe = index.probe(take, 'synthetic')
+    assert reader is not None
+    assert probe.to_dict() == CyReader.probe(take, 'synthetic')[1].to_dict()
+
+    monkeypatch.setattr(CyReader, 'probe', no_probe)
+    reader, cached = index.probe(take, 'synthetic')
+    assert reader is None
+    assert cached.to_dict() == probe.to_dict()
+    assert index.update([take], 'synthetic') == 0
+
+
+def test_stale_probe(index, make_take, take):
+    other = make_take('other')
+    assert index.update([take, other], 'synthetic') == 2
+    assert index.get(take).stop_capture_frame_number == 180
+
+    # Same path, another take
+    CyReader.write_synthetic_pico(take, width=64, height=48, stop_capture_frame_number=1180)
+    stat = os.stat(take)
+    os.utime(take, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert index.get(take) is None
+    assert index.update([take, other], 'synthetic') == 1
+    assert index.get(take).stop_capture_frame_number == 1180
+
+    os.remove(other)
+    assert index.prune() == 1
+    assert [path for path, _ in index.probes()] == [take]
+
+
+def test_covering(index, make_take):
+    # 01:00:01:20 to 01:00:03:00, 01:00:02:20 to 01:00:04:20, and 01:00:02:02 to 01:00:27:02 at 24 fps
+    first = make_take('first', stop_capture_frame_number=180)
+    second = make_take('second', jam_timecode=[1, 0, 1, 0], stop_capture_frame_number=220)
+    slow = make_take('slow', framerate=48.0)
+    index.update([first, second, slow], 'synthetic')
+
+    assert index.covering('01:00:01:20') == [first]
+    assert index.covering('01:00:02:20') == sorted([first, second, slow])
+    assert index.covering('01:00:03:01') == sorted([second, slow])
+    assert index.covering('01:00:05:00') == [slow]
+    assert index.covering('01:00:01:19') == []
+
+
+def test_migrate_keeps_probes(tmp_path, take, monkeypatch):
+    # An index from before the render framerate was kept, with timecodes that mean something else
+    index_path = str(tmp_path / 'old.sqlite')
+    probe = CyReader.probe(take, 'synthetic')[1]
+    stat = os.stat(take)
+    connection = sqlite3.connect(index_path)
+    with connection:
+        connection.execute('CREATE TABLE takes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                           'tc_first INTEGER, tc_last INTEGER, probe TEXT)')
+        connection.execute('INSERT INTO takes VALUES (?, ?, ?, ?, ?, ?)',
+                           (take, stat.st_size, stat.st_mtime_ns, 0, 0, json.dumps(probe.to_dict())))
+    connection.close()
+
+    monkeypatch.setattr(CyReader, 'probe', no_probe)
+    index = CyIndex.PicoIndex(index_path)
+    try:
+        assert index.get(take).to_dict() == probe.to_dict()
+        assert index.covering('01:00:02:00') == [take]
+        assert index.connection.execute('PRAGMA user_version').fetchone()[0] == CyIndex.PicoIndex.SCHEMA_VERSION
+    finally:
+        index.close()
+
+    # Opened again, nothing changes
+    index = CyIndex.PicoIndex(index_path)
+    try:
+        assert index.covering('01:00:02:00') == [take]
+    finally:
+        index.close()
@@ -0,0 +1,50 @@
+""" Timecode lookup,
+    The interval tree and resolving timecode ranges to the takes that hold them.
+    """
+import random
+
+from PicoSlicer import CyLookup
+from PicoSlicer import CyReader
+
+
+def test_interval_tree_matches_brute_force():
+    generator = random.Random(0)
+    intervals = []
+    for value in range(200):
+        first = generator.randrange(0, 10000)
+        intervals.append((first, first + generator.randrange(0, 500), value))
+    tree = CyLookup.IntervalTree(intervals)
+    assert len(tree) == len(intervals)
+
+    for _ in range(300):
+        first = generator.randrange(-100, 10500)
+        last = first + generator.randrange(0, 300)
+        expected = sorted(interval for interval in intervals if interval[0] <= last and interval[1] >= first)
+        assert sorted(tree.overlapping(first, last)) == expected
+
+    assert CyLookup.IntervalTree([]).overlapping(0, 10) == []
+
+
+def test_range_split_over_takes(make_take):
+    # 01:00:01:20 to 01:00:03:00, then 01:00:02:20 to 01:00:04:20
+    first = make_take('first', stop_capture_frame_number=180)
+    second = make_take('second', jam_timecode=[1, 0, 1, 0], stop_capture_frame_number=220)
+    lookup = CyLookup.TakeLookup([(path, CyReader.probe(path, 'synthetic')[1]) for path in (first, second)])
+
+    # The overlap comes from the first take only, the second one picks up after it
+    segments = lookup.resolve('01:00:02:00', '01:00:04:00')
+    assert [(segment['path'], segment['tc_in'], segment['tc_out'], segment['offset']) for segment in segments] == [
+        (first, '01:00:02:00', '01:00:03:00', 0), (second, '01:00:03:01', '01:00:04:00', 31)]
+    assert [segment['length'] for segment in segments] == [31, 30]
+    assert segments[0]['frame_offset'] == 20
+    assert segments[1]['frame_offset'] == 22
+
+    # A take inside the span another one already covers gets nothing
+    assert [segment['path'] for segment in lookup.resolve('01:00:02:20', '01:00:02:25')] == [first]
+
+    jobs, unresolved = lookup.jobs([{'tc_in': '01:00:02:00', 'tc_out': '01:00:04:00', 'name': 'shot'},
+                                    {'tc_in': '01:00:04:00', 'tc_out': '01:00:06:00'},
+                                    {'tc_in': '02:00:00:00', 'tc_out': '02:00:01:00'}])
+    assert [(job['path'], job['start_frame'], job['piece']) for job in jobs] == [
+        (first, 1001, 1), (second, 1032, 2), (second, 1001, None)]
+    assert [timecode_range['tc_in'] for timecode_range in unresolved] == ['01:00:04:00', '02:00:00:00']
@@ -0,0 +1,34 @@
+""" Render plans,
+    Which reader frames a range renders and where they go.
+    """
+import os
+
+import pytest
+
+
+def test_slice_plan(take, make_pico):
+    pico = make_pico(take, 'slice', '01:00:02:00', '01:00:02:03')
+    assert pico.validate_timecode_input()
+
+    plan = pico.render_plan()
+    assert [(render_index, timecode, frame_number) for render_index, timecode, frame_number, _ in plan] == [
+        (20, '01:00:02:00', 1001), (22, '01:00:02:01', 1002), (24, '01:00:02:02', 1003), (26, '01:00:02:03', 1004)]
+    assert os.path.basename(plan[0][3]) == 'shot.1001.jpg'
+
+
+@pytest.mark.parametrize('stop_capture_frame_number', [160, 161])
+def test_full_take_ends_on_last_frame(stop_capture_frame_number, make_take, make_pico):
+    # With an odd span the frame after the range's last one would be past the end of the take
+    take = make_take(stop_capture_frame_number=stop_capture_frame_number)
+    pico = make_pico(take, 'full')
+    assert pico.validate_timecode_input()
+
+    plan = pico.render_plan()
+    assert plan[-1][0] <= pico.probe.last_index()
+    assert len(list(pico.render())) == len(plan) == 31
+    assert len(os.listdir(os.path.dirname(pico.output_name))) == len(plan)
+
+
+def test_range_past_take_is_not_valid(take, make_pico):
+    pico = make_pico(take, 'past', '01:00:02:00', '01:00:04:00')
+    assert not pico.validate_timecode_input()
@@ -0,0 +1,68 @@
+""" Prefetch,
+    Frames decoded ahead come back in order, errors reach the render, and close stops the decoding thread.
+    """
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from PicoSlicer import CyPico
+
+
+class CountingReader(object):
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.reads = []
+        self.lock = threading.Lock()
+
+    def get_image(self, index):
+        with self.lock:
+            self.reads.append(index)
+        if index == self.fail_at:
+            raise IOError('Frame {0} is corrupt'.format(index))
+        return np.full((4, 4, 3), index, dtype=np.uint8)
+
+
+def test_frames_in_order():
+    reader = CountingReader()
+    prefetch = CyPico.PrefetchReader(reader, [5, 3, 8, 1], depth=2)
+    assert prefetch.get_image(5)[0, 0, 0] == 5
+    assert prefetch.get_image(3)[0, 0, 0] == 3
+    # Out of order, read straight from the reader
+    assert prefetch.get_image(42)[0, 0, 0] == 42
+    assert prefetch.get_image(8)[0, 0, 0] == 8
+    assert prefetch.get_image(1)[0, 0, 0] == 1
+    prefetch.close()
+    assert sorted(reader.reads) == [1, 3, 5, 8, 42]
+    # Every other attribute is the reader's
+    assert prefetch.fail_at is None
+
+
+def test_error_reaches_render():
+    reader = CountingReader(fail_at=2)
+    prefetch = CyPico.PrefetchReader(reader, range(5), depth=4)
+    assert [prefetch.get_image(index)[0, 0, 0] for index in range(2)] == [0, 1]
+    with pytest.raises(IOError, match='Frame 2'):
+        prefetch.get_image(2)
+    prefetch.close()
+    assert not prefetch.thread.is_alive()
+
+
+def test_close_stops_decoding():
+    reader = CountingReader()
+    prefetch = CyPico.PrefetchReader(reader, range(1000), depth=4, max_depth=4)
+    prefetch.get_image(0)
+    prefetch.close()
+    assert not prefetch.thread.is_alive()
+    # No more than a full queue past the frame the render got to
+    assert len(reader.reads) <= 1 + 4 + 1
+    prefetch.close()
+
+
+def test_render_with_prefetch(take, make_pico, frame_hashes):
+    reference = make_pico(take, 'reference')
+    list(reference.render(prefetch=0))
+    pico = make_pico(take, 'prefetch')
+    list(pico.render(prefetch=4))
+    assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
@@ -0,0 +1,58 @@
+""" Output profiles,
+    Proxies and thumbnails come out smaller, in gray, whichever way the render runs.
+    """
+import os
+import glob
+
+import cv2
+import pytest
+
+from PicoSlicer import CyPico
+
+
+def written_frames(pico):
+    return sorted(glob.glob(os.path.join(os.path.dirname(pico.output_name), '*.jpg')))
+
+
+@pytest.fixture
+def large_take(make_take):
+    return make_take('large', width=256, height=192, stop_capture_frame_number=140)
+
+
+@pytest.mark.parametrize('profile, shape', [
+    ('full', (256, 192, 3)),
+    ('proxy', (128, 96)),
+    ('thumbnail', (64, 48)),
+    (CyPico.OutputProfile(scale=0.75), (192, 144, 3)),
+])
+def test_frame_size(large_take, make_pico, profile, shape):
+    # Frames come off the take sideways, rotated they are as tall as the take is wide
+    pico = make_pico(large_take, 'profile', profile=profile)
+    list(pico.render())
+    frames = written_frames(pico)
+    assert len(frames) == len(pico.render_plan())
+    assert cv2.imread(frames[0], cv2.IMREAD_UNCHANGED).shape == shape
+
+
+def test_proxy_bytes(large_take, make_pico):
+    sizes = {}
+    for profile in ('full', 'proxy', 'thumbnail'):
+        pico = make_pico(large_take, profile, profile=profile)
+        list(pico.render())
+        sizes[profile] = sum(os.path.getsize(path) for path in written_frames(pico))
+    assert sizes['thumbnail'] < sizes['proxy'] < sizes['full'] / 4
+
+
+def test_parallel_proxy(large_take, make_pico, frame_hashes):
+    serial = make_pico(large_take, 'serial', profile='proxy')
+    list(serial.render())
+    parallel = make_pico(large_take, 'parallel', profile='proxy')
+    list(parallel.render(workers=2))
+    assert (frame_hashes(os.path.dirname(parallel.output_name)) ==
+            frame_hashes(os.path.dirname(serial.output_name)))
+
+
+def test_unknown_profile():
+    assert CyPico.output_profile('proxy') is CyPico.PROFILES['proxy']
+    with pytest.raises(ValueError):
+        CyPico.output_profile('preview')
@@ -0,0 +1,103 @@
+""" Unpacked takes,
+    Renders from an unpacked file match the take's, and anything it can't serve goes to the take's reader.
+    """
+import os
+
+import numpy as np
+import pytest
+
+from PicoSlicer import CyRaw
+from PicoSlicer import CyReader
+
+
+@pytest.fixture
+def unpacked(take, make_pico, tmp_path):
+    """
+    :return: callable(output, tc_in=None, tc_out=None, **attributes) returning a PicoFile unpacked under tmp_path/raw
+    """
+    def unpacked(output, tc_in=None, tc_out=None, **attributes):
+        pico = make_pico(take, output, tc_in, tc_out, raw_dir=str(tmp_path / 'raw'), **attributes)
+        list(pico.unpack())
+        return pico
+    return unpacked
+
+
+def test_render_from_unpacked(take, make_pico, unpacked, frame_hashes, monkeypatch):
+    reference = make_pico(take, 'reference')
+    list(reference.render())
+
+    pico = unpacked('raw')
+    assert isinstance(pico.open_reader(), CyRaw.RawFrameReader)
+    # Nothing gets decoded from the take
+    monkeypatch.setattr(pico.file_buffer, 'get_image', None)
+    list(pico.render())
+    assert frame_hashes(os.path.dirname(pico.output_name)) == frame_hashes(os.path.dirname(reference.output_name))
+
+
+def test_changed_take_is_not_used(take, unpacked):
+    pico = unpacked('raw')
+    assert CyRaw.RawFrameReader(pico.raw_path()).is_current()
+
+    # Same size, later mtime
+    stat = os.stat(take)
+    os.utime(take, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert not CyRaw.RawFrameReader(pico.raw_path()).is_current()
+    assert pico.open_raw_reader() is None
+    assert not isinstance(pico.open_reader(), CyRaw.RawFrameReader)
+
+    os.remove(take)
+    assert not CyRaw.RawFrameReader(pico.raw_path()).is_current()
+
+
+def test_unpack_keeps_earlier_frames(unpacked):
+    first = unpacked('first', '01:00:02:00', '01:00:02:10')
+    held = set(first.open_raw_reader().indices())
+    assert held == set(render_index for render_index, _, _, _ in first.render_plan())
+
+    second = unpacked('second', '01:00:02:05', '01:00:02:20')
+    wider = set(second.open_raw_reader().indices())
+    assert held < wider
+    assert wider >= set(render_index for render_index, _, _, _ in second.render_plan())
+
+
+def test_fallback(make_take, make_pico, tmp_path):
+    take = make_take('cameras', channels=[0, 2], stop_capture_frame_number=180)
+    pico = make_pico(take, 'raw', '01:00:02:00', '01:00:02:10', raw_dir=str(tmp_path / 'raw'))
+    list(pico.unpack())
+    opened = []
+
+    def fallback():
+        opened.append(True)
+        return CyReader.open_reader(take, 'synthetic')
+
+    raw_reader = CyRaw.RawFrameReader(pico.raw_path(), fallback=fallback)
+    source = CyReader.open_reader(take, 'synthetic')
+    index = raw_reader.indices()[0]
+
+    # Drawing on a frame only touches the caller's copy
+    frame = raw_reader.get_image(index)
+    assert np.array_equal(frame, source.get_image(index))
+    frame[:] = 0
+    assert np.array_equal(raw_reader.get_image(index), source.get_image(index))
+    assert not opened
+
+    # Frames and channels it doesn't hold, and the rest of the reader, come from the take
+    outside = raw_reader.indices()[-1] + 5
+    assert raw_reader.offset(outside) == -1
+    assert np.array_equal(raw_reader.get_image(outside), source.get_image(outside))
+    assert np.array_equal(raw_reader.get_image(index, 2), source.get_image(index, 2))
+    assert not np.array_equal(raw_reader.get_image(index, 2), source.get_image(index))
+    assert raw_reader.read_burn_in(index) == source.read_burn_in(index)
+    assert len(opened) == 1
+    raw_reader.close()
+
+    with pytest.raises(IOError):
+        CyRaw.RawFrameReader(pico.raw_path()).get_image(outside)
+
+
+def test_not_unpacked(tmp_path):
+    path = str(tmp_path / 'take.raw')
+    with open(path, 'wb') as f:
+        f.write(b'PICO' * 2048)
+    with pytest.raises(ValueError):
+        CyRaw.RawFrameReader(path)
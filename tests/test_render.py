@@ -0,0 +1,57 @@
+""" Render modes,
+    Every way of rendering a range has to write the same files, byte for byte.
+    """
+import os
+
+import pytest
+
+# - Globals - #
+gMODES = {'serial': {},
+          'pool': {'workers': 2},
+          'shared': {'workers': 2, 'transport': 'shared'},
+          'write_behind': {'write_threads': 2}}
+
+
+@pytest.fixture
+def serial_hashes(take, make_pico, frame_hashes):
+    pico = make_pico(take, 'reference', '01:00:02:00', '01:00:02:25')
+    list(pico.render())
+    return frame_hashes(os.path.dirname(pico.output_name))
+
+
+@pytest.mark.parametrize('mode', sorted(gMODES))
+def test_modes_write_identical_frames(mode, take, make_pico, frame_hashes, serial_hashes):
+    pico = make_pico(take, mode, '01:00:02:00', '01:00:02:25')
+    progress = list(pico.render(**gMODES[mode]))
+
+    assert len(progress) == len(pico.render_plan()) == len(serial_hashes) == 26
+    assert pico.render_stats.frames == len(serial_hashes)
+    assert frame_hashes(os.path.dirname(pico.output_name)) == serial_hashes
+
+
+def test_empty_plan_renders_nothing(take, make_pico, monkeypatch):
+    pico = make_pico(take, 'empty', '01:00:02:00', '01:00:02:25')
+    monkeypatch.setattr(pico, 'render_plan', lambda: [])
+    for mode in sorted(gMODES):
+        assert list(pico.render(**gMODES[mode])) == []
+
+
+def test_overlapping_ranges_match_single_renders(take, make_pico, frame_hashes, tmp_path):
+    ranges = [{'tc_in': '01:00:02:00', 'tc_out': '01:00:02:20', 'start_frame': 1001,
+               'override': str(tmp_path / 'ranges' / 'a.pico')},
+              {'tc_in': '01:00:02:10', 'tc_out': '01:00:02:25', 'start_frame': 2001,
+               'override': str(tmp_path / 'ranges' / 'b.pico')}]
+    pico = make_pico(take, 'ranges')
+    progress = list(pico.render_ranges(ranges))
+
+    # Frames both ranges share are decoded once and written twice
+    assert len(progress) == pico.render_stats.frames == 21 + 16
+    written = frame_hashes(tmp_path / 'ranges')
+    for timecode_range, name in zip(ranges, ('a', 'b')):
+        single = make_pico(take, 'single_' + name, timecode_range['tc_in'], timecode_range['tc_out'],
+                           start_frame=timecode_range['start_frame'])
+        list(single.render())
+        expected = dict((frame.replace('shot.', name + '.'), digest)
+                        for frame, digest in frame_hashes(os.path.dirname(single.output_name)).items())
+        assert expected and dict((frame, written[frame]) for frame in expected) == expected
+    assert len(written) == 21 + 16
@@ -0,0 +1,51 @@
+""" Integer timecode,
+    Checked against the timecode library the UI uses, which counts frames from 1.
+    """
+import pytest
+from timecode import Timecode
+
+from PicoSlicer import CyTimecode
+
+# - Globals - #
+gLIBRARY_RATES = {(30, True): '29.97', (60, True): '59.94', (30, False): '30', (24, False): '24'}
+
+# Either side of the minute and ten minute boundaries, and across midnight
+gFRAMES = sorted(set(frame + delta for frame in (0, 1798, 1800, 3598, 17982, 17984, 107892, 2589407, 5178815)
+                     for delta in range(-3, 4) if frame + delta >= 0))
+
+
+@pytest.mark.parametrize('fps, drop_frame', sorted(gLIBRARY_RATES))
+def test_labels_match_library(fps, drop_frame):
+    rate = gLIBRARY_RATES[(fps, drop_frame)]
+    for frames in gFRAMES:
+        frames = frames * fps // 30
+        label = CyTimecode.to_timecode(frames, fps, drop_frame)
+        assert label == str(Timecode(rate, frames=frames + 1)), frames
+        assert CyTimecode.to_frames(label, fps, drop_frame) == Timecode(rate, label).frames - 1
+
+    # The vectorised labels of a whole range are the same as one at a time
+    first = 17982 * fps // 30
+    assert CyTimecode.timecodes(first, 50, fps, drop_frame) == [CyTimecode.to_timecode(first + step, fps, drop_frame)
+                                                                for step in range(50)]
+
+
+def test_drop_frame_skips_frame_numbers():
+    assert CyTimecode.to_timecode(1799, 30, True) == '00:00:59;29'
+    assert CyTimecode.to_timecode(1800, 30, True) == '00:01:00;02'
+    assert CyTimecode.to_timecode(17982, 30, True) == '00:10:00;00'
+    assert CyTimecode.to_timecode(3600, 60, True) == '00:01:00;04'
+
+
+@pytest.mark.parametrize('fps, expected', [(29.97, (30, True)), (30.0, (30, False)), (59.94, (60, True)),
+                                           (23.976, (24, False)), (25.0, (25, False))])
+def test_timecode_rate(fps, expected):
+    assert CyTimecode.timecode_rate(fps) == expected
+
+
+@pytest.mark.parametrize('timecode, fps, drop_frame', [('01:00:00', 30, False), ('01:00:01:24', 24, False),
+                                                        ('01:00:01:30', 30, False), ('01:00:60:00', 30, False),
+                                                        ('01:60:00:00', 30, False), ('01:01:00;01', 30, True),
+                                                        ('01:01:00;03', 60, True), ((1, 0, 0, 60), 60, False)])
+def test_bad_timecode(timecode, fps, drop_frame):
+    with pytest.raises(ValueError):
+        CyTimecode.to_frames(timecode, fps, drop_frame)